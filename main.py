@@ -1,14 +1,45 @@
+import time
+_T0 = time.perf_counter()
+
 import flet as ft
+import threading
+import multiprocessing
+# As views são importadas sob demanda (ver ViewRegistry abaixo): a tela de
+# login aparece sem esperar numpy/pandas/openpyxl
 from src.views.login_view import LoginView
-from src.views.dashboard_view import DashboardView
-from src.views.admin_view import AdminView
-from src.views.sped_view import SpedView
-from src.views.settings_view import SettingsView
+from src.views.view_registry import ViewRegistry
 from src.utils.database import initialize_db
+from src.utils.activity_store import import_legacy_logs
 from src.utils.logger import log_action
+from src.utils.job_manager import get_job_manager
+from src.utils.startup import StartupTimer, prewarm
+from src.utils.metrics import start_metrics
+from src.config import PREWARM_AFTER_LOGIN
+
+startup_timer = StartupTimer(_T0)
+startup_timer.mark("imports")
+
+
+def _dashboard_view(page):
+    from src.views.dashboard_view import DashboardView
+    return DashboardView()
+
+def _admin_view(page):
+    from src.views.admin_view import AdminView
+    return AdminView(page)
+
+def _sped_view(page):
+    from src.views.sped_view import SpedView
+    return SpedView(page)
+
+def _settings_view(page):
+    from src.views.settings_view import SettingsView
+    return SettingsView(page)
 
 # REMOVIDO 'async' AQUI
 def main(page: ft.Page):
+    startup_timer.mark("page_ready")
+
     # --- Configurações da Janela ---
     page.title = "SiegAuto - Sistema Contabilidade"
     page.theme_mode = ft.ThemeMode.LIGHT
@@ -22,6 +53,10 @@ def main(page: ft.Page):
 
     # --- Inicializa Banco de Dados ---
     initialize_db()
+    # Logs antigos (anteriores ao índice de atividades): importação única em segundo plano
+    threading.Thread(target=import_legacy_logs, daemon=True).start()
+    # Métricas de desempenho: endpoint local (OpenMetrics) e snapshots em logs/
+    start_metrics()
 
     # --- Estado da Aplicação ---
     current_user = None
@@ -39,6 +74,14 @@ def main(page: ft.Page):
 
     page_content = ft.Container(expand=True, padding=20)
 
+    # Telas da sessão: criadas na primeira visita e mantidas até o logout
+    views = ViewRegistry({
+        "Dashboard": lambda: _dashboard_view(page),
+        "Admin": lambda: _admin_view(page),
+        "SPED": lambda: _sped_view(page),
+        "Configurações": lambda: _settings_view(page),
+    })
+
     # --- Funções de Navegação e Lógica ---
 
     def logout(e):
@@ -47,6 +90,11 @@ def main(page: ft.Page):
             log_action(f"User logged out: {current_user['username']}")
         
         current_user = None
+        # Tarefas em andamento pertencem ao usuário que saiu
+        get_job_manager().cancel_all()
+        from src.utils.job_client import disconnect
+        disconnect()
+        views.invalidate()
         page.clean()
         page.add(LoginView(page, on_login_success))
         page.update()
@@ -65,20 +113,7 @@ def main(page: ft.Page):
         index = e.control.selected_index
         selected_label = rail.destinations[index].label
 
-        # Limpa o conteúdo atual
-        page_content.content = None
-
-        # Roteamento das Telas
-        if selected_label == "Dashboard":
-            page_content.content = DashboardView()
-        elif selected_label == "Admin":
-            page_content.content = AdminView(page)
-        elif selected_label == "SPED":
-            page_content.content = SpedView(page)
-        elif selected_label == "Configurações":
-            page_content.content = SettingsView(page)
-
-        page_content.update()
+        views.show(selected_label)
 
     rail.on_change = on_nav_change
 
@@ -86,6 +121,8 @@ def main(page: ft.Page):
         nonlocal current_user
         current_user = user
         log_action(f"User logged in: {user['username']}")
+        if PREWARM_AFTER_LOGIN:
+            prewarm(timer=startup_timer)
 
         # --- Lógica de Permissões ---
         dests = []
@@ -114,16 +151,8 @@ def main(page: ft.Page):
         # Carregamento da tela inicial após login
         if dests:
             rail.selected_index = 0
-            first_label = dests[0].label
-            
-            if first_label == "Dashboard":
-                page_content.content = DashboardView()
-            elif first_label == "Admin":
-                page_content.content = AdminView(page)
-            elif first_label == "SPED":
-                page_content.content = SpedView(page)
-            elif first_label == "Configurações":
-                page_content.content = SettingsView(page)
+            views.show(dests[0].label)
+            page_content.content = views.container
         else:
             page_content.content = ft.Text("Sem permissões de acesso.", size=20, color="red")
 
@@ -145,6 +174,10 @@ def main(page: ft.Page):
     # Adiciona a view de login ao iniciar
     page.add(LoginView(page, on_login_success))
     page.update()
+    startup_timer.mark("first_frame")
+    startup_timer.report("first_frame")
 
 if __name__ == "__main__":
+    # Necessário para os pools de processos no executável empacotado (Windows)
+    multiprocessing.freeze_support()
     ft.app(target=main)
\ No newline at end of file
@@ -0,0 +1,304 @@
+"""
+Benchmark das ferramentas sobre arquivos sintéticos (src/utils/synthetic_corpus.py).
+
+    python -m src.benchmark                      # escala 'small', todas as ferramentas
+    python -m src.benchmark --scale medium --runs 5
+    python -m src.benchmark --tools parse difal --no-save
+
+Cada ferramenta roda num processo novo (o pico de memória medido é só dela)
+e é repetida --runs vezes; vale o melhor tempo. O resultado traz vazão
+(MB/s, linhas/s, arquivos/s), pico de RSS e um checksum da saída, e é gravado
+em benchmarks/results.jsonl. Cada execução é comparada com a anterior de
+mesma escala e semente: tempo relativo e se a saída mudou.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import importlib
+import platform
+import argparse
+import datetime
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from src.utils.synthetic_corpus import generate_sped_contrib, generate_xml_folder
+
+BENCHMARK_DIR = "benchmarks"
+RESULTS_FILE = os.path.join(BENCHMARK_DIR, "results.jsonl")
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, "corpus")
+
+# Tamanho do conjunto de testes: documentos no SPED e arquivos na pasta de XMLs
+SCALES = {
+    'small': {'documents': 5_000, 'establishments': 2, 'xml_files': 500},
+    'medium': {'documents': 50_000, 'establishments': 5, 'xml_files': 5_000},
+    'large': {'documents': 400_000, 'establishments': 10, 'xml_files': 20_000},
+}
+TOOLS = ('parse', 'report', 'filter', 'keys', 'validate', 'difal')
+
+
+# ----------------------------------------------------------------------
+# Conjunto de testes
+# ----------------------------------------------------------------------
+def build_corpus(scale: str, seed: int, base_dir: str = CORPUS_DIR) -> Dict:
+    """Gera (ou reaproveita, se os parâmetros forem os mesmos) o SPED e a pasta de XMLs."""
+    params = dict(SCALES[scale], seed=seed)
+    folder = os.path.join(base_dir, f"{scale}-s{seed}")
+    manifest_path = os.path.join(folder, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest['parametros'] == params:
+            return manifest
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    sped_path = os.path.join(folder, "sped_contribuicoes.txt")
+    xml_dir = os.path.join(folder, "xmls")
+    t0 = time.perf_counter()
+    sped = generate_sped_contrib(sped_path, seed=seed, documents=params['documents'],
+                                 establishments=params['establishments'])
+    xml = generate_xml_folder(xml_dir, seed=seed, files=params['xml_files'])
+    manifest = {
+        'parametros': params,
+        'sped': dict(sped, caminho=sped_path, sha256=_file_sha256(sped_path)),
+        'xml': dict(xml, caminho=xml_dir),
+        'geracao_s': round(time.perf_counter() - t0, 2),
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+# ----------------------------------------------------------------------
+# Medição (executada num processo separado por ferramenta)
+# ----------------------------------------------------------------------
+def measure(tool: str, corpus: Dict, runs: int, work_dir: str) -> Dict:
+    sped_path = corpus['sped']['caminho']
+    xml_dir = corpus['xml']['caminho']
+    os.makedirs(work_dir, exist_ok=True)
+
+    prepare, run, checksum = _tool_steps(tool, sped_path, xml_dir, work_dir)
+    state = prepare()
+    rss_before = _peak_rss_mb()
+    times = []
+    output = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        output = run(state)
+        times.append(time.perf_counter() - t0)
+
+    best = min(times)
+    if tool == 'difal':
+        size, lines, files = corpus['xml']['bytes'], None, corpus['xml']['arquivos']
+    else:
+        size, lines, files = corpus['sped']['bytes'], corpus['sped']['linhas'], None
+    return {
+        'melhor_s': round(best, 4),
+        'mediana_s': round(sorted(times)[len(times) // 2], 4),
+        'mb_s': round(size / best / 1024 / 1024, 2),
+        'linhas_s': round(lines / best) if lines else None,
+        'arquivos_s': round(files / best, 1) if files else None,
+        'pico_rss_mb': _peak_rss_mb(),
+        'pico_rss_antes_mb': rss_before,
+        'checksum': checksum(output),
+    }
+
+
+def _tool_steps(tool: str, sped_path: str, xml_dir: str, work_dir: str):
+    """(prepare, run, checksum) de cada ferramenta. prepare() fica fora do tempo medido."""
+    if tool == 'parse':
+        from src.utils.sped_parser import process_sped_file
+        # pandas é importado sob demanda pelo parser: a importação não entra no tempo
+        return (lambda: importlib.import_module('pandas'), lambda _: process_sped_file(sped_path), _dataframe_sha256)
+
+    if tool == 'report':
+        # Só a geração do Excel: o parse fica no prepare
+        from src.utils.sped_parser import process_sped_file
+        from src.utils.report_generator import generate_fiscal_report
+        out = os.path.join(work_dir, "relatorio.xlsx")
+        # O .xlsx guarda a data de criação: o checksum fica a cargo do 'parse'
+        return (lambda: process_sped_file(sped_path), lambda df: generate_fiscal_report(df, out), lambda _: None)
+
+    if tool == 'filter':
+        from src.utils.sped_filter_logic import SpedFilterLogic
+        from src.utils.sped_scanner import read_header
+        header = read_header(sped_path)
+        start = datetime.datetime.strptime(header['dt_ini'], "%d%m%Y").date()
+        end = start + datetime.timedelta(days=14)
+        out = os.path.join(work_dir, "filtrado.txt")
+        logic = SpedFilterLogic()
+        return (lambda: None, lambda _: logic.filter_sped_by_date(sped_path, out, start, end),
+                lambda _: _file_sha256(out))
+
+    if tool == 'keys':
+        from src.utils.keys_extractor_logic import KeysExtractorLogic
+        out = os.path.join(work_dir, "chaves.txt")
+        logic = KeysExtractorLogic()
+        return (lambda: None, lambda _: logic.extract_keys(sped_path, out), lambda _: _file_sha256(out))
+
+    if tool == 'validate':
+        from src.utils.sped_validator import SpedValidatorLogic
+        logic = SpedValidatorLogic()
+        return (lambda: None, lambda _: logic.validate_sped(sped_path), _json_sha256)
+
+    if tool == 'difal':
+        from src.utils.difal_logic import DifalLogic
+        logic = DifalLogic()
+
+        def checksum(result):
+            _, _, resumo, detalhes, erros = result
+            return _json_sha256([
+                [{k: round(v, 2) if isinstance(v, float) else v for k, v in r.items()} for r in resumo],
+                sorted((d['Arquivo'], round(d['Valor DIFAL'], 2), round(d['Valor FCP'], 2)) for d in detalhes),
+                sorted(erros),
+            ])
+        return (lambda: None, lambda _: logic.calcular_difal_por_pasta(xml_dir), checksum)
+
+    raise ValueError(f"Ferramenta desconhecida: {tool}")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _json_sha256(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def _dataframe_sha256(df) -> Optional[str]:
+    if df is None:
+        return None
+    return hashlib.sha256(df.to_csv(index=False, float_format='%.2f').encode('utf-8')).hexdigest()[:16]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Pico de memória do processo (MB). None se a plataforma não informar."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB; macOS em bytes
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 1024 / 1024, 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+# ----------------------------------------------------------------------
+# Execução, histórico e comparação
+# ----------------------------------------------------------------------
+def run_benchmark(scale: str, seed: int, tools: List[str], runs: int) -> Dict:
+    corpus = build_corpus(scale, seed)
+    work_dir = os.path.join(BENCHMARK_DIR, "saidas")
+    results = {}
+    # spawn: cada ferramenta começa com um processo limpo, sem a memória das anteriores
+    ctx = multiprocessing.get_context('spawn')
+    for tool in tools:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+            results[tool] = executor.submit(measure, tool, corpus, runs, work_dir).result()
+        _print_result(tool, results[tool])
+    return {
+        'em': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'escala': scale,
+        'seed': seed,
+        'execucoes': runs,
+        'corpus': {'sped_bytes': corpus['sped']['bytes'], 'sped_linhas': corpus['sped']['linhas'],
+                   'sped_sha256': corpus['sped']['sha256'], 'xml_arquivos': corpus['xml']['arquivos'],
+                   'xml_bytes': corpus['xml']['bytes']},
+        'resultados': results,
+    }
+
+
+def load_history(path: str = RESULTS_FILE) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_run(run: Dict, path: str = RESULTS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+
+
+def compare(run: Dict, history: List[Dict]) -> Optional[Dict]:
+    """Última execução anterior com a mesma escala e semente."""
+    for previous in reversed(history):
+        if previous['escala'] == run['escala'] and previous['seed'] == run['seed']:
+            return previous
+    return None
+
+
+def _print_result(tool: str, r: Dict):
+    vazao = f"{r['mb_s']:8.2f} MB/s"
+    if r['linhas_s']:
+        vazao += f" {r['linhas_s']:>12,} linhas/s"
+    if r['arquivos_s']:
+        vazao += f" {r['arquivos_s']:>12,.1f} arq/s"
+    rss = f"{r['pico_rss_mb']:.0f} MB" if r['pico_rss_mb'] is not None else "-"
+    print(f"{tool:<9} {r['melhor_s']:8.3f}s {vazao:<40} RSS {rss:>8}  {r['checksum'] or '-'}", flush=True)
+
+
+def _print_comparison(run: Dict, previous: Dict):
+    print(f"\nComparado com {previous['em']} ({previous.get('commit') or 'sem commit'}):")
+    for tool, r in run['resultados'].items():
+        old = previous['resultados'].get(tool)
+        if not old:
+            continue
+        delta = (r['melhor_s'] - old['melhor_s']) / old['melhor_s'] * 100 if old['melhor_s'] else 0.0
+        saida = "igual" if r['checksum'] == old['checksum'] else "SAÍDA DIFERENTE"
+        print(f"  {tool:<9} {old['melhor_s']:8.3f}s -> {r['melhor_s']:8.3f}s ({delta:+6.1f}%)  {saida}")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=repo_dir, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.benchmark", description="Benchmark das ferramentas SPED/DIFAL.")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=3, help="repetições de cada ferramenta (vale a melhor)")
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=list(TOOLS))
+    parser.add_argument("--no-save", action="store_true", help="não grava em benchmarks/results.jsonl")
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.scale, args.seed)
+    print(f"Escala {args.scale} (seed {args.seed}): SPED {corpus['sped']['bytes'] / 1024 / 1024:.1f} MB, "
+          f"{corpus['sped']['linhas']:,} linhas; {corpus['xml']['arquivos']:,} XMLs "
+          f"({corpus['xml']['bytes'] / 1024 / 1024:.1f} MB)\n")
+
+    run = run_benchmark(args.scale, args.seed, args.tools, max(1, args.runs))
+    previous = compare(run, load_history())
+    if previous:
+        _print_comparison(run, previous)
+    if not args.no_save:
+        save_run(run)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
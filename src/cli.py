@@ -0,0 +1,356 @@
+"""
+Ferramentas SPED/DIFAL pela linha de comando, sem a interface Flet.
+
+Exemplos:
+    python -m src.cli contrib "clientes/**/EFD_CONTRIB*.txt" --workers 4 --json resumo.json
+    python -m src.cli filter sped.txt --start 01012025 --end 31012025 --output-dir filtrados
+    python -m src.cli validate "entrada/*.txt"
+    python -m src.cli overview "entrada/*.txt" --json
+    python -m src.cli keys "entrada/*.txt" --output chaves.txt --skip-dir xmls
+    python -m src.cli download "entrada/*.txt" --output-dir xmls --workers 8
+    python -m src.cli difal "xmls/*" --detailed --output-dir relatorios
+    python -m src.cli difal xmls --items && python -m src.cli difal-pivot xmls/DIFAL_xmls.npz --by mes cfop --check
+    python -m src.cli contrib sped.txt --profile completo
+    python -m src.cli watch \\servidor\entrada --results \\servidor\resultados
+    python -m src.cli serve --host 0.0.0.0 --port 8765
+
+Padrões com * ? [ ] são expandidos pelo próprio programa (inclusive ** recursivo),
+já que o cmd do Windows não expande curingas.
+
+Códigos de saída: 0 tudo certo, 1 alguma entrada falhou, 2 uso incorreto ou
+nenhuma entrada encontrada, 130 interrompido (Ctrl+C).
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import datetime
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List
+
+from src.config import (
+    JOB_SERVER_HOST, JOB_SERVER_PORT, JOB_SERVER_WORKERS,
+    WATCH_MAX_WORKERS, WATCH_PIPELINES, WATCH_POLL_INTERVAL, WATCH_SETTLE_SECONDS
+)
+from src.utils import batch_tasks, profiling
+from src.utils.cancellation import CancelToken
+from src.utils.difal_dataset import DIMENSIONS
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+def expand_inputs(patterns: List[str], want_dirs: bool = False) -> List[str]:
+    """
+    Expande os curingas e remove repetições mantendo a ordem.
+    Caminhos literais inexistentes são mantidos (viram falha no resumo).
+    """
+    paths = []
+    for pattern in patterns:
+        if any(c in pattern for c in '*?['):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            paths.extend(m for m in matches if (os.path.isdir(m) if want_dirs else os.path.isfile(m)))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(os.path.normpath(p) for p in paths))
+
+
+def _sped_date(value: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, "%d%m%Y").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida '{value}', use DDMMAAAA (ex: 01012025)")
+
+
+def _missing(path: str, want_dirs: bool = False) -> Dict:
+    exists = os.path.isdir(path) if want_dirs else os.path.isfile(path)
+    if exists:
+        return None
+    return {'entrada': path, 'sucesso': False, 'duracao_s': 0.0, 'saida': None,
+            'mensagem': "Pasta não encontrada." if want_dirs else "Arquivo não encontrado."}
+
+
+def run_each(fn: Callable[..., Dict], inputs: List[str], workers: int, want_dirs: bool = False, **kwargs) -> List[Dict]:
+    """
+    Executa fn(entrada, **kwargs) para cada entrada, em paralelo com até
+    `workers` processos. Os resultados voltam na ordem das entradas.
+    """
+    results: List[Dict] = [None] * len(inputs)
+    pending = []
+    for i, path in enumerate(inputs):
+        missing = _missing(path, want_dirs)
+        if missing:
+            results[i] = missing
+            _print_progress(missing)
+        else:
+            pending.append(i)
+
+    if workers <= 1 or len(pending) <= 1:
+        for i in pending:
+            results[i] = fn(inputs[i], **kwargs)
+            _print_progress(results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+        futures = {executor.submit(fn, inputs[i], **kwargs): i for i in pending}
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    results[i] = {'entrada': inputs[i], 'sucesso': False, 'duracao_s': None,
+                                  'saida': None, 'mensagem': f"Erro: {e}"}
+                _print_progress(results[i])
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return results
+
+
+def _profiled(fn: Callable[..., Dict], mode: str, *args, **kwargs) -> Dict:
+    """
+    fn(*args, **kwargs) medindo as etapas: imprime a divisão do tempo e
+    acrescenta 'etapas' ao resultado. mode 'completo' inclui cProfile e memória.
+    """
+    full = mode == "completo"
+    name = getattr(fn, 'func', fn).__name__  # fn pode ser um functools.partial
+    with profiling.profile_job(name, enabled=True, cprofile=full, trace_memory=full) as profile:
+        result = fn(*args, **kwargs)
+    result['etapas'] = profile.to_dict()
+    print(profile.report(), file=sys.stderr, flush=True)
+    return result
+
+
+def _print_progress(result: Dict):
+    status = "OK" if result['sucesso'] else "ERRO"
+    entrada = result['entrada']
+    if isinstance(entrada, list):
+        entrada = f"{len(entrada)} arquivos"
+    duracao = f" ({result['duracao_s']:.1f}s)" if result.get('duracao_s') is not None else ""
+    mensagem = " | ".join(line for line in str(result['mensagem']).splitlines() if line)
+    print(f"[{status}] {entrada}: {mensagem}{duracao}", file=sys.stderr, flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Ferramentas SPED/DIFAL sem interface.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p, inputs_help="arquivos SPED (aceita curingas)", workers=True):
+        p.add_argument("inputs", nargs="+", help=inputs_help)
+        p.add_argument("--json", nargs="?", const="-", metavar="ARQUIVO",
+                       help="resumo em JSON (sem ARQUIVO: imprime na saída padrão)")
+        if workers:
+            p.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                           help=f"processos em paralelo (padrão: {DEFAULT_WORKERS})")
+        p.add_argument("--profile", nargs="?", const="etapas", choices=("etapas", "completo"),
+                       help="mostra o tempo de cada etapa ('completo': também cProfile e memória)")
+
+    p = sub.add_parser("contrib", help="planilha de apuração da EFD Contribuições")
+    add_common(p)
+    p.add_argument("--output-dir", help="pasta das planilhas (padrão: junto de cada arquivo)")
+
+    p = sub.add_parser("filter", help="recorta o SPED por período e recalcula o Bloco 9")
+    add_common(p)
+    p.add_argument("--start", type=_sped_date, required=True, help="data inicial DDMMAAAA")
+    p.add_argument("--end", type=_sped_date, required=True, help="data final DDMMAAAA")
+    p.add_argument("--output-dir", help="pasta dos arquivos filtrados (padrão: junto de cada arquivo)")
+
+    p = sub.add_parser("validate", help="confere o Bloco 9 e o leiaute das linhas")
+    add_common(p)
+
+    p = sub.add_parser("overview", help="visão geral rápida de cada arquivo")
+    add_common(p)
+
+    p = sub.add_parser("keys", help="extrai as chaves de entrada de todos os arquivos num único TXT")
+    add_common(p, workers=False)
+    p.add_argument("--output", required=True, help="arquivo TXT de saída")
+    p.add_argument("--skip-dir", help="pasta de XMLs já baixados (chaves descartadas)")
+
+    p = sub.add_parser("download", help="extrai as chaves de entrada e baixa os XMLs na Sieg")
+    add_common(p, workers=False)
+    p.add_argument("--output-dir", required=True, help="pasta dos XMLs")
+    p.add_argument("--workers", type=int, default=4, help="downloads simultâneos (padrão: 4)")
+    p.add_argument("--rps", type=float, default=10.0, help="limite de requisições por segundo (padrão: 10)")
+
+    p = sub.add_parser("difal", help="DIFAL/FCP dos XMLs de cada pasta (inclui subpastas e ZIPs)")
+    add_common(p, inputs_help="pastas de XMLs ou ZIPs (aceita curingas)")
+    p.add_argument("--output-dir", help="pasta das planilhas (padrão: dentro de cada pasta)")
+    p.add_argument("--detailed", action="store_true",
+                   help="inclui a aba nota a nota (dividida em várias abas acima do limite do Excel)")
+    p.add_argument("--companion", choices=("csv", "parquet"),
+                   help="grava também todas as notas em CSV/Parquet ao lado da planilha")
+    p.add_argument("--items", action="store_true",
+                   help="grava também a base por item (.npz) para o difal-pivot")
+
+    p = sub.add_parser("difal-pivot", help="agrupa a base por item do difal --items (sem reler os XMLs)")
+    add_common(p, inputs_help="bases .npz geradas por difal --items (aceita curingas)")
+    p.add_argument("--by", nargs="+", required=True, choices=list(DIMENSIONS), help="dimensões do agrupamento")
+    p.add_argument("--check", action="store_true", help="lista também os itens com cálculo divergente")
+    p.add_argument("--output-dir", help="pasta dos CSVs (padrão: junto de cada base)")
+
+    p = sub.add_parser("watch", help="monitora uma pasta e processa automaticamente o que chegar")
+    p.add_argument("watch_dir", help="pasta monitorada")
+    p.add_argument("--results", required=True, help="pasta de resultados (espelha as subpastas)")
+    p.add_argument("--workers", type=int, default=WATCH_MAX_WORKERS,
+                   help=f"itens processados ao mesmo tempo (padrão: {WATCH_MAX_WORKERS})")
+    p.add_argument("--interval", type=float, default=WATCH_POLL_INTERVAL,
+                   help=f"segundos entre varreduras (padrão: {WATCH_POLL_INTERVAL})")
+    p.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                   help=f"segundos sem alteração para processar (padrão: {WATCH_SETTLE_SECONDS})")
+    p.add_argument("--only", nargs="+", choices=WATCH_PIPELINES, default=list(WATCH_PIPELINES),
+                   help="etapas habilitadas")
+    p.add_argument("--once", action="store_true", help="processa o que houver na pasta e encerra")
+
+    p = sub.add_parser("serve", help="servidor de tarefas para as estações (ver JOB_SERVER_URL)")
+    p.add_argument("--host", default=JOB_SERVER_HOST, help=f"interface (padrão: {JOB_SERVER_HOST})")
+    p.add_argument("--port", type=int, default=JOB_SERVER_PORT, help=f"porta (padrão: {JOB_SERVER_PORT})")
+    p.add_argument("--workers", type=int, default=JOB_SERVER_WORKERS or os.cpu_count() or 1,
+                   help="processos (padrão: um por núcleo)")
+    return parser
+
+
+def run_command(args, cancel_token: CancelToken) -> List[Dict]:
+    want_dirs = args.command == "difal"
+    inputs = expand_inputs(args.inputs, want_dirs=want_dirs)
+    if not inputs:
+        return []
+
+    def task(fn):
+        return functools.partial(_profiled, fn, args.profile) if args.profile else fn
+
+    if args.command == "contrib":
+        return run_each(task(batch_tasks.contrib_report), inputs, args.workers, output_dir=args.output_dir)
+    if args.command == "filter":
+        return run_each(task(batch_tasks.filter_by_date), inputs, args.workers,
+                        start_date=args.start, end_date=args.end, output_dir=args.output_dir)
+    if args.command == "validate":
+        return run_each(task(batch_tasks.validate), inputs, args.workers)
+    if args.command == "overview":
+        return run_each(task(batch_tasks.overview), inputs, args.workers)
+    if args.command == "difal":
+        # Várias pastas já rodam em paralelo: cada uma lê seus XMLs/ZIPs num processo só
+        inner_workers = 1 if args.workers > 1 and len(inputs) > 1 else None
+        # (workers da pasta via partial: o workers de run_each é o número de pastas em paralelo)
+        difal = functools.partial(batch_tasks.difal_report, workers=inner_workers)
+        return run_each(task(difal), inputs, args.workers, want_dirs=True,
+                        output_dir=args.output_dir, detailed=args.detailed, save_items=args.items,
+                        companion=args.companion)
+    if args.command == "difal-pivot":
+        return run_each(task(batch_tasks.difal_pivot), inputs, args.workers,
+                        by=args.by, output_dir=args.output_dir, check=args.check)
+
+    # keys/download: um único trabalho sobre todos os arquivos (deduplicação entre eles)
+    missing = [m for m in (_missing(p) for p in inputs) if m]
+    for m in missing:
+        _print_progress(m)
+    existing = [p for p in inputs if os.path.isfile(p)]
+    if not existing:
+        return missing
+    if args.command == "keys":
+        result = task(batch_tasks.extract_keys)(existing, args.output, skip_dir=args.skip_dir, cancel_token=cancel_token)
+    else:
+        result = task(batch_tasks.download_keys)(existing, args.output_dir, workers=args.workers,
+                                                 requests_per_second=args.rps, cancel_token=cancel_token)
+    _print_progress(result)
+    return missing + [result]
+
+
+def write_summary(args, results: List[Dict], started: datetime.datetime, duration: float):
+    ok = sum(1 for r in results if r['sucesso'])
+    summary = {
+        'comando': args.command,
+        'inicio': started.isoformat(timespec='seconds'),
+        'duracao_s': round(duration, 3),
+        'total': len(results),
+        'sucesso': ok,
+        'falhas': len(results) - ok,
+        'resultados': results,
+    }
+    if args.json:
+        text = json.dumps(summary, ensure_ascii=False, indent=2, default=str)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                f.write(text + "\n")
+    if args.json != "-":
+        print(f"{args.command}: {ok} de {len(results)} concluídos em {duration:.1f}s.")
+
+
+def run_watch(args) -> int:
+    from src.utils.watch_folder import WatchFolderService
+
+    if not os.path.isdir(args.watch_dir):
+        print(f"Pasta não encontrada: {args.watch_dir}", file=sys.stderr)
+        return EXIT_USAGE
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+    service = WatchFolderService(args.watch_dir, args.results, pipelines=args.only, workers=args.workers,
+                                 poll_interval=args.interval, settle_seconds=args.settle)
+    stop_event = threading.Event()
+    try:
+        service.run(stop_event, once=args.once)
+    except KeyboardInterrupt:
+        stop_event.set()
+        print("Interrompido.", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    if args.once and service.failures:
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def run_serve(args) -> int:
+    from src.utils.job_server import serve
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+    try:
+        serve(args.host, args.port, args.workers)
+    except KeyboardInterrupt:
+        print("Servidor encerrado.", file=sys.stderr)
+    except OSError as e:
+        print(f"Não foi possível abrir {args.host}:{args.port}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    return EXIT_OK
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'workers', 1) < 1:
+        print("--workers deve ser pelo menos 1.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.command == "watch":
+        return run_watch(args)
+    if args.command == "serve":
+        return run_serve(args)
+
+    cancel_token = CancelToken()
+    started = datetime.datetime.now()
+    t0 = time.perf_counter()
+    try:
+        results = run_command(args, cancel_token)
+    except KeyboardInterrupt:
+        cancel_token.cancel()
+        print("Interrompido.", file=sys.stderr)
+        return EXIT_INTERRUPTED
+
+    if not results:
+        print("Nenhuma entrada encontrada.", file=sys.stderr)
+        return EXIT_USAGE
+
+    write_summary(args, results, started, time.perf_counter() - t0)
+    return EXIT_OK if all(r['sucesso'] for r in results) else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -6,4 +6,42 @@ SIEG_EMAIL = "andre@massucatti.cnt.br"
 
 # Configurações de Download
 DOWNLOAD_TIMEOUT = 30  # Aumentamos para 30 segundos para evitar o erro de TimeOut
-MAX_RETRIES = 3        # Tenta 3 vezes antes de desistir
\ No newline at end of file
+MAX_RETRIES = 3        # Tenta 3 vezes antes de desistir
+
+# Segurança (bcrypt)
+BCRYPT_ROUNDS = None     # None = calibra automaticamente no primeiro uso (salvo no banco)
+BCRYPT_TARGET_MS = 250   # Tempo alvo de um hash de senha na calibração automática
+
+# Abertura do programa
+PREWARM_AFTER_LOGIN = True  # Carrega pandas/openpyxl em segundo plano logo após o login
+
+# Tarefas em segundo plano
+MAX_CONCURRENT_JOBS = 2  # Ferramentas executando ao mesmo tempo (as demais aguardam na fila)
+UI_REFRESH_HZ = 10       # Atualizações de progresso por segundo enviadas à interface
+
+# Pasta monitorada (python -m src.cli watch)
+WATCH_POLL_INTERVAL = 5        # Segundos entre varreduras da pasta
+WATCH_SETTLE_SECONDS = 10      # Tempo sem alteração para considerar a cópia concluída
+WATCH_DEBOUNCE_SECONDS = 1     # Agrupa rajadas de eventos do sistema de arquivos (watchdog)
+WATCH_MAX_WORKERS = 2          # Arquivos processados ao mesmo tempo
+WATCH_PIPELINES = ('contrib', 'keys', 'difal')  # Etapas automáticas habilitadas
+
+# Servidor de tarefas (python -m src.cli serve)
+JOB_SERVER_URL = None            # Ex: "http://servidor:8765"; None = ferramentas rodam nesta máquina
+JOB_SERVER_HOST = "127.0.0.1"    # Interface em que o servidor escuta ("0.0.0.0" para a rede)
+JOB_SERVER_PORT = 8765
+JOB_SERVER_WORKERS = None        # Processos do servidor; None = um por núcleo
+JOB_SERVER_TOKEN_TTL = 12 * 3600 # Validade da sessão das estações (segundos)
+
+# Medição de desempenho das ferramentas (tempos por etapa no log da sessão e no painel de Tarefas)
+PROFILE_STAGES = True          # Tempos por etapa de cada tarefa (custo desprezível)
+PROFILE_CPROFILE = False       # cProfile da tarefa: funções mais demoradas (deixa a tarefa bem mais lenta)
+PROFILE_TRACEMALLOC = False    # Pico de memória e maiores alocações (deixa a tarefa mais lenta)
+PROFILE_TOP_N = 15             # Linhas do cProfile / alocações exibidas
+
+# Métricas (contadores de tarefas e da API da Sieg)
+METRICS_PORT = 9464                # Endpoint OpenMetrics em http://127.0.0.1:9464/metrics; None = desativado
+METRICS_SNAPSHOT_INTERVAL = 300    # Segundos entre snapshots em logs/metrics_AAAAMMDD.jsonl; None = desativado
+
+# Relatório DIFAL
+DIFAL_WORKERS = None  # Processos na leitura de pastas grandes / vários ZIPs; None = um por núcleo, 1 = desativa
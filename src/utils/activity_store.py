@@ -0,0 +1,114 @@
+import os
+import re
+import time
+import datetime
+from .database import get_connection, transaction, get_setting, set_setting
+from .logger import LOG_DIR
+
+# session_{usuario}_{AAAAMMDD_HHMMSS}.txt
+_SESSION_FILE = re.compile(r'^session_(.*)_(\d{8}_\d{6})\.txt$')
+# Cabeçalho: "Session started for user: {usuario} at {data}"
+_SESSION_HEADER = re.compile(r'^Session started for user: (.*) at \d{4}-')
+# [HH:MM:SS] mensagem
+_LOG_LINE = re.compile(r'^\[(\d{2}:\d{2}:\d{2})\] (.*)$')
+
+LEGACY_IMPORT_SETTING = 'activity_legacy_import_done'
+
+
+def record_session(username, started_at, log_file):
+    """Registra o início de uma sessão (started_at: datetime)."""
+    with transaction() as conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO sessions (username, started_at, day, log_file) VALUES (?, ?, ?, ?)',
+            (username, started_at.isoformat(timespec='seconds'), started_at.date().isoformat(), log_file)
+        )
+
+
+def record_events(events):
+    """Grava um lote de eventos do logger (dicts com ts, user, action, message, duration_s)."""
+    rows = [
+        (e['ts'], e['ts'][:10], e.get('user'), e.get('action'), e.get('message'), e.get('duration_s'))
+        for e in events
+    ]
+    if not rows:
+        return
+    with transaction() as conn:
+        conn.executemany(
+            'INSERT INTO activity_events (ts, day, username, action, message, duration_s) VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+
+
+def count_sessions_on(day=None):
+    """Quantidade de sessões iniciadas no dia (padrão: hoje)."""
+    day = (day or datetime.date.today()).isoformat()
+    return get_connection().execute('SELECT COUNT(*) FROM sessions WHERE day = ?', (day,)).fetchone()[0]
+
+
+def recent_actions(limit=5):
+    """Últimas ações registradas: lista de (ts, usuário, mensagem)."""
+    return get_connection().execute(
+        'SELECT ts, username, message FROM activity_events ORDER BY ts DESC LIMIT ?', (limit,)
+    ).fetchall()
+
+
+def user_activity(username, limit=20):
+    """Últimas ações de um usuário: lista de (ts, ação, mensagem, duração)."""
+    return get_connection().execute(
+        'SELECT ts, action, message, duration_s FROM activity_events WHERE username = ? ORDER BY ts DESC LIMIT ?',
+        (username, limit)
+    ).fetchall()
+
+
+def import_legacy_logs(log_dir=LOG_DIR):
+    """
+    Importa (uma única vez) as sessões e ações dos arquivos session_*.txt
+    criados antes do índice existir. Retorna a quantidade de sessões importadas.
+    """
+    if get_setting(LEGACY_IMPORT_SETTING) or not os.path.isdir(log_dir):
+        set_setting(LEGACY_IMPORT_SETTING, 1)
+        return 0
+
+    # Sessões abertas a partir de agora já são registradas pelo logger
+    cutoff = time.time()
+    imported = 0
+    conn = get_connection()
+
+    for entry in os.scandir(log_dir):
+        match = _SESSION_FILE.match(entry.name)
+        if not match or not entry.is_file() or entry.stat().st_mtime >= cutoff:
+            continue
+        username = match.group(1)
+        try:
+            started_at = datetime.datetime.strptime(match.group(2), "%Y%m%d_%H%M%S")
+        except ValueError:
+            continue
+
+        events = []
+        with open(entry.path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                header = _SESSION_HEADER.match(line)
+                if header:
+                    # O nome do arquivo é sanitizado; o cabeçalho tem o usuário original
+                    username = header.group(1)
+                    continue
+                log_line = _LOG_LINE.match(line.rstrip('\n'))
+                if log_line:
+                    ts = f"{started_at.date().isoformat()}T{log_line.group(1)}.000"
+                    events.append((ts, log_line.group(2)))
+        events = [(ts, ts[:10], username, message, message, None) for ts, message in events]
+
+        with conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO sessions (username, started_at, day, log_file) VALUES (?, ?, ?, ?)',
+                (username, started_at.isoformat(timespec='seconds'), started_at.date().isoformat(), entry.name)
+            )
+            if cursor.rowcount:
+                conn.executemany(
+                    'INSERT INTO activity_events (ts, day, username, action, message, duration_s) VALUES (?, ?, ?, ?, ?, ?)',
+                    events
+                )
+                imported += 1
+
+    set_setting(LEGACY_IMPORT_SETTING, 1)
+    return imported
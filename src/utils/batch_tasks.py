@@ -0,0 +1,217 @@
+"""
+Execução das ferramentas sem interface (linha de comando, servidor de build).
+
+Cada função processa uma entrada e devolve um dicionário serializável em JSON:
+    {'entrada', 'sucesso', 'mensagem', 'saida', 'duracao_s', ...}
+As funções ficam no nível do módulo para poderem rodar num ProcessPoolExecutor.
+Nenhuma delas importa flet.
+"""
+import os
+import time
+import itertools
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.utils.cancellation import CancelToken, OperationCancelled, CANCELLED_MSG
+
+# Quantidade máxima de problemas de validação incluídos no resumo
+MAX_PROBLEMS_IN_RESULT = 50
+
+
+def _result(entrada, t0: float, sucesso: bool, mensagem: str, saida: Optional[str] = None, **extra) -> Dict:
+    result = {
+        'entrada': entrada,
+        'sucesso': bool(sucesso),
+        'mensagem': mensagem,
+        'saida': saida,
+        'duracao_s': round(time.perf_counter() - t0, 3),
+    }
+    result.update(extra)
+    return result
+
+
+def _output_path(input_path: str, output_dir: Optional[str], name: str) -> str:
+    folder = output_dir or os.path.dirname(os.path.abspath(input_path))
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+
+def contrib_report(input_path: str, output_dir: Optional[str] = None,
+                   cancel_token: Optional[CancelToken] = None) -> Dict:
+    """Planilha de apuração da EFD Contribuições (mesmo nome de saída da tela SPED)."""
+    from src.utils.sped_parser import process_sped_file
+    from src.utils.report_generator import generate_fiscal_report
+
+    t0 = time.perf_counter()
+    out_path = _output_path(input_path, output_dir, f"RELATORIO_{os.path.basename(input_path)}.xlsx")
+    try:
+        df = process_sped_file(input_path, cancel_token=cancel_token)
+        if df is None or df.empty:
+            return _result(input_path, t0, False, "Nenhum dado encontrado.")
+        if cancel_token: cancel_token.check()
+        if not generate_fiscal_report(df, out_path):
+            return _result(input_path, t0, False, "Erro ao salvar Excel.")
+        return _result(input_path, t0, True, f"Sucesso: {out_path}", out_path, linhas=len(df))
+    except OperationCancelled:
+        return _result(input_path, t0, False, CANCELLED_MSG)
+    except Exception as e:
+        return _result(input_path, t0, False, f"Erro: {e}")
+
+
+def filter_by_date(input_path: str, start_date: date, end_date: date, output_dir: Optional[str] = None,
+                   output_path: Optional[str] = None, progress_callback: Optional[Callable[[int], None]] = None,
+                   cancel_token: Optional[CancelToken] = None) -> Dict:
+    """SPED recortado no período, com o Bloco 9 recalculado. output_path tem precedência sobre output_dir."""
+    from src.utils.sped_filter_logic import SpedFilterLogic
+
+    t0 = time.perf_counter()
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    out_path = output_path or _output_path(input_path, output_dir,
+                                           f"{stem}_FILTRADO_{start_date:%d%m%Y}_{end_date:%d%m%Y}.txt")
+    success, msg = SpedFilterLogic().filter_sped_by_date(
+        input_path, out_path, start_date, end_date, progress_callback=progress_callback, cancel_token=cancel_token
+    )
+    return _result(input_path, t0, success, msg, out_path if success else None)
+
+
+def validate(input_path: str, progress_callback: Optional[Callable[[int], None]] = None,
+             max_problems: Optional[int] = MAX_PROBLEMS_IN_RESULT,
+             cancel_token: Optional[CancelToken] = None) -> Dict:
+    """
+    Conferência do Bloco 9 e do leiaute das linhas.
+    max_problems: problemas incluídos no resultado (None = todos, como na tela).
+    """
+    from src.utils.sped_validator import SpedValidatorLogic
+
+    t0 = time.perf_counter()
+    success, msg, problems = SpedValidatorLogic().validate_sped(
+        input_path, progress_callback=progress_callback, cancel_token=cancel_token
+    )
+    return _result(input_path, t0, success, msg, problemas=problems[:max_problems],
+                   total_problemas=len(problems))
+
+
+def overview(input_path: str) -> Dict:
+    """Visão geral rápida (tipo, empresa, período, histograma de registros)."""
+    from src.utils.sped_scanner import get_sped_overview
+
+    t0 = time.perf_counter()
+    try:
+        ov = get_sped_overview(input_path)
+    except Exception as e:
+        return _result(input_path, t0, False, f"Erro: {e}")
+    if ov is None:
+        return _result(input_path, t0, False, "Arquivo não encontrado.")
+    msg = f"{ov['tipo']} - {ov['empresa'] or '-'} ({ov['total_linhas']} linhas)"
+    return _result(input_path, t0, True, msg, visao_geral=ov)
+
+
+def extract_keys(input_paths: List[str], output_path: str, skip_dir: Optional[str] = None,
+                 progress_callback: Optional[Callable[[int], None]] = None,
+                 cancel_token: Optional[CancelToken] = None) -> Dict:
+    """
+    Chaves de entrada de vários SPEDs num único TXT, sem repetições entre arquivos.
+    skip_dir: pasta de XMLs já baixados, cujas chaves são descartadas.
+    """
+    from src.utils.keys_extractor_logic import KeysExtractorLogic
+    from src.utils.key_set import CompactKeySet
+
+    t0 = time.perf_counter()
+    already = CompactKeySet.from_directory(skip_dir) if skip_dir else None
+    success, msg, keys = KeysExtractorLogic().extract_keys_many(
+        input_paths, output_path, already_downloaded=already, progress_callback=progress_callback,
+        cancel_token=cancel_token
+    )
+    return _result(input_paths, t0, success, msg, output_path if success else None, chaves=len(keys))
+
+
+def download_keys(input_paths: List[str], output_dir: str, workers: int = 4, requests_per_second: float = 10.0,
+                  cancel_token: Optional[CancelToken] = None) -> Dict:
+    """
+    Extrai as chaves de entrada dos SPEDs e baixa os XMLs na Sieg pelo
+    KeyDownloadPipeline; chaves repetidas entre arquivos e XMLs já presentes
+    na pasta não são baixados de novo.
+    """
+    from src.utils.keys_extractor_logic import KeysExtractorLogic
+    from src.utils.key_download_pipeline import KeyDownloadPipeline
+    from src.utils.key_set import CompactKeySet
+    from src.utils.sieg_manager import SiegManager
+
+    t0 = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    logic = KeysExtractorLogic()
+    key_source = itertools.chain.from_iterable(
+        logic.iter_entry_keys(path, cancel_token=cancel_token) for path in input_paths
+    )
+    pipeline = KeyDownloadPipeline(SiegManager, workers=workers, requests_per_second=requests_per_second)
+    success, msg, stats = pipeline.run(
+        key_source, output_dir, skip_keys=CompactKeySet.from_directory(output_dir), cancel_token=cancel_token
+    )
+    return _result(input_paths, t0, success, msg, output_dir, estatisticas=stats)
+
+
+def difal_report(folder: str, output_dir: Optional[str] = None, detailed: bool = False,
+                 recursive: bool = True, workers: Optional[int] = None, save_items: bool = False,
+                 companion: Optional[str] = None, cancel_token: Optional[CancelToken] = None) -> Dict:
+    """
+    Cálculo de DIFAL/FCP dos XMLs de uma pasta (soltos, em subpastas ou em
+    ZIPs) e planilha Excel do resultado. workers: ver DifalLogic (None = padrão).
+    save_items: grava também a base por item (.npz) ao lado da planilha, para
+    difal_pivot agrupar sem reler os XMLs. companion: 'csv' ou 'parquet' com
+    todas as notas ao lado da planilha (ver DifalLogic.gerar_excel).
+    """
+    from src.utils.difal_logic import DifalLogic
+
+    t0 = time.perf_counter()
+    logic = DifalLogic()
+    options = {'workers': workers} if workers is not None else {}
+    success, msg, resumo, detalhes, erros = logic.calcular_difal_por_pasta(
+        folder, cancel_token=cancel_token, recursive=recursive, coletar_itens=save_items, **options
+    )
+    if not success:
+        return _result(folder, t0, False, msg)
+
+    name = f"DIFAL_{os.path.basename(os.path.normpath(folder))}.xlsx"
+    out_path = _output_path(os.path.join(folder, name), output_dir, name)
+    saved, save_msg = logic.gerar_excel(resumo, detalhes, out_path, incluir_detalhado=detailed,
+                                        complemento=companion)
+    if not saved:
+        return _result(folder, t0, False, save_msg)
+    extra = {}
+    if save_items:
+        base_path = os.path.splitext(out_path)[0] + ".npz"
+        saved, save_msg = logic.base_itens.salvar(base_path)
+        if not saved:
+            return _result(folder, t0, False, save_msg, out_path)
+        extra['base_itens'] = base_path
+    return _result(folder, t0, True, msg, out_path, resumo=resumo, notas=len(detalhes),
+                   erros=erros, **extra)
+
+
+def difal_pivot(base_path: str, by: Sequence[str], output_dir: Optional[str] = None,
+                check: bool = False, cancel_token: Optional[CancelToken] = None) -> Dict:
+    """
+    Agrupamento da base por item (.npz de difal_report com save_items) pelas
+    dimensões `by` em CSV. check: grava também os itens com cálculo divergente.
+    """
+    import pandas as pd
+    from src.utils.difal_dataset import DifalDataset
+
+    t0 = time.perf_counter()
+    loaded, msg, base = DifalDataset.carregar(base_path)
+    if not loaded:
+        return _result(base_path, t0, False, msg)
+
+    stem = os.path.splitext(os.path.basename(base_path))[0]
+    out_path = _output_path(base_path, output_dir, f"{stem}_{'_'.join(by)}.csv")
+    grupos = base.agrupar(by, somente_difal=True)
+    pd.DataFrame(grupos).to_csv(out_path, index=False, encoding='utf-8')
+    msg = f"{len(grupos['Itens'])} grupos de {len(base):,} itens."
+    extra = {}
+    if check:
+        divergencias = base.conferir_calculo()
+        check_path = _output_path(base_path, output_dir, f"{stem}_divergencias.csv")
+        pd.DataFrame(divergencias).to_csv(check_path, index=False, encoding='utf-8')
+        msg += f" {len(divergencias['Arquivo'])} itens com cálculo divergente."
+        extra['divergencias'] = check_path
+    return _result(base_path, t0, True, msg, out_path, **extra)
@@ -0,0 +1,34 @@
+import threading
+
+CANCELLED_MSG = "Operação cancelada pelo usuário."
+
+
+class OperationCancelled(Exception):
+    """Interrompe uma tarefa cujo CancelToken foi acionado."""
+
+    def __init__(self, message: str = CANCELLED_MSG):
+        super().__init__(message)
+
+
+class CancelToken:
+    """
+    Sinal de cancelamento repassado às classes de lógica (parâmetro cancel_token).
+    Os laços de processamento chamam check() periodicamente.
+
+    event: objeto com set()/is_set() a usar no lugar do threading.Event, por
+    exemplo um Manager().Event() para cancelar tarefas em outro processo.
+    """
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise OperationCancelled()
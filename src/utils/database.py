@@ -1,64 +1,332 @@
+import os
+import sys
+import math
+import time
 import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 import bcrypt
 from .logger import log_action
+from src.config import BCRYPT_ROUNDS, BCRYPT_TARGET_MS
 
-DB_FILE = "contabilidade.db"
 
-def get_connection():
-    return sqlite3.connect(DB_FILE)
+def _app_dir():
+    """Directory of the application (the executable folder when packaged)."""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def create_tables():
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    # Create users table
-    cursor.execute('''
+DB_FILE = os.path.join(_app_dir(), "contabilidade.db")
+
+# Applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+CACHED_STATEMENTS = 256
+
+# Schema migrations, applied in order. The index + 1 is stored in PRAGMA user_version.
+MIGRATIONS = [
+    # 1: users
+    '''
     CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT UNIQUE NOT NULL,
         password_hash BLOB NOT NULL,
         is_admin BOOLEAN NOT NULL DEFAULT 0,
         permissions TEXT
-    )
-    ''')
+    );
+    ''',
+    # 2: application settings (key/value)
+    '''
+    CREATE TABLE IF NOT EXISTS app_settings (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    ''',
+    # 3: activity index (sessions and logged actions) for the dashboard
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        started_at TEXT NOT NULL,
+        day TEXT NOT NULL,
+        log_file TEXT UNIQUE
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_day ON sessions (day);
+    CREATE TABLE IF NOT EXISTS activity_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TEXT NOT NULL,
+        day TEXT NOT NULL,
+        username TEXT,
+        action TEXT,
+        message TEXT,
+        duration_s REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_ts ON activity_events (ts);
+    CREATE INDEX IF NOT EXISTS idx_events_user_ts ON activity_events (username, ts);
+    ''',
+    # 4: history of background jobs (Jobs panel)
+    '''
+    CREATE TABLE IF NOT EXISTS job_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT NOT NULL,
+        label TEXT,
+        username TEXT,
+        status TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        duration_s REAL,
+        items INTEGER,
+        input_bytes INTEGER,
+        message TEXT
+    );
+    ''',
+]
+
+# bcrypt cost limits for the automatic calibration
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 16
+_bcrypt_rounds = None
+
+# One persistent connection per thread
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection():
+    """
+    Returns the persistent connection of the calling thread.
+    The connection is shared by every call in the thread: do not close it.
+    """
+    thread = threading.current_thread()
+    conn = _connections.get(thread)
+    if conn is None:
+        # check_same_thread=False only so dead threads' connections can be closed
+        # from here; each connection is still used by a single thread.
+        conn = sqlite3.connect(DB_FILE, timeout=5.0, cached_statements=CACHED_STATEMENTS,
+                               check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with _connections_lock:
+            _close_dead_connections()
+            _connections[thread] = conn
+    return conn
+
+
+def _close_dead_connections():
+    for thread in [t for t in _connections if not t.is_alive()]:
+        try:
+            _connections.pop(thread).close()
+        except sqlite3.Error:
+            pass
 
-    conn.commit()
-    conn.close()
+
+def close_connection():
+    """Closes the calling thread's connection (e.g. at the end of a long-lived worker)."""
+    with _connections_lock:
+        conn = _connections.pop(threading.current_thread(), None)
+    if conn is not None:
+        conn.close()
+
+
+@contextmanager
+def transaction():
+    """Commits on success and rolls back on error."""
+    conn = get_connection()
+    with conn:
+        yield conn
+
+
+def migrate():
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+        except sqlite3.Error:
+            # executescript stops at the failing statement, leaving the BEGIN open on
+            # this thread's shared connection: undo the partial migration
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+
+def create_tables():
+    migrate()
+
+def get_setting(key, default=None):
+    row = get_connection().execute('SELECT value FROM app_settings WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+def set_setting(key, value):
+    with transaction() as conn:
+        conn.execute('INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)', (key, str(value)))
+
+def benchmark_bcrypt_rounds(target_ms=BCRYPT_TARGET_MS):
+    """
+    Measures bcrypt on this machine and returns the cost factor whose hash time
+    is closest to target_ms (each extra round doubles the time).
+    """
+    start = time.perf_counter()
+    bcrypt.hashpw(b"benchmark", bcrypt.gensalt(MIN_BCRYPT_ROUNDS))
+    elapsed_ms = max((time.perf_counter() - start) * 1000, 0.001)
+    rounds = MIN_BCRYPT_ROUNDS + round(math.log2(target_ms / elapsed_ms))
+    return max(MIN_BCRYPT_ROUNDS, min(MAX_BCRYPT_ROUNDS, rounds))
+
+def get_bcrypt_rounds():
+    """
+    Configured bcrypt cost: config.BCRYPT_ROUNDS if set, otherwise the value
+    calibrated on the first run and stored in app_settings.
+    """
+    global _bcrypt_rounds
+    if BCRYPT_ROUNDS:
+        return BCRYPT_ROUNDS
+    if _bcrypt_rounds is None:
+        stored = get_setting('bcrypt_rounds')
+        if stored is None:
+            stored = benchmark_bcrypt_rounds()
+            set_setting('bcrypt_rounds', stored)
+            log_action(f"bcrypt cost calibrated: {stored} rounds")
+        _bcrypt_rounds = int(stored)
+    return _bcrypt_rounds
+
+def hash_password(password, rounds=None):
+    salt = bcrypt.gensalt(rounds or get_bcrypt_rounds())
+    return bcrypt.hashpw(password.encode('utf-8'), salt)
+
+def get_hash_rounds(stored_hash):
+    """Cost factor of a stored hash ($2b$12$... -> 12)."""
+    try:
+        return int(bytes(stored_hash).split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
 
 def create_user(username, password, is_admin=False, permissions=""):
     """
     Creates a new user.
     permissions: comma-separated string, e.g. "dashboard,sped"
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Hash password
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    hashed = hash_password(password)
 
     try:
-        cursor.execute('''
-        INSERT INTO users (username, password_hash, is_admin, permissions)
-        VALUES (?, ?, ?, ?)
-        ''', (username, hashed, is_admin, permissions))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute('''
+            INSERT INTO users (username, password_hash, is_admin, permissions)
+            VALUES (?, ?, ?, ?)
+            ''', (username, hashed, is_admin, permissions))
         log_action(f"User created: {username} (Admin: {is_admin})")
         return True
     except sqlite3.IntegrityError:
         log_action(f"Failed to create user: {username} already exists")
         return False
-    finally:
-        conn.close()
 
-def get_user_by_username(username):
+# Set in each pool process by _init_hash_worker
+_hash_counter = None
+
+def _init_hash_worker(counter):
+    global _hash_counter
+    _hash_counter = counter
+
+def _hash_password_job(args):
+    # Top-level so it can be pickled by the process pool
+    password, rounds = args
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
+    if _hash_counter is not None:
+        _hash_counter.add()
+    return hashed
+
+def bulk_create_users(rows, max_workers=None, progress_counter=None):
+    """
+    Creates many users at once.
+    rows: iterable of (line, username, password, is_admin, permissions)
+    Passwords are hashed in parallel across a process pool and every row is
+    inserted in a single transaction.
+    progress_counter: optional SharedCounter incremented by the pool
+    processes after each hash (read by the UI through the ProgressBus).
+    Returns (created_usernames, conflicts) where conflicts is a list of
+    (line, username, reason).
+    """
+    conflicts = []
+    pending = []
+    seen = set()
+    existing = {r[0] for r in get_connection().execute('SELECT username FROM users')}
+
+    for line, username, password, is_admin, permissions in rows:
+        if not username or not password:
+            conflicts.append((line, username, "usuário e senha são obrigatórios"))
+        elif username in seen:
+            conflicts.append((line, username, "duplicado no arquivo"))
+        elif username in existing:
+            conflicts.append((line, username, "usuário já existe"))
+        else:
+            seen.add(username)
+            pending.append((line, username, password, bool(is_admin), permissions or ""))
+
+    if not pending:
+        return [], conflicts
+
+    rounds = get_bcrypt_rounds()
+    jobs = [(password, rounds) for _, _, password, _, _ in pending]
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_hash_worker,
+                                 initargs=(progress_counter,)) as pool:
+            hashes = list(pool.map(_hash_password_job, jobs, chunksize=max(1, len(jobs) // (4 * (os.cpu_count() or 1)))))
+    else:
+        hashes = [_hash_password_job(jobs[0])]
+        if progress_counter is not None:
+            progress_counter.add()
+
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = cursor.fetchone()
-    conn.close()
+    with conn:
+        # Write lock up front: nobody can create the same usernames meanwhile
+        conn.execute("BEGIN IMMEDIATE")
+        taken = {r[0] for r in conn.execute('SELECT username FROM users')}
+        new_rows = []
+        for (line, username, _, is_admin, permissions), hashed in zip(pending, hashes):
+            if username in taken:
+                conflicts.append((line, username, "usuário já existe"))
+            else:
+                new_rows.append((username, hashed, is_admin, permissions))
+        conn.executemany('''
+        INSERT INTO users (username, password_hash, is_admin, permissions)
+        VALUES (?, ?, ?, ?)
+        ''', new_rows)
+    created = [r[0] for r in new_rows]
+
+    log_action(f"Bulk user import: {len(created)} created, {len(conflicts)} conflicts")
+    return created, conflicts
+
+def authenticate(username, password):
+    """
+    Returns the user row if the credentials are valid, otherwise None.
+    Hashes made with a cost different from the configured one are
+    transparently replaced after a successful login.
+    """
+    user = get_user_by_username(username)
+    if not user or not verify_password(user[2], password):
+        return None
+
+    rounds = get_bcrypt_rounds()
+    if get_hash_rounds(user[2]) != rounds:
+        new_hash = hash_password(password, rounds)
+        with transaction() as conn:
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user[0]))
+        log_action(f"Password rehashed for {username} ({get_hash_rounds(user[2])} -> {rounds} rounds)")
+        user = get_user_by_username(username)
     return user
 
+def get_user_by_username(username):
+    return get_connection().execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+
+def list_users():
+    return get_connection().execute("SELECT id, username, is_admin, permissions FROM users").fetchall()
+
 def verify_password(stored_hash, password):
     """
     Verifies a password against the stored hash.
@@ -66,12 +334,7 @@ def verify_password(stored_hash, password):
     return bcrypt.checkpw(password.encode('utf-8'), stored_hash)
 
 def get_total_users():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM users')
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    return get_connection().execute('SELECT COUNT(*) FROM users').fetchone()[0]
 
 def initialize_db():
     create_tables()
@@ -0,0 +1,275 @@
+"""
+Base por item dos XMLs do DIFAL, em colunas (arrays NumPy).
+
+A leitura dos XMLs (DifalLogic.calcular_difal_por_pasta com coletar_itens=True)
+guarda cada item da nota uma única vez; a partir daí os agrupamentos (por UF,
+CFOP, NCM, mês, emitente...) e a conferência do cálculo rodam sobre os arrays,
+sem reler os arquivos. A base pode ser salva em .npz (salvar/carregar) e, com
+o pyarrow instalado, exportada para Parquet.
+
+Textos repetidos (UF, CFOP, NCM, chave...) ficam como códigos inteiros mais a
+lista de categorias em ordem alfabética, então ordenar pelos códigos é o mesmo
+que ordenar pelos textos.
+"""
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Colunas de texto (categorias) e numéricas, na ordem das linhas do scanner
+CATEGORICAL = ('arquivo', 'chave', 'numero', 'mes', 'emitente', 'uf_emit', 'uf_dest', 'cfop', 'ncm')
+NUMERIC = ('n_item', 'v_prod', 'v_bc_uf_dest', 'v_bc_fcp_uf_dest', 'p_fcp_uf_dest', 'p_icms_uf_dest',
+           'p_icms_inter', 'p_icms_inter_part', 'v_fcp_uf_dest', 'v_icms_uf_dest', 'v_icms_uf_remet')
+COLUMNS = CATEGORICAL + NUMERIC
+
+# Tags do grupo ICMSUFDest lidas de cada item (mesma ordem de NUMERIC[2:])
+UF_DEST_TAGS = ('vBCUFDest', 'vBCFCPUFDest', 'pFCPUFDest', 'pICMSUFDest', 'pICMSInter',
+                'pICMSInterPart', 'vFCPUFDest', 'vICMSUFDest', 'vICMSUFRemet')
+
+# Nomes exibidos nos agrupamentos
+DIMENSIONS = {
+    'uf_dest': 'UF Destino',
+    'uf_emit': 'UF Emitente',
+    'cfop': 'CFOP',
+    'ncm': 'NCM',
+    'mes': 'Mês',
+    'emitente': 'Emitente',
+}
+VALUES = {
+    'v_icms_uf_dest': 'DIFAL',
+    'v_fcp_uf_dest': 'FCP',
+    'v_icms_uf_remet': 'ICMS UF Remetente',
+    'v_bc_uf_dest': 'Base DIFAL',
+    'v_prod': 'Valor Produtos',
+}
+DEFAULT_VALUES = ('v_icms_uf_dest', 'v_fcp_uf_dest')
+
+# Agrupamentos oferecidos na tela (nome -> dimensões)
+AGRUPAMENTOS = {
+    "UF Destino": ('uf_dest',),
+    "CFOP": ('cfop',),
+    "NCM": ('ncm',),
+    "Mês": ('mes',),
+    "Emitente": ('emitente',),
+    "Mês x UF": ('mes', 'uf_dest'),
+    "UF x CFOP": ('uf_dest', 'cfop'),
+    "UF x NCM": ('uf_dest', 'ncm'),
+}
+
+_FORMAT_VERSION = 1
+
+
+def new_columns() -> List[list]:
+    """Listas vazias, uma por coluna, para o scanner preencher (ver DifalDataset.from_parts)."""
+    return [[] for _ in COLUMNS]
+
+
+class DifalDataset:
+    """Itens das notas lidas: uma linha por item (det) de cada NF-e."""
+
+    def __init__(self, codes: Dict[str, np.ndarray], categories: Dict[str, List[str]],
+                 numbers: Dict[str, np.ndarray]):
+        self.codes = codes
+        self.categories = categories
+        self.numbers = numbers
+        self.total = len(numbers['n_item'])
+
+    # ------------------------------------------------------------------
+    # Construção
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_parts(cls, parts: Sequence[List[list]]) -> 'DifalDataset':
+        """Junta as colunas (listas de new_columns()) de cada unidade lida."""
+        codes: Dict[str, np.ndarray] = {}
+        categories: Dict[str, List[str]] = {}
+        numbers: Dict[str, np.ndarray] = {}
+        for pos, name in enumerate(COLUMNS):
+            if name in CATEGORICAL:
+                codes[name], categories[name] = _encode(part[pos] for part in parts)
+            else:
+                dtype = np.int32 if name == 'n_item' else np.float64
+                arrays = [np.asarray(part[pos], dtype=dtype) for part in parts]
+                numbers[name] = np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+        return cls(codes, categories, numbers)
+
+    def __len__(self) -> int:
+        return self.total
+
+    @property
+    def notas(self) -> int:
+        """Notas distintas (uma por arquivo)."""
+        return len(np.unique(self.codes['arquivo'])) if self.total else 0
+
+    def column(self, name: str) -> np.ndarray:
+        """Coluna completa; as de texto são decodificadas (array de objetos)."""
+        if name in self.numbers:
+            return self.numbers[name]
+        return np.asarray(self.categories[name], dtype=object)[self.codes[name]]
+
+    # ------------------------------------------------------------------
+    # Agrupamentos
+    # ------------------------------------------------------------------
+    def agrupar(self, por: Sequence[str], valores: Sequence[str] = DEFAULT_VALUES,
+                somente_difal: bool = False) -> Dict[str, list]:
+        """
+        Soma os valores por combinação das dimensões (ver DIMENSIONS), ordenado
+        pelas dimensões. Retorna as colunas prontas para a grade / DataFrame,
+        com a quantidade de notas e de itens de cada grupo.
+
+        somente_difal: considera apenas itens com DIFAL ou FCP.
+        """
+        por = list(por)
+        unknown = [d for d in por if d not in DIMENSIONS] + [v for v in valores if v not in VALUES]
+        if not por or unknown:
+            raise ValueError(f"Agrupamento inválido: {', '.join(unknown) or 'informe ao menos uma dimensão'}")
+
+        mask = self._difal_mask() if somente_difal else None
+        sizes = [len(self.categories[d]) for d in por]
+        # Uma chave inteira por combinação (base mista); ordenar a chave = ordenar as dimensões
+        key = np.zeros(self.total, dtype=np.int64)
+        for dim, size in zip(por, sizes):
+            key = key * size + self.codes[dim]
+        if mask is not None:
+            key = key[mask]
+
+        groups, inverse = np.unique(key, return_inverse=True)
+        inverse = inverse.ravel()
+        result: Dict[str, list] = {}
+        remaining = groups
+        decoded = []
+        for dim, size in reversed(list(zip(por, sizes))):
+            remaining, code = np.divmod(remaining, size)
+            decoded.append((dim, code))
+        for dim, code in reversed(decoded):
+            labels = np.asarray(self.categories[dim], dtype=object)[code]
+            result[DIMENSIONS[dim]] = labels.tolist()
+
+        for name in valores:
+            values = self.numbers[name] if mask is None else self.numbers[name][mask]
+            sums = np.bincount(inverse, weights=values, minlength=len(groups))
+            result[VALUES[name]] = np.round(sums, 2).tolist()
+
+        # Notas distintas por grupo: pares (grupo, arquivo) únicos
+        notes = self.codes['arquivo'] if mask is None else self.codes['arquivo'][mask]
+        n_files = max(len(self.categories['arquivo']), 1)
+        pairs = np.unique(inverse.astype(np.int64) * n_files + notes)
+        result['Notas'] = np.bincount(pairs // n_files, minlength=len(groups)).tolist()
+        result['Itens'] = np.bincount(inverse, minlength=len(groups)).tolist()
+        return result
+
+    def conferir_calculo(self, tolerancia: float = 0.01) -> Dict[str, list]:
+        """
+        Recalcula o DIFAL e o FCP de cada item com ICMSUFDest e devolve os
+        itens em que o valor informado difere do calculado além da tolerância:
+
+            DIFAL = vBCUFDest x (pICMSUFDest - pICMSInter) x pICMSInterPart
+            FCP   = vBCFCPUFDest (ou vBCUFDest) x pFCPUFDest
+        """
+        n = self.numbers
+        rows = np.flatnonzero(n['v_bc_uf_dest'] > 0)
+        base = n['v_bc_uf_dest'][rows]
+        partilha = n['p_icms_inter_part'][rows]
+        partilha = np.where(partilha > 0, partilha, 100.0)
+        difal = np.round(base * (n['p_icms_uf_dest'][rows] - n['p_icms_inter'][rows]) / 100 * partilha / 100, 2)
+        base_fcp = np.where(n['v_bc_fcp_uf_dest'][rows] > 0, n['v_bc_fcp_uf_dest'][rows], base)
+        fcp = np.round(base_fcp * n['p_fcp_uf_dest'][rows] / 100, 2)
+
+        diff_difal = n['v_icms_uf_dest'][rows] - difal
+        diff_fcp = n['v_fcp_uf_dest'][rows] - fcp
+        # Folga para o arredondamento em ponto flutuante
+        wrong = (np.abs(diff_difal) > tolerancia + 1e-9) | (np.abs(diff_fcp) > tolerancia + 1e-9)
+        rows, difal, fcp = rows[wrong], difal[wrong], fcp[wrong]
+        diff_difal, diff_fcp = diff_difal[wrong], diff_fcp[wrong]
+
+        def text(name):
+            return np.asarray(self.categories[name], dtype=object)[self.codes[name][rows]].tolist()
+
+        def number(name):
+            return n[name][rows].tolist()
+
+        return {
+            'Arquivo': text('arquivo'),
+            'Chave de Acesso': text('chave'),
+            'Item': number('n_item'),
+            'UF': text('uf_dest'),
+            'Base DIFAL': number('v_bc_uf_dest'),
+            'Alíq. Destino': number('p_icms_uf_dest'),
+            'Alíq. Inter': number('p_icms_inter'),
+            'DIFAL Informado': number('v_icms_uf_dest'),
+            'DIFAL Calculado': difal.tolist(),
+            'Dif. DIFAL': np.round(diff_difal, 2).tolist(),
+            'FCP Informado': number('v_fcp_uf_dest'),
+            'FCP Calculado': fcp.tolist(),
+            'Dif. FCP': np.round(diff_fcp, 2).tolist(),
+        }
+
+    def _difal_mask(self) -> np.ndarray:
+        return (self.numbers['v_icms_uf_dest'] > 0) | (self.numbers['v_fcp_uf_dest'] > 0)
+
+    # ------------------------------------------------------------------
+    # Arquivo
+    # ------------------------------------------------------------------
+    def salvar(self, path: str) -> Tuple[bool, str]:
+        """Grava a base em .npz compactado (reaberta com carregar, sem reler os XMLs)."""
+        arrays = {'versao': np.array(_FORMAT_VERSION)}
+        for name in CATEGORICAL:
+            arrays[f'cod_{name}'] = self.codes[name]
+            arrays[f'cat_{name}'] = np.asarray(self.categories[name], dtype=str)
+        for name in NUMERIC:
+            arrays[f'num_{name}'] = self.numbers[name]
+        try:
+            # np.savez acrescenta .npz a nomes sem extensão: grava pelo arquivo aberto
+            with open(path, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+        except OSError as e:
+            return False, f"Erro ao salvar a base: {e}"
+        return True, f"Base salva: {len(self):,} itens em {os.path.basename(path)}."
+
+    @classmethod
+    def carregar(cls, path: str) -> Tuple[bool, str, Optional['DifalDataset']]:
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['versao']) != _FORMAT_VERSION:
+                    return False, "Versão da base não suportada.", None
+                codes = {name: data[f'cod_{name}'] for name in CATEGORICAL}
+                categories = {name: data[f'cat_{name}'].tolist() for name in CATEGORICAL}
+                numbers = {name: data[f'num_{name}'] for name in NUMERIC}
+        except (OSError, KeyError, ValueError) as e:
+            return False, f"Base inválida ({e}).", None
+        dataset = cls(codes, categories, numbers)
+        return True, f"{len(dataset):,} itens carregados.", dataset
+
+    def to_dataframe(self):
+        """DataFrame com as colunas de texto como Categorical (sem copiar os textos)."""
+        import pandas as pd
+
+        frame = {}
+        for name in COLUMNS:
+            if name in CATEGORICAL:
+                frame[name] = pd.Categorical.from_codes(self.codes[name], self.categories[name])
+            else:
+                frame[name] = self.numbers[name]
+        return pd.DataFrame(frame)
+
+    def exportar_parquet(self, path: str) -> Tuple[bool, str]:
+        """Parquet da base (precisa do pyarrow)."""
+        try:
+            self.to_dataframe().to_parquet(path, index=False)
+        except ImportError:
+            return False, "Exportar Parquet requer o pacote pyarrow."
+        except OSError as e:
+            return False, f"Erro ao salvar Parquet: {e}"
+        return True, f"Parquet salvo: {os.path.basename(path)}."
+
+
+def _encode(columns) -> Tuple[np.ndarray, List[str]]:
+    """Códigos int32 e categorias em ordem alfabética de várias listas de texto."""
+    index: Dict[str, int] = {}
+    chunks = [np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int32, count=len(values))
+              for values in columns]
+    codes = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32)
+    categories = list(index)
+    order = sorted(range(len(categories)), key=categories.__getitem__)
+    rank = np.empty(len(categories), dtype=np.int32)
+    rank[order] = np.arange(len(categories), dtype=np.int32)
+    return rank[codes] if len(categories) else codes, [categories[i] for i in order]
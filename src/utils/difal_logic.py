@@ -1,15 +1,46 @@
 import os
-import pandas as pd
+import csv
+import zipfile
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.config import DIFAL_WORKERS
+from src.utils import profiling
+from src.utils.difal_dataset import DifalDataset, UF_DEST_TAGS, new_columns
+from src.utils.cancellation import CancelToken, OperationCancelled, CANCELLED_MSG
+
+# Namespace padrão da NFe (versão 4.00 geralmente usa este)
+NS = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
+
+# Tags com namespace lidas de cada item na base por item
+_UF_DEST_POS = {f"{{{NS['nfe']}}}{tag}": pos for pos, tag in enumerate(UF_DEST_TAGS)}
+_CFOP, _NCM, _V_PROD = (f"{{{NS['nfe']}}}{tag}" for tag in ('CFOP', 'NCM', 'vProd'))
+
+# XMLs por unidade de trabalho (um pedaço de pasta ou de um ZIP)
+CHUNK_SIZE = 1000
+# Abaixo disso a leitura fica num processo só (abrir o pool custa mais que ganha)
+PARALLEL_MIN_FILES = 2000
+
 
 class DifalLogic:
     def __init__(self):
-        # Namespace padrão da NFe (versão 4.00 geralmente usa este)
-        self.ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
+        self.ns = NS
+        # Base por item da última leitura com coletar_itens=True
+        self.base_itens: Optional[DifalDataset] = None
+        # XMLs encontrados na última leitura (soltos e dentro dos ZIPs)
+        self.total_arquivos = 0
 
-    def calcular_difal_por_pasta(self, folder_path):
+    def calcular_difal_por_pasta(self, folder_path, cancel_token=None, recursive=True,
+                                 workers: Optional[int] = DIFAL_WORKERS, coletar_itens=False):
         """
         Lê XMLs de uma pasta e extrai valores de DIFAL e FCP.
+        Os XMLs podem estar soltos, em subpastas (recursive) ou dentro de
+        arquivos .zip, lidos direto do arquivo compactado, sem extrair.
+        cancel_token: CancelToken opcional, verificado a cada arquivo.
+        workers: processos para pastas grandes (None = um por núcleo, 1 = sem paralelismo).
+        coletar_itens: guarda também os itens de cada nota em self.base_itens
+        (DifalDataset), para agrupar por CFOP, NCM, mês... sem reler os XMLs.
         
         Retorna uma tupla com 5 elementos:
         1. Sucesso (bool)
@@ -18,109 +49,40 @@ class DifalLogic:
         4. Lista Detalhada (Nota a Nota)
         5. Lista de Erros (Arquivos que falharam)
         """
-        resultados_uf = {}
-        lista_detalhada = []
-        lista_erros = []
-        
+        self.total_arquivos = 0
         # Validação da pasta
         if not folder_path or not os.path.exists(folder_path):
             return False, "Pasta inválida ou não encontrada.", [], [], []
 
-        # Lista apenas arquivos XML
-        lista_arquivos = [f for f in os.listdir(folder_path) if f.lower().endswith('.xml')]
-        total_arquivos = len(lista_arquivos)
+        # Lista os XMLs (soltos e dentro dos ZIPs) e divide em unidades de trabalho
+        with profiling.stage("difal.listagem"):
+            units, total_arquivos, lista_erros = _list_units(folder_path, recursive)
+        self.total_arquivos = total_arquivos
 
         if total_arquivos == 0:
-            return False, "Nenhum arquivo XML encontrado na pasta.", [], [], []
-
-        # Itera sobre os arquivos
-        for arquivo in lista_arquivos:
-            caminho_completo = os.path.join(folder_path, arquivo)
-            try:
-                tree = ET.parse(caminho_completo)
-                root = tree.getroot()
-                
-                # Tenta localizar a tag infNFe (pode estar dentro de nfeProc ou direto em NFe)
-                inf_nfe = None
-                if root.tag.endswith('NFe'): # XML apenas com a nota
-                    inf_nfe = root.find('nfe:infNFe', self.ns)
-                else: # XML de distribuição (nfeProc)
-                    nfe = root.find('.//nfe:NFe', self.ns)
-                    if nfe is not None:
-                        inf_nfe = nfe.find('nfe:infNFe', self.ns)
-
-                # Se não achou a tag principal, ignora
-                if inf_nfe is None:
-                    lista_erros.append(f"{arquivo}: Estrutura XML inválida (Tag infNFe não encontrada).")
-                    continue
+            return False, "Nenhum arquivo XML encontrado na pasta.", [], [], lista_erros
 
-                # --- 1. Extração de Dados Cadastrais ---
-                
-                # Chave de Acesso (atributo Id da tag infNFe, remove o prefixo 'NFe')
-                chave = inf_nfe.attrib.get('Id', '')[3:]
-                
-                # Número da Nota
-                ide = inf_nfe.find('nfe:ide', self.ns)
-                numero_nf = ide.find('nfe:nNF', self.ns).text if ide is not None else "S/N"
-                
-                # UF de Destino
-                dest = inf_nfe.find('nfe:dest', self.ns)
-                ender_dest = dest.find('nfe:enderDest', self.ns) if dest is not None else None
-                
-                uf_dest = "IND" # Indefinido
-                if ender_dest is not None:
-                    tag_uf = ender_dest.find('nfe:UF', self.ns)
-                    if tag_uf is not None:
-                        uf_dest = tag_uf.text
-
-                # --- 2. Extração de Valores (DIFAL e FCP) ---
-                v_difal = 0.0
-                v_fcp = 0.0
-                
-                # Percorre todos os itens (produtos) da nota
-                for det in inf_nfe.findall('nfe:det', self.ns):
-                    imposto = det.find('nfe:imposto', self.ns)
-                    if imposto is None: continue
-                    
-                    # O DIFAL da partilha (EC 87/15) fica no grupo ICMSUFDest
-                    icms_uf_dest = imposto.find('nfe:ICMSUFDest', self.ns)
-                    
-                    if icms_uf_dest is not None:
-                        # Valor do DIFAL (vICMSUFDest)
-                        tag_difal = icms_uf_dest.find('nfe:vICMSUFDest', self.ns)
-                        if tag_difal is not None and tag_difal.text:
-                            v_difal += float(tag_difal.text)
-
-                        # Valor do FCP (vFCPUFDest)
-                        tag_fcp = icms_uf_dest.find('nfe:vFCPUFDest', self.ns)
-                        if tag_fcp is not None and tag_fcp.text:
-                            v_fcp += float(tag_fcp.text)
-                
-                # --- 3. Consolidação ---
-                # Só adiciona se tiver algum valor relevante
-                if v_difal > 0 or v_fcp > 0:
-                    
-                    # Adiciona ao Resumo por UF
-                    if uf_dest not in resultados_uf:
-                        resultados_uf[uf_dest] = {'difal': 0.0, 'fcp': 0.0}
-                    
-                    resultados_uf[uf_dest]['difal'] += v_difal
-                    resultados_uf[uf_dest]['fcp'] += v_fcp
-
-                    # Adiciona à Lista Detalhada
-                    lista_detalhada.append({
-                        "UF": uf_dest,
-                        "Numero NF": numero_nf,
-                        "Chave de Acesso": chave,
-                        "Arquivo": arquivo,
-                        "Valor DIFAL": v_difal,
-                        "Valor FCP": v_fcp
-                    })
-
-            except Exception as e:
-                # Captura erros de leitura (arquivo corrompido, tag faltando, etc)
-                lista_erros.append(f"{arquivo}: {str(e)}")
-                continue
+        try:
+            partes = _run_units(units, total_arquivos, cancel_token, workers, coletar_itens)
+        except OperationCancelled:
+            return False, CANCELLED_MSG, [], [], []
+
+        if coletar_itens:
+            with profiling.stage("difal.base_itens"):
+                self.base_itens = DifalDataset.from_parts([itens for _, _, itens in partes])
+
+        resultados_uf = {}
+        lista_detalhada = []
+        for detalhes, erros, _ in partes:
+            lista_erros.extend(erros)
+            for nota in detalhes:
+                uf_dest = nota["UF"]
+                # Adiciona ao Resumo por UF
+                if uf_dest not in resultados_uf:
+                    resultados_uf[uf_dest] = {'difal': 0.0, 'fcp': 0.0}
+                resultados_uf[uf_dest]['difal'] += nota["Valor DIFAL"]
+                resultados_uf[uf_dest]['fcp'] += nota["Valor FCP"]
+                lista_detalhada.append(nota)
 
         # Formata a lista de resumo para retorno (Lista de Dicionários)
         lista_resumo = []
@@ -138,43 +100,376 @@ class DifalLogic:
 
         return True, msg_final, lista_resumo, lista_detalhada, lista_erros
 
-    def gerar_excel(self, dados_resumo, dados_detalhados, output_path, incluir_detalhado=False):
+    @profiling.timed("difal.excel")
+    def gerar_excel(self, dados_resumo, dados_detalhados, output_path, incluir_detalhado=False,
+                    complemento: Optional[str] = None, progress_callback=None,
+                    cancel_token: Optional[CancelToken] = None):
         """
         Gera um arquivo Excel com os dados processados.
         Pode criar múltiplas abas (Resumo e Detalhado).
+
+        O detalhado é gravado em modo de escrita contínua do openpyxl (as
+        linhas vão direto para o arquivo, memória constante) e continua em
+        'Relatório Detalhado (2)', '(3)'... ao atingir o limite de linhas do Excel.
+        complemento: 'csv' ou 'parquet' grava também todas as notas num arquivo
+        com o mesmo nome da planilha (Parquet requer o pyarrow; sem ele vira CSV).
+        O CSV sai no formato do Excel pt-BR (UTF-8 com BOM, ';' e vírgula decimal).
+        progress_callback(pct) e cancel_token acompanham a gravação do detalhado.
         """
         try:
             if not dados_resumo:
                 return False, "Não há dados consolidados para gerar o Excel."
 
-            # Usa o ExcelWriter para gerenciar múltiplas abas
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                
-                # --- ABA 1: RESUMO ---
-                df_resumo = pd.DataFrame(dados_resumo)
-                
-                # Calcula totais gerais
-                total_difal = df_resumo['DIFAL'].sum()
-                total_fcp = df_resumo['FCP'].sum()
-                
-                # Adiciona linha de totais no final
-                linha_total = pd.DataFrame([{
-                    'UF': 'TOTAL GERAL', 
-                    'DIFAL': total_difal, 
-                    'FCP': total_fcp
-                }])
-                
-                df_resumo = pd.concat([df_resumo, linha_total], ignore_index=True)
-                
-                # Salva a aba
-                df_resumo.to_excel(writer, sheet_name='Resumo por UF', index=False)
-
-                # --- ABA 2: DETALHADO (Opcional) ---
-                if incluir_detalhado and dados_detalhados:
-                    df_detalhe = pd.DataFrame(dados_detalhados)
-                    df_detalhe.to_excel(writer, sheet_name='Relatório Detalhado', index=False)
-
-            return True, "Relatório Excel gerado com sucesso!"
+            # Importado sob demanda: o openpyxl deixa a abertura do programa lenta
+            from openpyxl import Workbook
+
+            wb = Workbook(write_only=True)
+
+            # --- ABA 1: RESUMO ---
+            ws = wb.create_sheet('Resumo por UF')
+            ws.append(_header_row(ws, ('UF', 'DIFAL', 'FCP')))
+            total_difal = total_fcp = 0.0
+            for linha in dados_resumo:
+                ws.append([linha['UF'], linha['DIFAL'], linha['FCP']])
+                total_difal += linha['DIFAL']
+                total_fcp += linha['FCP']
+            # Linha de totais no final
+            ws.append(['TOTAL GERAL', total_difal, total_fcp])
+
+            # --- ABA 2: DETALHADO (Opcional, em quantas abas forem necessárias) ---
+            abas = 0
+            if incluir_detalhado and dados_detalhados:
+                try:
+                    abas = _write_detail_sheets(wb, dados_detalhados, progress_callback=progress_callback,
+                                                cancel_token=cancel_token)
+                except OperationCancelled:
+                    _discard_workbook(wb)
+                    raise
+
+            wb.save(output_path)
 
+            msg = "Relatório Excel gerado com sucesso!"
+            if abas > 1:
+                msg += f" Detalhado dividido em {abas} abas (limite de linhas do Excel)."
+            if complemento and dados_detalhados:
+                caminho = _write_companion(dados_detalhados, os.path.splitext(output_path)[0], complemento)
+                msg += f" Notas também em {os.path.basename(caminho)}."
+            return True, msg
+
+        except OperationCancelled:
+            # O arquivo só é gravado no wb.save: não fica planilha pela metade
+            return False, CANCELLED_MSG
         except Exception as e:
-            return False, f"Erro ao salvar Excel: {str(e)}"
\ No newline at end of file
+            return False, f"Erro ao salvar Excel: {str(e)}"
+
+
+# ----------------------------------------------------------------------
+# Gravação do Excel detalhado
+# ----------------------------------------------------------------------
+# Limite de linhas de uma planilha do Excel (inclui o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_576
+DETAIL_SHEET = 'Relatório Detalhado'
+# Linhas entre verificações de cancelamento / avisos de progresso
+PROGRESS_EVERY_ROWS = 10_000
+
+
+def _header_row(ws, columns):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    bold = Font(bold=True)
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(ws, value=column)
+        cell.font = bold
+        cells.append(cell)
+    return cells
+
+
+def _write_detail_sheets(wb, dados_detalhados: List[Dict], max_rows: int = EXCEL_MAX_ROWS,
+                         progress_callback=None, cancel_token: Optional[CancelToken] = None) -> int:
+    """Grava as notas em abas de até max_rows linhas; retorna quantas abas criou."""
+    columns = list(dados_detalhados[0])
+    per_sheet = max_rows - 1
+    total = len(dados_detalhados)
+    abas = 0
+    linhas = per_sheet
+    for n, nota in enumerate(dados_detalhados):
+        if n % PROGRESS_EVERY_ROWS == 0:
+            if cancel_token: cancel_token.check()
+            if progress_callback:
+                progress_callback(int(n / total * 100))
+        if linhas == per_sheet:
+            abas += 1
+            ws = wb.create_sheet(DETAIL_SHEET if abas == 1 else f"{DETAIL_SHEET} ({abas})")
+            ws.append(_header_row(ws, columns))
+            linhas = 0
+        ws.append([nota.get(c) for c in columns])
+        linhas += 1
+    return abas
+
+
+def _discard_workbook(wb):
+    """Fecha as abas de um Workbook(write_only=True) não salvo e apaga os temporários."""
+    for ws in wb.worksheets:
+        try:
+            ws.close()
+            ws._writer.cleanup()
+        except (AttributeError, OSError):
+            pass
+
+
+def _write_companion(dados_detalhados: List[Dict], base_path: str, formato: str) -> str:
+    """Todas as notas em base_path.csv ou .parquet; retorna o caminho gravado."""
+    columns = list(dados_detalhados[0])
+    if formato == 'parquet':
+        try:
+            import pyarrow  # noqa: F401 (usado pelo pandas no to_parquet)
+        except ImportError:
+            formato = 'csv'  # Sem pyarrow: grava CSV
+    if formato == 'parquet':
+        import pandas as pd
+        path = base_path + '.parquet'
+        pd.DataFrame(dados_detalhados, columns=columns).to_parquet(path, index=False)
+        return path
+    # CSV no formato do Excel pt-BR: BOM (acentos), ';' entre campos e vírgula decimal
+    path = base_path + '.csv'
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(columns)
+        writer.writerows([_csv_value(nota.get(c)) for c in columns] for nota in dados_detalhados)
+    return path
+
+
+def _csv_value(value):
+    if isinstance(value, float):
+        return f"{value:.2f}".replace('.', ',')
+    return value
+
+
+# ----------------------------------------------------------------------
+# Leitura (funções do módulo: rodam também nos processos do pool)
+# ----------------------------------------------------------------------
+# Unidade de trabalho: ('pasta', pasta_base, [caminhos relativos])
+#                   ou ('zip', caminho_do_zip, nome_exibido, [entradas])
+Unit = Tuple
+
+
+def _list_units(folder_path: str, recursive: bool) -> Tuple[List[Unit], int, List[str]]:
+    """Unidades de trabalho, total de XMLs e erros de listagem (ZIPs corrompidos)."""
+    zip_units: List[Unit] = []
+    erros: List[str] = []
+    total = 0
+    loose: List[str] = []
+
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        if not recursive:
+            dirs.clear()
+        for name in sorted(files):
+            lower = name.lower()
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, folder_path)
+            if lower.endswith('.xml'):
+                loose.append(rel)
+            elif lower.endswith('.zip'):
+                try:
+                    with zipfile.ZipFile(path) as zf:
+                        entries = [info.filename for info in zf.infolist()
+                                   if not info.is_dir() and info.filename.lower().endswith('.xml')]
+                except (zipfile.BadZipFile, OSError) as e:
+                    erros.append(f"{rel}: Arquivo ZIP inválido ({e})")
+                    continue
+                total += len(entries)
+                for i in range(0, len(entries), CHUNK_SIZE):
+                    zip_units.append(('zip', path, rel, entries[i:i + CHUNK_SIZE]))
+
+    total += len(loose)
+    units = [('pasta', folder_path, loose[i:i + CHUNK_SIZE]) for i in range(0, len(loose), CHUNK_SIZE)]
+    return units + zip_units, total, erros
+
+
+def _run_units(units: List[Unit], total: int, cancel_token: Optional[CancelToken],
+               workers: Optional[int], coletar_itens: bool = False) -> List[Tuple]:
+    """Resultados (detalhes, erros, itens) de cada unidade, na ordem das unidades."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(units) <= 1 or total < PARALLEL_MIN_FILES:
+        return [_scan_unit(unit, cancel_token, coletar_itens) for unit in units]
+
+    # Processos: o parse do XML é CPU (o GIL impediria ganho com threads).
+    # O cancelamento é verificado entre unidades.
+    with profiling.stage("difal.leitura_paralela"):
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(units)))
+        try:
+            futures = [executor.submit(_scan_unit, unit, None, coletar_itens) for unit in units]
+            results = []
+            for future in futures:
+                if cancel_token and cancel_token.cancelled:
+                    raise OperationCancelled()
+                results.append(future.result())
+            return results
+        finally:
+            executor.shutdown(wait=not (cancel_token and cancel_token.cancelled), cancel_futures=True)
+
+
+def _scan_unit(unit: Unit, cancel_token: Optional[CancelToken] = None,
+               coletar_itens: bool = False) -> Tuple[List[Dict], List[str], Optional[List[list]]]:
+    """(detalhes, erros, colunas dos itens ou None) dos XMLs da unidade."""
+    detalhes: List[Dict] = []
+    erros: List[str] = []
+    itens = new_columns() if coletar_itens else None
+    if unit[0] == 'pasta':
+        _, base, names = unit
+        for arquivo in names:
+            if cancel_token: cancel_token.check()
+            _scan_file(os.path.join(base, arquivo), arquivo, detalhes, erros, itens)
+    else:
+        _, path, display, entries = unit
+        with zipfile.ZipFile(path) as zf:
+            for entry in entries:
+                if cancel_token: cancel_token.check()
+                # Lido direto do ZIP (descompactado em memória, sem arquivo temporário)
+                with zf.open(entry) as source:
+                    _scan_file(source, f"{display}/{entry}", detalhes, erros, itens)
+    return detalhes, erros, itens
+
+
+def _scan_file(source, arquivo: str, detalhes: List[Dict], erros: List[str],
+               itens: Optional[List[list]] = None):
+    """
+    Lê uma nota (caminho ou arquivo aberto) e acrescenta em detalhes ou erros.
+    itens: colunas da base por item (new_columns()), preenchidas se informadas.
+    """
+    try:
+        linhas = [] if itens is not None else None
+        with profiling.stage("difal.parse"):
+            tree = ET.parse(source)
+        with profiling.stage("difal.extracao"):
+            nota = _read_note(tree.getroot(), linhas)
+        if nota is None:
+            erros.append(f"{arquivo}: Estrutura XML inválida (Tag infNFe não encontrada).")
+            return
+        chave, numero_nf, uf_dest, v_difal, v_fcp = nota
+
+        # Itens só entram depois da nota inteira lida (as colunas ficam sempre alinhadas)
+        if linhas:
+            for linha in linhas:
+                for coluna, valor in zip(itens, (arquivo, chave, numero_nf) + linha):
+                    coluna.append(valor)
+
+        # Só adiciona se tiver algum valor relevante
+        if v_difal > 0 or v_fcp > 0:
+            detalhes.append({
+                "UF": uf_dest,
+                "Numero NF": numero_nf,
+                "Chave de Acesso": chave,
+                "Arquivo": arquivo,
+                "Valor DIFAL": v_difal,
+                "Valor FCP": v_fcp
+            })
+    except Exception as e:
+        # Captura erros de leitura (arquivo corrompido, tag faltando, etc)
+        erros.append(f"{arquivo}: {str(e)}")
+
+
+def _read_note(root, linhas: Optional[List[tuple]] = None) -> Optional[Tuple[str, str, str, float, float]]:
+    """
+    (chave, número, UF de destino, DIFAL, FCP) da NF-e; None se não houver infNFe.
+    linhas: se informada, recebe uma tupla por item com as colunas da base por
+    item a partir de 'mes' (ver difal_dataset.COLUMNS).
+    """
+    # Tenta localizar a tag infNFe (pode estar dentro de nfeProc ou direto em NFe)
+    inf_nfe = None
+    if root.tag.endswith('NFe'): # XML apenas com a nota
+        inf_nfe = root.find('nfe:infNFe', NS)
+    else: # XML de distribuição (nfeProc)
+        nfe = root.find('.//nfe:NFe', NS)
+        if nfe is not None:
+            inf_nfe = nfe.find('nfe:infNFe', NS)
+
+    # Se não achou a tag principal, ignora
+    if inf_nfe is None:
+        return None
+
+    # --- 1. Extração de Dados Cadastrais ---
+
+    # Chave de Acesso (atributo Id da tag infNFe, remove o prefixo 'NFe')
+    chave = inf_nfe.attrib.get('Id', '')[3:]
+
+    # Número da Nota
+    ide = inf_nfe.find('nfe:ide', NS)
+    numero_nf = ide.find('nfe:nNF', NS).text if ide is not None else "S/N"
+
+    # UF de Destino
+    dest = inf_nfe.find('nfe:dest', NS)
+    ender_dest = dest.find('nfe:enderDest', NS) if dest is not None else None
+
+    uf_dest = "IND" # Indefinido
+    if ender_dest is not None:
+        tag_uf = ender_dest.find('nfe:UF', NS)
+        if tag_uf is not None:
+            uf_dest = tag_uf.text
+
+    if linhas is not None:
+        campos_nota = (_month(ide),) + _emitter(inf_nfe) + (uf_dest,)
+
+    # --- 2. Extração de Valores (DIFAL e FCP) ---
+    v_difal = 0.0
+    v_fcp = 0.0
+
+    # Percorre todos os itens (produtos) da nota
+    for det in inf_nfe.findall('nfe:det', NS):
+        imposto = det.find('nfe:imposto', NS)
+        if imposto is None: continue
+
+        # O DIFAL da partilha (EC 87/15) fica no grupo ICMSUFDest
+        icms_uf_dest = imposto.find('nfe:ICMSUFDest', NS)
+        if linhas is not None:
+            linhas.append(campos_nota + _item_fields(det, icms_uf_dest))
+
+        if icms_uf_dest is not None:
+            # Valor do DIFAL (vICMSUFDest)
+            tag_difal = icms_uf_dest.find('nfe:vICMSUFDest', NS)
+            if tag_difal is not None and tag_difal.text:
+                v_difal += float(tag_difal.text)
+
+            # Valor do FCP (vFCPUFDest)
+            tag_fcp = icms_uf_dest.find('nfe:vFCPUFDest', NS)
+            if tag_fcp is not None and tag_fcp.text:
+                v_fcp += float(tag_fcp.text)
+
+    return chave, numero_nf, uf_dest, v_difal, v_fcp
+
+
+def _month(ide) -> str:
+    """'AAAA-MM' da emissão (dhEmi; dEmi no leiaute antigo)."""
+    if ide is not None:
+        for tag in ('nfe:dhEmi', 'nfe:dEmi'):
+            data = ide.findtext(tag, None, NS)
+            if data:
+                return data[:7]
+    return "S/D"
+
+
+def _emitter(inf_nfe) -> Tuple[str, str]:
+    """(CNPJ ou CPF, UF) do emitente."""
+    emit = inf_nfe.find('nfe:emit', NS)
+    if emit is None:
+        return "S/N", "IND"
+    documento = emit.findtext('nfe:CNPJ', None, NS) or emit.findtext('nfe:CPF', None, NS) or "S/N"
+    return documento, emit.findtext('nfe:enderEmit/nfe:UF', None, NS) or "IND"
+
+
+def _item_fields(det, icms_uf_dest) -> tuple:
+    """(CFOP, NCM, nItem, vProd, campos do ICMSUFDest...) de um item."""
+    # Um passe pelos filhos em vez de um find() por tag (o find do ElementTree é caro)
+    tag_prod = det.find('nfe:prod', NS)
+    prod = {child.tag: child.text for child in tag_prod} if tag_prod is not None else {}
+    valores = [0.0] * len(UF_DEST_TAGS)
+    if icms_uf_dest is not None:
+        for child in icms_uf_dest:
+            pos = _UF_DEST_POS.get(child.tag)
+            if pos is not None and child.text:
+                valores[pos] = float(child.text)
+    return (prod.get(_CFOP) or "", prod.get(_NCM) or "", int(det.get('nItem') or 0),
+            float(prod.get(_V_PROD) or 0)) + tuple(valores)
@@ -0,0 +1,145 @@
+import json
+import logging
+import datetime
+import threading
+from typing import Callable, Dict, Iterator, Optional
+
+import requests
+
+from src.config import JOB_SERVER_URL
+from src.utils.cancellation import CancelToken, OperationCancelled
+
+logger = logging.getLogger(__name__)
+
+# Tempo limite para abrir conexão / respostas simples (o stream de eventos não tem limite de leitura)
+CONNECT_TIMEOUT = 5
+REQUEST_TIMEOUT = 30
+
+
+class JobServerError(Exception):
+    """Falha de comunicação ou recusa do servidor de tarefas."""
+
+
+class JobServerClient:
+    """Cliente do JobServer (src/utils/job_server.py)."""
+
+    def __init__(self, base_url: str, token: Optional[str] = None):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.session = requests.Session()
+
+    @classmethod
+    def login(cls, base_url: str, username: str, password: str) -> 'JobServerClient':
+        client = cls(base_url)
+        data = client._request('post', '/login', json={'username': username, 'password': password})
+        client.token = data['token']
+        return client
+
+    def submit(self, tool: str, **params) -> Dict:
+        """Envia a tarefa; datas viram 'AAAA-MM-DD'. Devolve o evento inicial (com 'id')."""
+        params = {k: v.isoformat() if isinstance(v, datetime.date) else v for k, v in params.items()}
+        return self._request('post', '/jobs', json={'tool': tool, 'params': params})
+
+    def cancel(self, job_id: int) -> bool:
+        return self._request('post', f'/jobs/{job_id}/cancel').get('cancelada', False)
+
+    def status(self, job_id: int) -> Dict:
+        return self._request('get', f'/jobs/{job_id}')
+
+    def events(self, job_id: int) -> Iterator[Dict]:
+        """Eventos da tarefa (NDJSON) até o evento final, que contém 'result'."""
+        try:
+            response = self.session.get(f'{self.base_url}/jobs/{job_id}/events', headers=self._headers(),
+                                        stream=True, timeout=(CONNECT_TIMEOUT, None))
+        except requests.RequestException as e:
+            raise JobServerError(f"Servidor de tarefas indisponível: {e}")
+        with response:
+            self._raise_for_status(response)
+            try:
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+            except requests.RequestException as e:
+                # Servidor reiniciado ou conexão perdida no meio da tarefa
+                raise JobServerError(f"Conexão com o servidor de tarefas perdida: {e}")
+            except ValueError as e:
+                raise JobServerError(f"Resposta inválida do servidor de tarefas: {e}")
+
+    def run(self, tool: str, progress_callback: Optional[Callable[[int], None]] = None,
+            cancel_token: Optional[CancelToken] = None, **params) -> Dict:
+        """
+        Executa a ferramenta no servidor e espera o resultado (mesmo dicionário
+        das funções de batch_tasks). Com cancel_token acionado, pede o
+        cancelamento ao servidor e levanta OperationCancelled.
+        """
+        job_id = self.submit(tool, **params)['id']
+        cancel_sent = False
+        for event in self.events(job_id):
+            if cancel_token and cancel_token.cancelled and not cancel_sent:
+                self.cancel(job_id)
+                cancel_sent = True
+            if progress_callback and event.get('pct') is not None:
+                progress_callback(event['pct'])
+            if 'result' in event:
+                if cancel_sent:
+                    raise OperationCancelled()
+                return event['result']
+        raise JobServerError("Conexão com o servidor de tarefas encerrada antes do fim da tarefa.")
+
+    def _headers(self) -> Dict:
+        return {'Authorization': f'Bearer {self.token}'} if self.token else {}
+
+    def _request(self, method: str, path: str, **kwargs) -> Dict:
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', headers=self._headers(),
+                                            timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT), **kwargs)
+        except requests.RequestException as e:
+            raise JobServerError(f"Servidor de tarefas indisponível: {e}")
+        self._raise_for_status(response)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise JobServerError(f"Resposta inválida do servidor de tarefas: {e}")
+
+    @staticmethod
+    def _raise_for_status(response):
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('erro', response.text)
+            except ValueError:
+                message = response.text
+            raise JobServerError(f"Servidor de tarefas ({response.status_code}): {message}")
+
+
+_client: Optional[JobServerClient] = None
+_client_lock = threading.Lock()
+
+
+def connect(username: str, password: str, base_url: Optional[str] = JOB_SERVER_URL) -> Optional[JobServerClient]:
+    """
+    Abre a sessão no servidor de tarefas configurado (JOB_SERVER_URL), com as
+    mesmas credenciais do login. Sem servidor configurado ou em caso de falha,
+    as ferramentas continuam rodando localmente.
+    """
+    global _client
+    if not base_url:
+        return None
+    try:
+        client = JobServerClient.login(base_url, username, password)
+    except JobServerError as e:
+        logger.warning("Servidor de tarefas não disponível, usando processamento local: %s", e)
+        client = None
+    with _client_lock:
+        _client = client
+    return client
+
+
+def disconnect():
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def get_job_client() -> Optional[JobServerClient]:
+    """Cliente da sessão atual, ou None para processar localmente."""
+    return _client
@@ -0,0 +1,269 @@
+import os
+import time
+import datetime
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.config import MAX_CONCURRENT_JOBS
+from src.utils.cancellation import CancelToken, OperationCancelled, CANCELLED_MSG
+from src.utils import logger as session_log
+from src.utils import profiling
+from src.utils import metrics
+from src.utils.database import get_connection, transaction
+
+# Situações de uma tarefa
+QUEUED = "Na fila"
+RUNNING = "Executando"
+DONE = "Concluída"
+FAILED = "Erro"
+CANCELLED = "Cancelada"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Tarefas finalizadas mantidas em memória para o painel
+KEEP_FINISHED = 50
+# Tarefas cujo tempo é a leitura do SPED (entram na vazão MB/s do Dashboard)
+SPED_PARSING_ACTIONS = ('validate', 'contrib', 'filter', 'keys', 'keys_dataset')
+
+
+class Job:
+    """Uma execução de ferramenta submetida ao JobManager."""
+
+    def __init__(self, job_id: int, action: str, label: str, key: Tuple,
+                 input_path: Optional[str] = None, output_path: Optional[str] = None):
+        self.id = job_id
+        self.action = action
+        self.label = label
+        self.key = key
+        self.input_path = input_path
+        self.output_path = output_path
+        self.username = session_log.current_username
+        self.token = CancelToken()
+        self.status = QUEUED
+        self.message = ""
+        self.created_at = datetime.datetime.now()
+        self.started = None
+        self.finished = None
+        # Preenchidos pela tarefa para o cálculo de vazão (ex: 120 'XMLs')
+        self.items = 0
+        self.items_unit = None
+        self.input_bytes = _file_size(input_path)
+        # Tempos por etapa (profiling.JobProfile), preenchido ao término
+        self.profile = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self) -> str:
+        duration = self.duration
+        if not duration:
+            return "-"
+        if self.items and self.items_unit:
+            return f"{self.items / duration:,.1f} {self.items_unit}/s"
+        if self.input_bytes:
+            return f"{self.input_bytes / duration / 1024 / 1024:,.1f} MB/s"
+        return "-"
+
+
+class JobManager:
+    """
+    Executa as ferramentas num pool limitado de threads.
+
+    - no máximo max_workers tarefas rodam ao mesmo tempo; as demais aguardam na fila
+    - cada tarefa recebe um CancelToken (job.token) para repassar à lógica
+    - uma tarefa igual (mesma ação e mesma chave) a outra ativa é recusada
+    - o término é registrado no log da sessão e no histórico (tabela job_history),
+      com os tempos por etapa da tarefa (src/utils/profiling.py)
+    """
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Job] = {}
+        self._listeners: List[Callable[[Job], None]] = []
+
+    def submit(self, action: str, fn: Callable[[Job], Optional[Tuple]], label: Optional[str] = None,
+               key: Optional[Tuple] = None, input_path: Optional[str] = None,
+               output_path: Optional[str] = None) -> Tuple[Optional[Job], Optional[Job]]:
+        """
+        Agenda fn(job). fn pode devolver (sucesso, mensagem).
+        Retorna (tarefa criada, None) ou (None, tarefa igual já ativa).
+        """
+        key = key if key is not None else (input_path, output_path)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.action == action and job.key == key:
+                    return None, job
+            job = Job(next(self._ids), action, label or action, key, input_path, output_path)
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        self._notify(job)
+        return job, None
+
+    def cancel(self, job_id: int) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.token.cancel()
+        self._notify(job)
+        return True
+
+    def cancel_all(self):
+        for job in self.jobs():
+            if job.active:
+                job.token.cancel()
+
+    def jobs(self) -> List[Job]:
+        """Tarefas da execução atual, mais recentes primeiro."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.id, reverse=True)
+
+    def add_listener(self, callback: Callable[[Job], None]):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Job], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _run(self, job: Job, fn):
+        if job.token.cancelled:
+            # Cancelada enquanto aguardava na fila
+            self._finish(job, CANCELLED, CANCELLED_MSG)
+            return
+
+        job.status = RUNNING
+        job.started = time.perf_counter()
+        self._notify(job)
+        try:
+            with profiling.profile_job(job.label) as job.profile:
+                result = fn(job)
+            success, message = result if isinstance(result, tuple) else (True, "")
+            if job.token.cancelled:
+                self._finish(job, CANCELLED, CANCELLED_MSG)
+            else:
+                self._finish(job, DONE if success else FAILED, message)
+        except OperationCancelled:
+            self._finish(job, CANCELLED, CANCELLED_MSG)
+        except Exception as e:
+            self._finish(job, FAILED, str(e))
+
+    def _finish(self, job: Job, status: str, message: str):
+        if job.started is None:
+            job.started = time.perf_counter()
+        job.finished = time.perf_counter()
+        job.status = status
+        job.message = message or ""
+
+        fields = {'status': status}
+        if job.input_bytes:
+            fields['input_bytes'] = job.input_bytes
+        output_bytes = _file_size(job.output_path)
+        if output_bytes:
+            fields['output_bytes'] = output_bytes
+        if job.items:
+            fields['items'] = job.items
+        details = None
+        if job.profile is not None and (job.profile.stages or job.profile.cprofile_text):
+            fields['etapas'] = job.profile.to_dict()['etapas']
+            details = job.profile.report()
+        session_log.log_action(f"Ferramenta executada: {job.action} ({status})", action=job.action,
+                               duration=job.duration, details=details, **fields)
+        _record_metrics(job)
+        try:
+            _save_history(job)
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o histórico da tarefa: {e}")
+        self._notify(job)
+
+    def _notify(self, job: Job):
+        self._update_gauges()
+        for callback in list(self._listeners):
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"Aviso: erro ao notificar painel de tarefas: {e}")
+
+    def _update_gauges(self):
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        metrics.JOBS_QUEUED.set(statuses.count(QUEUED))
+        metrics.JOBS_RUNNING.set(statuses.count(RUNNING))
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if not j.active]
+        for job in sorted(finished, key=lambda j: j.id)[:-KEEP_FINISHED]:
+            del self._jobs[job.id]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """JobManager compartilhado pela aplicação."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def _save_history(job: Job):
+    with transaction() as conn:
+        conn.execute('''
+        INSERT INTO job_history (action, label, username, status, created_at, duration_s, items, input_bytes, message)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (job.action, job.label, job.username, job.status, job.created_at.isoformat(timespec='seconds'),
+              job.duration, job.items, job.input_bytes, job.message[:500]))
+
+
+def load_job_history(limit: int = 20) -> List[Tuple]:
+    """Últimas tarefas gravadas: (created_at, label, username, status, duration_s, items, input_bytes, message)."""
+    return get_connection().execute('''
+    SELECT created_at, label, username, status, duration_s, items, input_bytes, message
+    FROM job_history ORDER BY id DESC LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+def job_stats_since(since: datetime.datetime) -> Tuple[int, int, float]:
+    """
+    Tarefas concluídas desde `since`: (arquivos, bytes de entrada, segundos).
+    Arquivos = itens da tarefa (ex: XMLs baixados ou lidos) ou 1.
+    Bytes e segundos só das tarefas de leitura do SPED (SPED_PARSING_ACTIONS):
+    nas demais o tempo é dominado por outra coisa (ex: downloads na Sieg).
+    """
+    parsing = ", ".join("?" * len(SPED_PARSING_ACTIONS))
+    return get_connection().execute(f'''
+    SELECT COALESCE(SUM(CASE WHEN items > 0 THEN items ELSE 1 END), 0),
+           COALESCE(SUM(CASE WHEN action IN ({parsing}) THEN input_bytes END), 0),
+           COALESCE(SUM(CASE WHEN action IN ({parsing}) AND input_bytes > 0 THEN duration_s END), 0)
+    FROM job_history WHERE status = ? AND created_at >= ?
+    ''', (*SPED_PARSING_ACTIONS, *SPED_PARSING_ACTIONS, DONE, since.isoformat(timespec='seconds'))).fetchone()
+
+
+def _record_metrics(job: Job):
+    metrics.JOBS_FINISHED.inc(action=job.action, status=job.status)
+    if job.duration is not None:
+        metrics.JOB_DURATION.observe(job.duration, action=job.action)
+    if job.status == DONE:
+        if job.input_bytes:
+            metrics.JOB_INPUT_BYTES.inc(job.input_bytes, action=job.action)
+        if job.items:
+            metrics.JOB_ITEMS.inc(job.items, action=job.action)
+
+
+def _file_size(path: Optional[str]) -> Optional[int]:
+    if path and os.path.isfile(path):
+        return os.path.getsize(path)
+    return None
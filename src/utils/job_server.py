@@ -0,0 +1,380 @@
+import os
+import json
+import time
+import logging
+import secrets
+import datetime
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from src.config import (
+    JOB_SERVER_HOST, JOB_SERVER_PORT, JOB_SERVER_TOKEN_TTL, JOB_SERVER_WORKERS, UI_REFRESH_HZ
+)
+from src.utils import batch_tasks
+from src.utils.cancellation import CancelToken, CANCELLED_MSG
+from src.utils.database import authenticate, initialize_db
+from src.utils.job_manager import QUEUED, RUNNING, DONE, FAILED, CANCELLED, ACTIVE_STATUSES, KEEP_FINISHED
+
+logger = logging.getLogger(__name__)
+
+# Ferramentas disponíveis remotamente (funções de batch_tasks)
+TOOLS = {
+    'contrib': batch_tasks.contrib_report,
+    'filter': batch_tasks.filter_by_date,
+    'validate': batch_tasks.validate,
+    'overview': batch_tasks.overview,
+    'keys': batch_tasks.extract_keys,
+    'difal': batch_tasks.difal_report,
+}
+PROGRESS_TOOLS = {'filter', 'validate', 'keys'}
+CANCELLABLE_TOOLS = set(TOOLS) - {'overview'}
+# Datas trafegam no JSON como 'AAAA-MM-DD'
+DATE_PARAMS = ('start_date', 'end_date')
+# Permissão exigida (a mesma da tela SPED)
+REQUIRED_PERMISSION = 'sped'
+# Sem novidades, o stream de eventos repete a situação neste intervalo (s)
+KEEPALIVE_INTERVAL = 1.0
+
+
+def _run_tool(job_id: int, tool: str, params: Dict, progress_queue, cancel_event) -> Dict:
+    """Executado num processo do pool. O progresso volta pela fila do Manager."""
+    params = dict(params)
+    for name in DATE_PARAMS:
+        if params.get(name):
+            params[name] = datetime.date.fromisoformat(params[name])
+    progress_queue.put((job_id, 0))  # marca o início da execução
+    if tool in PROGRESS_TOOLS:
+        last = [0]
+
+        def progress(pct):
+            if pct != last[0]:
+                last[0] = pct
+                progress_queue.put((job_id, pct))
+        params['progress_callback'] = progress
+    if tool in CANCELLABLE_TOOLS:
+        params['cancel_token'] = CancelToken(cancel_event)
+    return TOOLS[tool](**params)
+
+
+class RemoteJob:
+    """Tarefa recebida pelo servidor."""
+
+    def __init__(self, job_id: int, tool: str, params: Dict, username: str, cancel_event):
+        self.id = job_id
+        self.tool = tool
+        self.params = params
+        self.username = username
+        self.cancel_event = cancel_event
+        self.status = QUEUED
+        self.pct = None
+        self.result = None
+        self.created_at = datetime.datetime.now()
+        self.future = None
+        # Incrementado a cada mudança; o stream de eventos compara versões
+        self.version = 0
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def as_event(self) -> Dict:
+        event = {'id': self.id, 'tool': self.tool, 'status': self.status, 'pct': self.pct,
+                 'created_at': self.created_at.isoformat(timespec='seconds')}
+        if not self.active:
+            event['result'] = self.result
+        return event
+
+
+class JobServer:
+    """
+    Servidor de tarefas para várias estações usarem uma única máquina de processamento.
+
+    HTTP + JSON (ThreadingHTTPServer), sem dependências externas:
+        POST /login                {username, password} -> {token}
+        POST /jobs                 {tool, params} -> evento inicial da tarefa
+        GET  /jobs                 tarefas do usuário (todas, para administradores)
+        GET  /jobs/<id>            situação atual
+        GET  /jobs/<id>/events     NDJSON: uma linha por mudança até o fim da tarefa
+        POST /jobs/<id>/cancel
+
+    A autenticação usa a tabela users (database.authenticate) e exige a
+    permissão da tela SPED. As ferramentas rodam num ProcessPoolExecutor do
+    tamanho dos núcleos do servidor; os caminhos enviados precisam existir no
+    servidor (ex: compartilhamento de rede com o mesmo caminho UNC).
+    """
+
+    def __init__(self, host: str = JOB_SERVER_HOST, port: int = JOB_SERVER_PORT,
+                 workers: Optional[int] = JOB_SERVER_WORKERS):
+        self.workers = workers or os.cpu_count() or 1
+        self._manager = multiprocessing.Manager()
+        self._progress_queue = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, RemoteJob] = {}
+        self._tokens: Dict[str, Tuple[Dict, float]] = {}
+        self._tokens_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.job_server = self
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.httpd.server_address[:2]
+
+    def serve_forever(self):
+        reader = threading.Thread(target=self._read_progress, name="job-server-progress", daemon=True)
+        reader.start()
+        logger.info("Servidor de tarefas em http://%s:%s (%s processos)", *self.address, self.workers)
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+            for job in list(self._jobs.values()):
+                if job.active:
+                    job.cancel_event.set()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._progress_queue.put(None)
+            reader.join(timeout=5)
+            self._manager.shutdown()
+
+    def shutdown(self):
+        """Encerra serve_forever (chamar de outra thread)."""
+        self.httpd.shutdown()
+
+    # ------------------------------------------------------------------
+    # Autenticação
+    # ------------------------------------------------------------------
+    def login(self, username: str, password: str) -> Optional[str]:
+        user = authenticate(username, password)
+        if not user:
+            return None
+        permissions = (user[4] or '').split(',')
+        is_admin = bool(user[3])
+        if not (is_admin or REQUIRED_PERMISSION in permissions or 'all' in permissions):
+            return None
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._tokens_lock:
+            # Sessões vencidas que nunca mais foram usadas (user_for só remove as consultadas)
+            for old in [t for t, (_, expires) in self._tokens.items() if now > expires]:
+                del self._tokens[old]
+            self._tokens[token] = ({'username': user[1], 'is_admin': is_admin}, now + JOB_SERVER_TOKEN_TTL)
+        return token
+
+    def user_for(self, token: Optional[str]) -> Optional[Dict]:
+        with self._tokens_lock:
+            entry = self._tokens.get(token) if token else None
+            if entry is None:
+                return None
+            user, expires = entry
+            if time.time() > expires:
+                self._tokens.pop(token, None)
+                return None
+            return user
+
+    # ------------------------------------------------------------------
+    # Tarefas
+    # ------------------------------------------------------------------
+    def submit(self, username: str, tool: str, params: Dict) -> RemoteJob:
+        if tool not in TOOLS:
+            raise ValueError(f"Ferramenta desconhecida: {tool}")
+        with self._changed:
+            job = RemoteJob(next(self._ids), tool, params, username, self._manager.Event())
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(_run_tool, job.id, tool, params, self._progress_queue, job.cancel_event)
+        job.future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        logger.info("Tarefa %s: %s de %s", job.id, tool, username)
+        return job
+
+    def cancel(self, job: RemoteJob) -> bool:
+        if not job.active:
+            return False
+        job.cancel_event.set()
+        # Ainda na fila: sai sem chegar a rodar (o done_callback marca como cancelada)
+        job.future.cancel()
+        return True
+
+    def get(self, job_id: int, user: Dict) -> Optional[RemoteJob]:
+        # Handlers rodam em threads; submit() remove tarefas antigas (_prune) sob o _changed
+        with self._changed:
+            job = self._jobs.get(job_id)
+        if job is None or not (user['is_admin'] or job.username == user['username']):
+            return None
+        return job
+
+    def list(self, user: Dict):
+        with self._changed:
+            jobs = list(self._jobs.values())
+        jobs.sort(key=lambda j: j.id, reverse=True)
+        return [j for j in jobs if user['is_admin'] or j.username == user['username']]
+
+    def wait_change(self, job: RemoteJob, version: int, timeout: float) -> int:
+        """Espera a versão da tarefa mudar (ou o timeout) e devolve a versão atual."""
+        with self._changed:
+            self._changed.wait_for(lambda: job.version != version, timeout)
+            return job.version
+
+    def _update(self, job: RemoteJob, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _finish(self, job: RemoteJob, future):
+        if future.cancelled():
+            self._update(job, status=CANCELLED, result={'sucesso': False, 'mensagem': CANCELLED_MSG})
+            return
+        error = future.exception()
+        if error is not None:
+            result = {'sucesso': False, 'mensagem': f"Erro: {error}"}
+            status = FAILED
+        else:
+            result = future.result()
+            if job.cancel_event.is_set():
+                status = CANCELLED
+            else:
+                status = DONE if result.get('sucesso') else FAILED
+        self._update(job, status=status, result=result, pct=100 if status == DONE else job.pct)
+        logger.info("Tarefa %s: %s", job.id, status)
+
+    def _read_progress(self):
+        while True:
+            item = self._progress_queue.get()
+            if item is None:
+                return
+            job_id, pct = item
+            with self._changed:
+                job = self._jobs.get(job_id)
+            if job is not None and job.active:
+                self._update(job, status=RUNNING, pct=pct)
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if not j.active]
+        for job in sorted(finished, key=lambda j: j.id)[:-KEEP_FINISHED]:
+            del self._jobs[job.id]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "SiegAutoJobServer/1.0"
+
+    @property
+    def jobs(self) -> JobServer:
+        return self.server.job_server
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_POST(self):
+        parts = self._path_parts()
+        if parts == ['login']:
+            body = self._read_json()
+            if body is None:
+                return
+            token = self.jobs.login(body.get('username', ''), body.get('password', ''))
+            if token is None:
+                return self._send_json(401, {'erro': "Usuário ou senha inválidos, ou sem permissão."})
+            return self._send_json(200, {'token': token, 'ttl_s': JOB_SERVER_TOKEN_TTL})
+
+        user = self._require_user()
+        if user is None:
+            return
+        if parts == ['jobs']:
+            body = self._read_json()
+            if body is None:
+                return
+            try:
+                job = self.jobs.submit(user['username'], body.get('tool'), body.get('params') or {})
+            except ValueError as e:
+                return self._send_json(400, {'erro': str(e)})
+            return self._send_json(202, job.as_event())
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            job = self._job(parts[1], user)
+            if job is not None:
+                self._send_json(200, {'cancelada': self.jobs.cancel(job)})
+            return
+        self._send_json(404, {'erro': "Rota não encontrada."})
+
+    def do_GET(self):
+        user = self._require_user()
+        if user is None:
+            return
+        parts = self._path_parts()
+        if parts == ['jobs']:
+            return self._send_json(200, [j.as_event() for j in self.jobs.list(user)])
+        if len(parts) >= 2 and parts[0] == 'jobs':
+            job = self._job(parts[1], user)
+            if job is None:
+                return
+            if len(parts) == 2:
+                return self._send_json(200, job.as_event())
+            if parts[2:] == ['events']:
+                return self._stream_events(job)
+        self._send_json(404, {'erro': "Rota não encontrada."})
+
+    def _stream_events(self, job: RemoteJob):
+        """Uma linha JSON por mudança (no máximo UI_REFRESH_HZ por segundo) até a tarefa terminar."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        interval = 1.0 / UI_REFRESH_HZ
+        version = -1
+        try:
+            while True:
+                version = self.jobs.wait_change(job, version, KEEPALIVE_INTERVAL)
+                event = job.as_event()
+                self.wfile.write(json.dumps(event, ensure_ascii=False, default=str).encode('utf-8') + b"\n")
+                self.wfile.flush()
+                if 'result' in event:
+                    return
+                time.sleep(interval)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Cliente desconectou do stream da tarefa %s", job.id)
+
+    def _path_parts(self):
+        return [p for p in self.path.split('?', 1)[0].split('/') if p]
+
+    def _require_user(self) -> Optional[Dict]:
+        header = self.headers.get('Authorization', '')
+        token = header[7:] if header.startswith('Bearer ') else None
+        user = self.jobs.user_for(token)
+        if user is None:
+            self._send_json(401, {'erro': "Sessão inválida ou expirada."})
+        return user
+
+    def _job(self, raw_id: str, user: Dict) -> Optional[RemoteJob]:
+        job = self.jobs.get(int(raw_id), user) if raw_id.isdigit() else None
+        if job is None:
+            self._send_json(404, {'erro': "Tarefa não encontrada."})
+        return job
+
+    def _read_json(self) -> Optional[Dict]:
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("o corpo deve ser um objeto JSON")
+            return body
+        except ValueError as e:
+            self._send_json(400, {'erro': f"JSON inválido: {e}"})
+            return None
+
+    def _send_json(self, status: int, payload):
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host: str = JOB_SERVER_HOST, port: int = JOB_SERVER_PORT, workers: Optional[int] = JOB_SERVER_WORKERS):
+    initialize_db()
+    JobServer(host, port, workers).serve_forever()
@@ -0,0 +1,153 @@
+import time
+import queue
+import logging
+import threading
+import contextvars
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from src.utils.key_set import CompactKeySet
+from src.utils.cancellation import CancelToken, CANCELLED_MSG
+
+logger = logging.getLogger(__name__)
+
+# Marca de fim da fila para os workers
+_STOP = None
+
+
+class _RateLimiter:
+    """Intervalo mínimo entre requisições, compartilhado pelos workers."""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.perf_counter()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class KeyDownloadPipeline:
+    """
+    Liga a extração de chaves ao download na Sieg (produtor/consumidor).
+
+    O produtor percorre as chaves conforme são extraídas do SPED e as coloca numa
+    fila limitada; quando a fila enche, a leitura do arquivo espera os downloads
+    (backpressure). Chaves repetidas ou já existentes na pasta são descartadas
+    antes de entrar na fila.
+
+    sieg_manager_factory: cria o cliente da Sieg de cada worker (ex: a classe
+    SiegManager). Cada worker tem o seu: requests.Session não é thread-safe.
+    """
+
+    def __init__(self, sieg_manager_factory: Callable, workers: int = 4, queue_size: int = 200,
+                 requests_per_second: float = 10.0):
+        self.sieg_manager_factory = sieg_manager_factory
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.requests_per_second = requests_per_second
+
+    def run(self, key_source: Iterable[str], output_dir: str,
+            progress_callback: Optional[Callable[[Dict], None]] = None,
+            skip_keys: Optional[CompactKeySet] = None,
+            cancel_token: Optional[CancelToken] = None) -> Tuple[bool, str, Dict]:
+        """
+        Executa o pipeline até esgotar key_source e a fila.
+        Com cancel_token acionado, o produtor para de ler e os workers descartam
+        o que restou na fila.
+        Retorna (sucesso, mensagem, estatísticas).
+        """
+        key_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        limiter = _RateLimiter(self.requests_per_second)
+        lock = threading.Lock()
+        t0 = time.perf_counter()
+        stats = {
+            'extraidas': 0, 'duplicadas': 0, 'ja_baixadas': 0,
+            'baixadas': 0, 'erros': 0, 'na_fila': 0,
+            'extracao_s': None, 'primeiro_xml_s': None, 'total_s': None,
+        }
+        producer_error = []
+
+        def notify():
+            if progress_callback:
+                with lock:
+                    snapshot = dict(stats, na_fila=key_queue.qsize())
+                progress_callback(snapshot)
+
+        def producer():
+            seen = set()
+            try:
+                for chave in key_source:
+                    if cancel_token and cancel_token.cancelled:
+                        break
+                    with lock:
+                        stats['extraidas'] += 1
+                    if chave in seen:
+                        with lock: stats['duplicadas'] += 1
+                        continue
+                    seen.add(chave)
+                    if skip_keys is not None and chave in skip_keys:
+                        with lock: stats['ja_baixadas'] += 1
+                        continue
+                    key_queue.put(chave)  # bloqueia se a fila estiver cheia
+            except Exception as e:
+                logger.exception("Erro na extração de chaves")
+                producer_error.append(str(e))
+            finally:
+                with lock:
+                    stats['extracao_s'] = time.perf_counter() - t0
+                for _ in range(self.workers):
+                    key_queue.put(_STOP)
+                notify()
+
+        def worker():
+            sieg_manager = self.sieg_manager_factory()
+            while True:
+                chave = key_queue.get()
+                if chave is _STOP:
+                    break
+                if cancel_token and cancel_token.cancelled:
+                    continue
+                limiter.wait()
+                try:
+                    ok, msg = sieg_manager.download_xml(chave, output_dir)
+                except Exception as e:
+                    ok, msg = False, str(e)
+                with lock:
+                    if ok:
+                        stats['baixadas'] += 1
+                        if stats['primeiro_xml_s'] is None:
+                            stats['primeiro_xml_s'] = time.perf_counter() - t0
+                    else:
+                        stats['erros'] += 1
+                        logger.warning("Falha em %s: %s", chave, msg)
+                notify()
+
+        # Cada thread roda numa cópia do contexto atual: os tempos por etapa
+        # (profiling) dos downloads entram na tarefa que iniciou o pipeline
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(producer,), daemon=True)]
+        threads += [threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True)
+                    for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats['total_s'] = time.perf_counter() - t0
+        stats['na_fila'] = 0
+
+        msg = (f"Finalizado em {stats['total_s']:.1f}s! Baixados: {stats['baixadas']}, Falhas: {stats['erros']}, "
+               f"Duplicadas: {stats['duplicadas']}, Já existentes: {stats['ja_baixadas']}.")
+        if stats['primeiro_xml_s'] is not None:
+            msg += f" Primeiro XML em {stats['primeiro_xml_s']:.1f}s (extração levou {stats['extracao_s']:.1f}s)."
+        if cancel_token and cancel_token.cancelled:
+            return False, f"{CANCELLED_MSG} {msg}", stats
+        if producer_error:
+            return False, f"Erro na extração: {producer_error[0]}. {msg}", stats
+        return True, msg, stats
@@ -0,0 +1,155 @@
+import os
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+KEY_LENGTH = 44
+PACKED_WIDTH = KEY_LENGTH // 2
+PACKED_DTYPE = np.dtype(f'S{PACKED_WIDTH}')
+
+# Tamanho dos lotes ao empacotar iteráveis grandes
+_BATCH_SIZE = 100_000
+
+
+class CompactKeySet:
+    """
+    Conjunto de chaves de acesso em formato compacto (22 bytes por chave).
+
+    Cada chave de 44 dígitos é empacotada em BCD, dois dígitos por byte. O nibble
+    guarda dígito + 1, de modo que nenhum byte é nulo: assim o dtype 'S22' do NumPy
+    compara, ordena e deduplica corretamente, e a ordem resultante é a mesma da
+    ordenação textual das chaves.
+
+    O array interno fica sempre ordenado e sem repetições, o que permite união,
+    diferença, interseção e busca vetorizadas (np.union1d, np.setdiff1d, searchsorted).
+    """
+
+    def __init__(self, packed: Optional[np.ndarray] = None):
+        if packed is None:
+            packed = np.empty(0, dtype=PACKED_DTYPE)
+        self._packed = np.unique(packed.astype(PACKED_DTYPE, copy=False))
+
+    # ------------------------------------------------------------------
+    # Construção
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_keys(cls, keys: Iterable[str]) -> 'CompactKeySet':
+        """Cria o conjunto a partir de chaves em texto. Valores que não têm 44 dígitos são ignorados."""
+        parts: List[np.ndarray] = []
+        batch: List[str] = []
+        for key in keys:
+            key = key.strip()
+            if len(key) == KEY_LENGTH and key.isdigit() and key.isascii():
+                batch.append(key)
+                if len(batch) >= _BATCH_SIZE:
+                    parts.append(np.unique(pack_keys(batch)))
+                    batch = []
+        if batch:
+            parts.append(pack_keys(batch))
+        if not parts:
+            return cls()
+        return cls(np.concatenate(parts))
+
+    @classmethod
+    def from_directory(cls, folder_path: str, extensions=('.xml',)) -> 'CompactKeySet':
+        """Chaves já baixadas: arquivos nomeados '{chave}.xml' (padrão do SiegManager)."""
+        if not folder_path or not os.path.isdir(folder_path):
+            return cls()
+        names = (os.path.splitext(entry.name)[0] for entry in os.scandir(folder_path)
+                 if entry.is_file() and entry.name.lower().endswith(extensions))
+        return cls.from_keys(names)
+
+    @classmethod
+    def load(cls, path: str) -> 'CompactKeySet':
+        return cls(np.load(path, allow_pickle=False))
+
+    def save(self, path: str):
+        np.save(path, self._packed, allow_pickle=False)
+
+    # ------------------------------------------------------------------
+    # Operações de conjunto (vetorizadas)
+    # ------------------------------------------------------------------
+    def union(self, other: 'CompactKeySet') -> 'CompactKeySet':
+        return self._wrap(np.union1d(self._packed, other._packed))
+
+    def difference(self, other: 'CompactKeySet') -> 'CompactKeySet':
+        return self._wrap(np.setdiff1d(self._packed, other._packed, assume_unique=True))
+
+    def intersection(self, other: 'CompactKeySet') -> 'CompactKeySet':
+        return self._wrap(np.intersect1d(self._packed, other._packed, assume_unique=True))
+
+    def update(self, keys: Iterable[str]):
+        """Acrescenta chaves ao conjunto (in-place)."""
+        self._packed = np.union1d(self._packed, CompactKeySet.from_keys(keys)._packed)
+
+    __or__ = union
+    __sub__ = difference
+    __and__ = intersection
+
+    def filter_models(self, models: Iterable[str]) -> 'CompactKeySet':
+        """Mantém apenas as chaves dos modelos informados (ex: ['57'] para CT-e)."""
+        if len(self._packed) == 0:
+            return CompactKeySet()
+        # Dígitos 20 e 21 (modelo) ficam juntos no byte 10
+        model_byte = self._packed.view(np.uint8).reshape(-1, PACKED_WIDTH)[:, 10]
+        wanted = [((int(m[0]) + 1) << 4) | (int(m[1]) + 1) for m in models]
+        return self._wrap(self._packed[np.isin(model_byte, wanted)])
+
+    # ------------------------------------------------------------------
+    # Acesso
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._packed)
+
+    def __contains__(self, key: str) -> bool:
+        if len(key) != KEY_LENGTH or not key.isdigit():
+            return False
+        packed = pack_keys([key])[0]
+        pos = np.searchsorted(self._packed, packed)
+        return bool(pos < len(self._packed) and self._packed[pos] == packed)
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range(0, len(self._packed), _BATCH_SIZE):
+            yield from unpack_keys(self._packed[start:start + _BATCH_SIZE])
+
+    def to_list(self) -> List[str]:
+        return unpack_keys(self._packed)
+
+    @property
+    def nbytes(self) -> int:
+        return self._packed.nbytes
+
+    @property
+    def packed(self) -> np.ndarray:
+        return self._packed
+
+    def __repr__(self):
+        return f"CompactKeySet({len(self)} chaves, {self.nbytes} bytes)"
+
+    @staticmethod
+    def _wrap(packed: np.ndarray) -> 'CompactKeySet':
+        # O resultado das operações já está ordenado e sem repetição
+        result = CompactKeySet.__new__(CompactKeySet)
+        result._packed = packed
+        return result
+
+
+def pack_keys(keys: List[str]) -> np.ndarray:
+    """Empacota chaves de 44 dígitos (já validadas) em um array 'S22'."""
+    if not keys:
+        return np.empty(0, dtype=PACKED_DTYPE)
+    digits = np.frombuffer(''.join(keys).encode('ascii'), dtype=np.uint8).reshape(-1, KEY_LENGTH) - 47
+    packed = (digits[:, 0::2] << 4) | digits[:, 1::2]
+    return np.ascontiguousarray(packed).view(PACKED_DTYPE).ravel()
+
+
+def unpack_keys(packed: np.ndarray) -> List[str]:
+    """Operação inversa de pack_keys."""
+    if len(packed) == 0:
+        return []
+    raw = np.ascontiguousarray(packed).view(np.uint8).reshape(-1, PACKED_WIDTH)
+    digits = np.empty((len(raw), KEY_LENGTH), dtype=np.uint8)
+    digits[:, 0::2] = (raw >> 4) + 47
+    digits[:, 1::2] = (raw & 0x0F) + 47
+    text = digits.tobytes().decode('ascii')
+    return [text[i:i + KEY_LENGTH] for i in range(0, len(text), KEY_LENGTH)]
@@ -1,69 +1,428 @@
+import re
+import mmap
 import logging
 from pathlib import Path
-from typing import Callable, Optional, Tuple, List, Set
+from datetime import date
+from typing import Callable, Optional, Tuple, List, Iterator, Dict, Iterable
+
+import numpy as np
+
+from src.utils import profiling
+from src.utils.sped_scanner import read_header
+from src.utils.key_set import CompactKeySet
+from src.utils.cancellation import CancelToken, OperationCancelled, CANCELLED_MSG
 
 logger = logging.getLogger(__name__)
 
+# Linhas C100/D100 lidas direto dos bytes, sem dividir a linha inteira:
+# C100: campo 2 = IND_OPER, campo 9 = CHV_NFE
+# D100: campo 2 = IND_OPER, campo 10 = CHV_CTE
+# O '\n' inicial funciona como prefixo literal e acelera a busca do regex.
+KEY_LINE_PATTERN = re.compile(
+    rb'\n\|(?:(C100)\|([^|\r\n]*)\|(?:[^|\r\n]*\|){6}'
+    rb'|(D100)\|([^|\r\n]*)\|(?:[^|\r\n]*\|){7})'
+    rb'([^|\r\n]*)\|'
+)
+NON_DIGITS = re.compile(rb'\D')
+
+# Códigos IBGE das UFs
+VALID_UF_CODES = (11, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24, 25, 26, 27, 28, 29,
+                  31, 32, 33, 35, 41, 42, 43, 50, 51, 52, 53)
+# NF-e, CT-e, NFC-e e CT-e OS
+VALID_KEY_MODELS = (55, 57, 65, 67)
+# Demais documentos com chave de 44 dígitos: CF-e SAT (59), NFCom (62), NF3e (66)
+ALL_KEY_MODELS = (55, 57, 59, 62, 65, 66, 67)
+
+# Linhas dos registros de documento usados na extração com metadados
+DOCUMENT_LINE_PATTERN = re.compile(rb'\n\|(C100|C500|C800|D100|D500)\|([^\r\n]*)')
+
+DATASET_COLUMNS = ['chave', 'direcao', 'modelo', 'registro', 'data', 'valor', 'cod_part']
+
+# Pesos do módulo 11 (2 a 9, da direita para a esquerda) para os 43 primeiros dígitos
+_MOD11_WEIGHTS = np.array([2 + ((42 - i) % 8) for i in range(43)], dtype=np.int64)
+
+
+def validate_keys(keys: List[str], models: Iterable[int] = VALID_KEY_MODELS) -> Tuple[np.ndarray, List[str]]:
+    """
+    Valida chaves de acesso em lote (NumPy).
+
+    Confere formato (44 dígitos), dígito verificador (módulo 11), código da UF,
+    modelo (padrão 55/57/65/67) e mês de emissão (AAMM).
+    Retorna (máscara de chaves válidas, motivo da rejeição de cada chave).
+    """
+    total = len(keys)
+    valid = np.zeros(total, dtype=bool)
+    reasons = [''] * total
+    if total == 0:
+        return valid, reasons
+
+    well_formed = np.array([len(k) == 44 and k.isdigit() and k.isascii() for k in keys], dtype=bool)
+    idx = np.flatnonzero(well_formed)
+
+    for i in np.flatnonzero(~well_formed).tolist():
+        reasons[i] = "formato inválido (esperado 44 dígitos)"
+
+    if len(idx) == 0:
+        return valid, reasons
+
+    digits = (np.frombuffer(''.join(keys[i] for i in idx).encode('ascii'), dtype=np.uint8)
+              .reshape(-1, 44).astype(np.int64) - 48)
+
+    remainder = (digits[:, :43] @ _MOD11_WEIGHTS) % 11
+    expected_dv = np.where(remainder < 2, 0, 11 - remainder)
+    dv_ok = expected_dv == digits[:, 43]
+
+    uf = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    model = digits[:, 20] * 10 + digits[:, 21]
+
+    uf_ok = np.isin(uf, VALID_UF_CODES)
+    month_ok = (month >= 1) & (month <= 12)
+    model_ok = np.isin(model, tuple(models))
+
+    all_ok = dv_ok & uf_ok & month_ok & model_ok
+    valid[idx] = all_ok
+
+    for pos in np.flatnonzero(~all_ok).tolist():
+        motivos = []
+        if not dv_ok[pos]: motivos.append(f"dígito verificador inválido (esperado {expected_dv[pos]})")
+        if not uf_ok[pos]: motivos.append(f"UF inválida ({uf[pos]:02d})")
+        if not month_ok[pos]: motivos.append(f"mês de emissão inválido ({month[pos]:02d})")
+        if not model_ok[pos]: motivos.append(f"modelo inválido ({model[pos]:02d})")
+        reasons[idx[pos]] = "; ".join(motivos)
+
+    return valid, reasons
+
+
 class KeysExtractorLogic:
     def __init__(self):
-        pass
-
-    # Alterado o retorno para incluir a lista de chaves: Tuple[bool, str, List[str]]
-    def extract_keys(self, input_path: str, output_path: str, progress_callback: Optional[Callable[[int], None]] = None) -> Tuple[bool, str, List[str]]:
-        nfe_keys: Set[str] = set()
-        cte_keys: Set[str] = set()
-        lines_read = 0
-        total_lines = 0
-        
+        # Posição dos campos nos registros com chave de acesso, por tipo de escrituração:
+        # (IND_OPER, COD_PART, COD_MOD, CHAVE, DT_DOC, VL_DOC). None = campo inexistente.
+        # Quando a posição da chave é None (varia com a versão do leiaute), usa-se
+        # o primeiro campo com 44 dígitos.
+        self.KEY_REGISTER_LAYOUTS: Dict[str, Dict[str, Tuple]] = {
+            'EFD ICMS/IPI': {
+                'C100': (2, 4, 5, 9, 10, 12),
+                'C500': (2, 4, 5, None, 11, 13),
+                'C800': (None, None, 2, 11, 5, 6),
+                'D100': (2, 4, 5, 10, 11, 15),
+                'D500': (2, 4, 5, None, 10, 12),
+            },
+            'EFD Contribuições': {
+                'C100': (2, 4, 5, 9, 10, 12),
+                'C500': (None, 2, 3, 15, 8, 10),
+                'C800': (None, None, 2, 11, 5, 6),
+                'D100': (2, 4, 5, 10, 11, 15),
+                'D500': (2, 4, 5, None, 10, 12),
+            },
+        }
+        # Direção assumida pelos registros sem IND_OPER
+        self.DEFAULT_DIRECTION: Dict[str, str] = {'C500': '0', 'C800': '1'}
+
+    def scan_key_lines(self, input_path: str, progress_callback: Optional[Callable[[int], None]] = None,
+                       cancel_token: Optional[CancelToken] = None) -> Iterator[Tuple[str, str, str]]:
+        """
+        Varre o arquivo como bytes (mmap) e retorna (registro, IND_OPER, chave)
+        de cada linha C100/D100 que tenha o campo da chave preenchido.
+        """
+        input_p = Path(input_path)
+        size = input_p.stat().st_size
+        if size == 0:
+            return
+
+        with open(input_p, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for found, match in enumerate(KEY_LINE_PATTERN.finditer(mm), 1):
+                if found % 5000 == 0:
+                    if cancel_token: cancel_token.check()
+                    if progress_callback:
+                        progress_callback(int(match.end() / size * 100))
+
+                chave = match.group(5)
+                if not chave.isdigit():
+                    # Mantém só os dígitos (campo com espaço ou separador digitado)
+                    chave = NON_DIGITS.sub(b'', chave)
+                if not chave:
+                    continue
+                if match.group(1):
+                    yield 'C100', match.group(2).decode('latin-1'), chave.decode('latin-1')
+                else:
+                    yield 'D100', match.group(4).decode('latin-1'), chave.decode('latin-1')
+
+    def collect_entry_keys(self, input_path: str, progress_callback: Optional[Callable[[int], None]] = None,
+                           cancel_token: Optional[CancelToken] = None) -> Tuple[CompactKeySet, CompactKeySet, List[Tuple[str, str, str]]]:
+        """
+        Chaves de entrada de um SPED: (NFe, CTe, inválidas [(registro, chave, motivo)]).
+        """
+        candidatos: List[Tuple[str, str]] = []
+        with profiling.stage("chaves.varredura"):
+            for reg, ind_oper, chave in self.scan_key_lines(input_path, progress_callback, cancel_token):
+                if ind_oper == '0': # 0 = Entrada (Geralmente baixamos XML de entrada)
+                    candidatos.append((reg, chave))
+        if cancel_token: cancel_token.check()
+
+        # Validação em lote: chaves inválidas gastariam chamadas na API da Sieg
+        with profiling.stage("chaves.validacao"):
+            unicos = sorted(set(candidatos))
+            valid, reasons = validate_keys([chave for _, chave in unicos])
+            nfe, cte, invalidas = [], [], []
+            for (reg, chave), ok, motivo in zip(unicos, valid.tolist(), reasons):
+                if not ok:
+                    invalidas.append((reg, chave, motivo))
+                elif reg == 'C100':
+                    nfe.append(chave)
+                else:
+                    cte.append(chave)
+            return CompactKeySet.from_keys(nfe), CompactKeySet.from_keys(cte), invalidas
+
+    def iter_entry_keys(self, input_path: str, batch_size: int = 64,
+                        cancel_token: Optional[CancelToken] = None) -> Iterator[str]:
+        """
+        Gera as chaves de entrada válidas conforme são encontradas no arquivo,
+        validando em pequenos lotes para que o consumidor receba as primeiras
+        chaves antes do fim da leitura. Não deduplica (feito pelo consumidor).
+        """
+        batch: List[str] = []
+        for _, ind_oper, chave in self.scan_key_lines(input_path, cancel_token=cancel_token):
+            if ind_oper != '0':
+                continue
+            batch.append(chave)
+            if len(batch) >= batch_size:
+                yield from self._valid_only(batch)
+                batch = []
+        if batch:
+            yield from self._valid_only(batch)
+
+    def _valid_only(self, keys: List[str]) -> Iterator[str]:
+        valid, _ = validate_keys(keys)
+        for chave, ok in zip(keys, valid.tolist()):
+            if ok:
+                yield chave
+
+    # Alterado o retorno para incluir as chaves: Tuple[bool, str, CompactKeySet]
+    def extract_keys(self, input_path: str, output_path: str, progress_callback: Optional[Callable[[int], None]] = None,
+                     cancel_token: Optional[CancelToken] = None) -> Tuple[bool, str, CompactKeySet]:
         try:
-            input_p = Path(input_path)
-            # Contagem de linhas para progresso
+            nfe_keys, cte_keys, invalidas = self.collect_entry_keys(input_path, progress_callback, cancel_token)
+            self._write_keys_txt(output_path, nfe_keys, cte_keys, invalidas)
+
+            if progress_callback: progress_callback(100)
+
+            # Retorna TODAS as chaves combinadas num conjunto único para o download
+            todas_chaves = nfe_keys | cte_keys
+
+            msg = f"Sucesso!\nCTe: {len(cte_keys)}\nNFe: {len(nfe_keys)}"
+            if invalidas:
+                msg += f"\nInválidas: {len(invalidas)} (detalhes no arquivo gerado)"
+            return True, msg, todas_chaves
+
+        except OperationCancelled:
+            return False, CANCELLED_MSG, CompactKeySet()
+        except Exception as e:
+            return False, f"Erro: {str(e)}", CompactKeySet()
+
+    def extract_keys_many(self, input_paths: List[str], output_path: str,
+                          already_downloaded: Optional[CompactKeySet] = None,
+                          progress_callback: Optional[Callable[[int], None]] = None,
+                          cancel_token: Optional[CancelToken] = None) -> Tuple[bool, str, CompactKeySet]:
+        """
+        Extração de vários SPEDs (carteira de clientes) com deduplicação entre arquivos.
+        already_downloaded: chaves que devem ser descartadas (ex: XMLs já baixados).
+        """
+        nfe_keys, cte_keys = CompactKeySet(), CompactKeySet()
+        invalidas: List[Tuple[str, str, str]] = []
+        falhas: List[str] = []
+
+        for i, path in enumerate(input_paths):
+            try:
+                nfe, cte, inv = self.collect_entry_keys(path, cancel_token=cancel_token)
+                nfe_keys = nfe_keys | nfe
+                cte_keys = cte_keys | cte
+                invalidas.extend(inv)
+            except OperationCancelled:
+                return False, CANCELLED_MSG, CompactKeySet()
+            except Exception as e:
+                falhas.append(f"{Path(path).name}: {e}")
             if progress_callback:
-                try:
-                    with open(input_p, 'r', encoding='latin-1', errors='ignore') as f:
-                        total_lines = sum(1 for _ in f)
-                except: pass
-
-            with open(input_p, 'r', encoding='latin-1', errors='ignore') as infile:
-                for line in infile:
-                    lines_read += 1
-                    if progress_callback and total_lines > 0 and lines_read % 5000 == 0:
-                        progress_callback(int((lines_read / total_lines) * 100))
-
-                    line = line.strip()
-                    if not line.startswith('|') or len(line.split('|')) < 3: continue
-                    
-                    parts = line.split('|')
-                    reg = parts[1]
-
-                    # Captura NFe (C100)
-                    if reg == 'C100' and len(parts) > 9:
-                        if parts[2] == '0': # 0 = Entrada (Geralmente baixamos XML de entrada)
-                            chave = ''.join(filter(str.isdigit, parts[9]))
-                            if len(chave) == 44: nfe_keys.add(chave)
-
-                    # Captura CTe (D100)
-                    elif reg == 'D100' and len(parts) > 10:
-                        if parts[2] == '0': 
-                            chave = ''.join(filter(str.isdigit, parts[10]))
-                            if len(chave) == 44: cte_keys.add(chave)
-
-            # Salva o arquivo TXT (como você já fazia)
-            with open(output_path, 'w', encoding='utf-8') as outfile:
-                if cte_keys:
-                    outfile.write("=== CTe ===\n" + "\n".join(sorted(cte_keys)) + "\n\n")
-                else: outfile.write("=== NENHUM CTe ===\n\n")
-                
-                if nfe_keys:
-                    outfile.write("=== NFe ===\n" + "\n".join(sorted(nfe_keys)) + "\n")
-                else: outfile.write("=== NENHUMA NFe ===\n")
+                progress_callback(int((i + 1) / len(input_paths) * 100))
+
+        ja_baixadas = 0
+        if already_downloaded is not None and len(already_downloaded):
+            total_antes = len(nfe_keys) + len(cte_keys)
+            nfe_keys = nfe_keys - already_downloaded
+            cte_keys = cte_keys - already_downloaded
+            ja_baixadas = total_antes - len(nfe_keys) - len(cte_keys)
+
+        try:
+            self._write_keys_txt(output_path, nfe_keys, cte_keys, invalidas)
+        except Exception as e:
+            return False, f"Erro: {str(e)}", CompactKeySet()
+
+        msg = f"Sucesso! {len(input_paths)} arquivos\nCTe: {len(cte_keys)}\nNFe: {len(nfe_keys)}"
+        if ja_baixadas:
+            msg += f"\nJá baixadas (ignoradas): {ja_baixadas}"
+        if invalidas:
+            msg += f"\nInválidas: {len(invalidas)} (detalhes no arquivo gerado)"
+        if falhas:
+            msg += f"\nArquivos com erro: {len(falhas)} ({'; '.join(falhas[:3])})"
+        return True, msg, nfe_keys | cte_keys
+
+    @profiling.timed("chaves.gravacao")
+    def _write_keys_txt(self, output_path: str, nfe_keys: CompactKeySet, cte_keys: CompactKeySet,
+                        invalidas: List[Tuple[str, str, str]]):
+        # O CompactKeySet já itera em ordem crescente
+        with open(output_path, 'w', encoding='utf-8') as outfile:
+            if len(cte_keys):
+                outfile.write("=== CTe ===\n" + "\n".join(cte_keys) + "\n\n")
+            else: outfile.write("=== NENHUM CTe ===\n\n")
+
+            if len(nfe_keys):
+                outfile.write("=== NFe ===\n" + "\n".join(nfe_keys) + "\n")
+            else: outfile.write("=== NENHUMA NFe ===\n")
+
+            if invalidas:
+                outfile.write("\n=== CHAVES INVÁLIDAS (não serão baixadas) ===\n")
+                for reg, chave, motivo in invalidas:
+                    outfile.write(f"{reg} | {chave} | {motivo}\n")
+
+    def extract_documents(self, input_path: str, output_path: str,
+                          directions: Iterable[str] = ('0', '1'),
+                          registers: Optional[Iterable[str]] = None,
+                          models: Optional[Iterable[str]] = None,
+                          start_date: Optional[date] = None, end_date: Optional[date] = None,
+                          progress_callback: Optional[Callable[[int], None]] = None,
+                          cancel_token: Optional[CancelToken] = None) -> Tuple[bool, str, List[str]]:
+        """
+        Extrai as chaves com os metadados do documento numa única passada e grava
+        um dataset colunar (CSV ou Parquet, conforme a extensão de output_path).
+
+        directions: '0' = entrada, '1' = saída
+        registers: registros a considerar (padrão: C100, C500, C800, D100, D500)
+        models: códigos de modelo aceitos (ex: ['55', '57']); None = todos
+        start_date / end_date: filtro pela data do documento (inclusive)
+        """
+        try:
+            header = read_header(input_path)
+            layouts = self.KEY_REGISTER_LAYOUTS.get(header['tipo'], self.KEY_REGISTER_LAYOUTS['EFD ICMS/IPI'])
+            wanted_regs = set(registers) if registers else set(layouts)
+            wanted_dirs = set(directions)
+            wanted_models = set(models) if models else None
+
+            columns: Dict[str, list] = {col: [] for col in DATASET_COLUMNS}
+            input_p = Path(input_path)
+            size = input_p.stat().st_size
+
+            with open(input_p, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for found, match in enumerate(DOCUMENT_LINE_PATTERN.finditer(mm), 1):
+                    if found % 5000 == 0:
+                        if cancel_token: cancel_token.check()
+                        if progress_callback:
+                            progress_callback(min(int(match.end() / size * 100), 99))
+
+                    reg = match.group(1).decode('latin-1')
+                    if reg not in wanted_regs or reg not in layouts:
+                        continue
+
+                    # Só as linhas selecionadas são divididas em campos
+                    parts = ['', reg] + match.group(2).decode('latin-1').split('|')
+                    row = self._document_row(reg, parts, layouts[reg])
+                    if row is None:
+                        continue
+                    if row['direcao'] not in wanted_dirs:
+                        continue
+                    if wanted_models is not None and row['modelo'] not in wanted_models:
+                        continue
+                    if start_date and (row['data'] is None or row['data'] < start_date):
+                        continue
+                    if end_date and (row['data'] is None or row['data'] > end_date):
+                        continue
+
+                    for col in DATASET_COLUMNS:
+                        columns[col].append(row[col])
+
+            if cancel_token: cancel_token.check()
+            valid, _ = validate_keys(columns['chave'], models=ALL_KEY_MODELS)
+            invalid_count = int(np.count_nonzero(~valid))
+
+            import pandas as pd
+            df = pd.DataFrame(columns)[valid] if len(valid) else pd.DataFrame(columns)
+            df['direcao'] = df['direcao'].map({'0': 'entrada', '1': 'saida'})
+            df['data'] = pd.to_datetime(df['data'])
+
+            saved_path = self._save_dataset(df, output_path)
 
             if progress_callback: progress_callback(100)
-            
-            # Retorna TODAS as chaves combinadas numa lista única para o download
-            todas_chaves = list(nfe_keys) + list(cte_keys)
-            
-            return True, f"Sucesso!\nCTe: {len(cte_keys)}\nNFe: {len(nfe_keys)}", todas_chaves
 
+            chaves = list(dict.fromkeys(df['chave'].tolist()))
+            msg = f"Sucesso!\nDocumentos: {len(df)}\nChaves únicas: {len(chaves)}"
+            if invalid_count:
+                msg += f"\nInválidas (ignoradas): {invalid_count}"
+            if saved_path != output_path:
+                msg += f"\nSalvo como CSV (pyarrow não instalado): {saved_path}"
+            return True, msg, chaves
+
+        except OperationCancelled:
+            return False, CANCELLED_MSG, []
         except Exception as e:
-            return False, f"Erro: {str(e)}", []
\ No newline at end of file
+            return False, f"Erro: {str(e)}", []
+
+    def _document_row(self, reg: str, parts: List[str], layout: Tuple) -> Optional[Dict]:
+        idx_oper, idx_part, idx_mod, idx_key, idx_date, idx_value = layout
+
+        def field(i):
+            return parts[i].strip() if i is not None and i < len(parts) else ''
+
+        chave = field(idx_key)
+        if len(chave) != 44 or not chave.isdigit():
+            chave = next((p for p in parts[2:] if len(p) == 44 and p.isdigit()), '')
+        if not chave:
+            return None
+
+        return {
+            'chave': chave,
+            'direcao': field(idx_oper) if idx_oper is not None else self.DEFAULT_DIRECTION.get(reg, '0'),
+            'modelo': field(idx_mod),
+            'registro': reg,
+            'data': _parse_sped_date(field(idx_date)),
+            'valor': _to_float(field(idx_value)),
+            'cod_part': field(idx_part),
+        }
+
+    def _save_dataset(self, df, output_path: str) -> str:
+        if output_path.lower().endswith('.parquet'):
+            try:
+                df.to_parquet(output_path, index=False)
+                return output_path
+            except ImportError:
+                output_path = output_path[:-len('.parquet')] + '.csv'
+        df.to_csv(output_path, index=False, encoding='utf-8')
+        return output_path
+
+    def load_keys_dataset(self, dataset_path: str) -> Tuple[bool, str, List[str]]:
+        """Lê as chaves de um dataset gerado por extract_documents (sem reler o SPED)."""
+        try:
+            import pandas as pd
+            if dataset_path.lower().endswith('.parquet'):
+                df = pd.read_parquet(dataset_path, columns=['chave'])
+            else:
+                df = pd.read_csv(dataset_path, usecols=['chave'], dtype={'chave': str})
+            chaves = list(dict.fromkeys(df['chave'].dropna().tolist()))
+            return True, f"{len(chaves)} chaves carregadas do dataset.", chaves
+        except Exception as e:
+            return False, f"Erro ao ler dataset: {str(e)}", []
+
+
+def _parse_sped_date(date_str: str) -> Optional[date]:
+    if not date_str or len(date_str) != 8: return None
+    try:
+        return date(int(date_str[4:8]), int(date_str[2:4]), int(date_str[0:2]))
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_float(val_str: str) -> float:
+    if not val_str:
+        return 0.0
+    try:
+        return float(val_str.replace(',', '.'))
+    except ValueError:
+        return 0.0
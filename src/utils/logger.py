@@ -1,38 +1,196 @@
 import os
+import json
+import queue
+import atexit
 import datetime
+import threading
+
+LOG_DIR = "logs"
+# Structured log (JSON lines): one file per day, rotated when it reaches this size
+EVENTS_MAX_BYTES = 10 * 1024 * 1024
+# The writer thread flushes at least this often (seconds) and at most this many records at once
+FLUSH_INTERVAL = 0.5
+MAX_BATCH = 1000
 
 # Global variable to store the current session log file path
 current_session_file = None
+current_username = None
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class _LogWriter(threading.Thread):
+    """
+    Background writer: drains the queue in batches and writes both the
+    human-readable session file and the JSON lines event file, flushing once
+    per batch instead of reopening the files for every message.
+    """
+
+    def __init__(self):
+        super().__init__(name="log-writer", daemon=True)
+        self.session_path = None
+        self.session_fh = None
+        self.events_path = None
+        self.events_fh = None
+
+    def run(self):
+        while True:
+            try:
+                batch = [_queue.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            flush_events = []
+            sessions = []
+            events = []
+            for record in batch:
+                kind = record[0]
+                try:
+                    if kind == 'session':
+                        self._open_session(record[1], record[2])
+                        sessions.append((record[3], record[4], os.path.basename(record[1])))
+                    elif kind == 'action':
+                        self._write_action(record[1], record[2], record[3])
+                        events.append(record[3])
+                    elif kind == 'flush':
+                        flush_events.append(record[1])
+                except OSError as e:
+                    print(f"Warning: failed to write log: {e}")
+
+            for fh in (self.session_fh, self.events_fh):
+                if fh:
+                    fh.flush()
+
+            self._index(sessions, events)
+            for event in flush_events:
+                event.set()
+
+    def _index(self, sessions, events):
+        """Feeds the activity index queried by the dashboard."""
+        if not sessions and not events:
+            return
+        try:
+            # Imported here: activity_store -> database -> logger
+            from src.utils import activity_store
+            for username, started_at, log_file in sessions:
+                activity_store.record_session(username, started_at, log_file)
+            activity_store.record_events(events)
+        except Exception as e:
+            print(f"Warning: failed to index activity: {e}")
+
+    def _open_session(self, path, header):
+        if self.session_fh:
+            self.session_fh.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.session_path = path
+        self.session_fh = open(path, "w", encoding="utf-8")
+        self.session_fh.write(header)
+
+    def _write_action(self, session_path, text, event):
+        if session_path:
+            if session_path != self.session_path:
+                if self.session_fh:
+                    self.session_fh.close()
+                self.session_path = session_path
+                self.session_fh = open(session_path, "a", encoding="utf-8")
+            self.session_fh.write(text)
+
+        self._events_file(event['ts'][:10].replace('-', '')).write(
+            json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        )
+
+    def _events_file(self, day):
+        base = os.path.join(LOG_DIR, f"events_{day}.jsonl")
+        need_new = self.events_fh is None or not self.events_path.startswith(base[:-len(".jsonl")])
+        if not need_new and self.events_fh.tell() >= EVENTS_MAX_BYTES:
+            need_new = True
+        if need_new:
+            if self.events_fh:
+                self.events_fh.close()
+            os.makedirs(LOG_DIR, exist_ok=True)
+            path, part = base, 1
+            while os.path.exists(path) and os.path.getsize(path) >= EVENTS_MAX_BYTES:
+                path = os.path.join(LOG_DIR, f"events_{day}_{part}.jsonl")
+                part += 1
+            self.events_path = path
+            self.events_fh = open(path, "a", encoding="utf-8")
+        return self.events_fh
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _writer_lock:
+            if _writer is None or not _writer.is_alive():
+                _writer = _LogWriter()
+                _writer.start()
+
 
 def start_session_log(username):
     """
     Starts a new log session for the given username.
     Creates a file in 'logs/' directory with format session_{username}_{timestamp}.txt
     """
-    global current_session_file
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    global current_session_file, current_username
+    now = datetime.datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
     # Sanitize username to prevent path traversal or invalid chars
     safe_username = "".join(c for c in username if c.isalnum() or c in ('-', '_'))
     filename = f"session_{safe_username}_{timestamp}.txt"
-    log_dir = "logs"
-
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
 
-    current_session_file = os.path.join(log_dir, filename)
+    current_session_file = os.path.join(LOG_DIR, filename)
+    current_username = username
 
-    with open(current_session_file, "w", encoding="utf-8") as f:
-        f.write(f"Session started for user: {username} at {datetime.datetime.now()}\n")
-        f.write("-" * 50 + "\n")
+    header = f"Session started for user: {username} at {now}\n" + "-" * 50 + "\n"
+    _ensure_writer()
+    _queue.put(('session', current_session_file, header, username, now))
 
-def log_action(message):
+def log_action(message, action=None, duration=None, details=None, **fields):
     """
-    Logs an action to the current session file.
+    Logs an action to the current session file and to the JSON lines event log.
+    action: short machine-readable name (defaults to the message)
+    duration: seconds spent on the action, if any
+    details: extra text written below the line in the session file only (e.g. a timing breakdown)
+    fields: extra data for the JSON record (e.g. input_bytes=..., output_bytes=...)
     """
-    global current_session_file
-    if current_session_file:
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        with open(current_session_file, "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] {message}\n")
-    else:
+    now = datetime.datetime.now()
+    if not current_session_file:
         print(f"Warning: No active session log. Message: {message}")
+
+    text = f"[{now.strftime('%H:%M:%S')}] {message}"
+    if duration is not None:
+        text += f" ({duration:.2f}s)"
+    if details:
+        text += "".join(f"\n    {line}" for line in details.splitlines())
+
+    event = {
+        "ts": now.isoformat(timespec="milliseconds"),
+        "user": current_username,
+        "session": os.path.basename(current_session_file) if current_session_file else None,
+        "action": action or message,
+        "message": message,
+    }
+    if duration is not None:
+        event["duration_s"] = round(duration, 4)
+    event.update(fields)
+
+    _ensure_writer()
+    _queue.put(('action', current_session_file, text + "\n", event))
+
+def flush_logs(timeout=2.0):
+    """Blocks until every queued record has been written (or the timeout expires)."""
+    if _writer is None or not _writer.is_alive():
+        return
+    done = threading.Event()
+    _queue.put(('flush', done))
+    done.wait(timeout)
+
+
+atexit.register(flush_logs)
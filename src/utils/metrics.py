@@ -0,0 +1,302 @@
+"""
+Métricas de desempenho do processo (contadores, medidores e histogramas).
+
+As ferramentas alimentam o REGISTRY (JobManager ao fim de cada tarefa,
+SiegManager a cada requisição). start_metrics() expõe os valores:
+- em texto OpenMetrics em http://127.0.0.1:METRICS_PORT/metrics (Prometheus etc.)
+- em logs/metrics_AAAAMMDD.jsonl, uma linha a cada METRICS_SNAPSHOT_INTERVAL
+  segundos (histórico para comparar dias/versões)
+
+Os valores são acumulados desde o início do processo.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.config import METRICS_PORT, METRICS_SNAPSHOT_INTERVAL
+from src.utils.logger import LOG_DIR
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name}: rótulos esperados {self.labels}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _label_text(self, key: Tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def header(self) -> List[str]:
+        return [f"# TYPE {self.name} {self.type_name}", f"# HELP {self.name} {_escape(self.help)}"]
+
+
+class Counter(_Metric):
+    """Valor que só aumenta (ex: tarefas finalizadas)."""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}_total{self._label_text(key)} {_number(v)}" for key, v in sorted(self.values().items())]
+
+    def snapshot(self):
+        return [{**dict(zip(self.labels, key)), 'valor': v} for key, v in sorted(self.values().items())]
+
+
+class Gauge(_Metric):
+    """Valor instantâneo (ex: tarefas na fila)."""
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(v)}" for key, v in sorted(self.values().items())]
+
+    def snapshot(self):
+        return [{**dict(zip(self.labels, key)), 'valor': v} for key, v in sorted(self.values().items())]
+
+
+class Histogram(_Metric):
+    """Distribuição de valores em faixas (ex: duração das requisições)."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [contagem por faixa (a última é +Inf), soma, quantidade]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def totals(self, **labels) -> Tuple[float, int]:
+        """(soma, quantidade) de um conjunto de rótulos; sem rótulos, de todos."""
+        with self._lock:
+            if labels:
+                state = self._values.get(self._key(labels))
+                return (state[1], state[2]) if state else (0.0, 0)
+            return (sum(s[1] for s in self._values.values()), sum(s[2] for s in self._values.values()))
+
+    def _states(self) -> Dict[Tuple, Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(s[0]), s[1], s[2]) for key, s in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._states().items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float('inf') else _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+    def snapshot(self):
+        return [{**dict(zip(self.labels, key)), 'soma': round(total, 4), 'quantidade': count,
+                 'faixas': dict(zip([str(b) for b in self.buckets] + ['+Inf'], counts))}
+                for key, (counts, total, count) in sorted(self._states().items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.started = datetime.datetime.now()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrica {name} já registrada como {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """Texto no formato OpenMetrics (termina com '# EOF')."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines += metric.header() + metric.render()
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {
+            'em': datetime.datetime.now().isoformat(timespec='seconds'),
+            'inicio': self.started.isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'metricas': {name: metric.snapshot() for name, metric in sorted(metrics.items())},
+        }
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Métricas da aplicação ---
+JOBS_FINISHED = REGISTRY.counter("siegauto_jobs", "Tarefas finalizadas por ferramenta e situação", ("action", "status"))
+JOB_DURATION = REGISTRY.histogram("siegauto_job_duration_seconds", "Duração das tarefas", ("action",),
+                                  buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+JOB_INPUT_BYTES = REGISTRY.counter("siegauto_job_input_bytes", "Bytes de entrada processados (tarefas concluídas)", ("action",))
+JOB_ITEMS = REGISTRY.counter("siegauto_job_items", "Itens processados (ex: XMLs baixados)", ("action",))
+JOBS_QUEUED = REGISTRY.gauge("siegauto_jobs_queued", "Tarefas aguardando na fila")
+JOBS_RUNNING = REGISTRY.gauge("siegauto_jobs_running", "Tarefas em execução")
+SIEG_REQUESTS = REGISTRY.counter("siegauto_sieg_requests", "Requisições à API da Sieg por tipo e resultado", ("kind", "outcome"))
+SIEG_LATENCY = REGISTRY.histogram("siegauto_sieg_request_duration_seconds", "Tempo de resposta da API da Sieg", ("kind",),
+                                  buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+
+
+def record_sieg_request(kind: str, seconds: float, outcome: str):
+    """kind: 'xml' ou 'pdf'; outcome: 'ok', 'http_<código>', 'recusada' ou 'erro_conexao'."""
+    SIEG_REQUESTS.inc(kind=kind, outcome=outcome)
+    SIEG_LATENCY.observe(seconds, kind=kind)
+
+
+def sieg_health(kind: str = 'xml') -> Tuple[Optional[float], Optional[float], int]:
+    """(latência média em s, fração de falhas, requisições) desde o início do processo."""
+    total, count = SIEG_LATENCY.totals(kind=kind)
+    requests_by_outcome = {key: v for key, v in SIEG_REQUESTS.values().items() if key[0] == kind}
+    n = int(sum(requests_by_outcome.values()))
+    if not n:
+        return None, None, 0
+    failures = sum(v for (_, outcome), v in requests_by_outcome.items() if outcome != 'ok')
+    return (total / count if count else None), failures / n, n
+
+
+# ----------------------------------------------------------------------
+# Exposição: endpoint local e arquivo de snapshots
+# ----------------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "SiegAutoMetrics/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        data = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def write_snapshot(log_dir: str = LOG_DIR):
+    """Acrescenta o estado atual em logs/metrics_AAAAMMDD.jsonl."""
+    snapshot = REGISTRY.snapshot()
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, f"metrics_{datetime.date.today():%Y%m%d}.jsonl")
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_metrics(port: Optional[int] = METRICS_PORT, snapshot_interval: Optional[float] = METRICS_SNAPSHOT_INTERVAL):
+    """
+    Abre o endpoint em 127.0.0.1:port (None desativa) e inicia os snapshots
+    periódicos (None desativa). Chamadas seguintes não fazem nada.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    if port:
+        try:
+            httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        except OSError as e:
+            # Ex: outra instância do programa na mesma máquina
+            logger.warning("Endpoint de métricas não iniciado (porta %s): %s", port, e)
+        else:
+            httpd.daemon_threads = True
+            threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+
+    if snapshot_interval:
+        def snapshots():
+            while True:
+                time.sleep(snapshot_interval)
+                try:
+                    write_snapshot()
+                except OSError as e:
+                    logger.warning("Não foi possível gravar o snapshot de métricas: %s", e)
+        threading.Thread(target=snapshots, name="metrics-snapshot", daemon=True).start()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,242 @@
+"""
+Tempos por etapa das ferramentas.
+
+As etapas são marcadas no código com
+
+    with profiling.stage("difal.parse"):
+        ...
+
+ou com o decorador @profiling.timed("..."). Fora de um profile_job() (sem
+tarefa sendo medida) stage() devolve um contexto vazio compartilhado: o custo é
+uma leitura de ContextVar. As etapas não devem ser aninhadas (o tempo fora
+delas aparece como "fora das etapas").
+
+O JobManager abre um profile_job() para cada tarefa; ao final, a divisão do
+tempo vai para o log da sessão e para o painel de Tarefas. Opcionalmente
+(PROFILE_CPROFILE / PROFILE_TRACEMALLOC) a tarefa também é executada sob o
+cProfile e/ou o tracemalloc, bem mais caros.
+"""
+import io
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import contextlib
+import contextvars
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+from src.config import PROFILE_CPROFILE, PROFILE_STAGES, PROFILE_TOP_N, PROFILE_TRACEMALLOC
+
+_current: contextvars.ContextVar = contextvars.ContextVar("job_profile", default=None)
+# Tarefas usando o tracemalloc (é do processo: só para quando a última terminar)
+_tracing_jobs = 0
+_tracing_lock = threading.Lock()
+
+
+class JobProfile:
+    """Tempos acumulados por etapa de uma tarefa (segundos e número de chamadas)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: Dict[str, List[float]] = {}
+        self.total: Optional[float] = None
+        self.cprofile_text: Optional[str] = None
+        self.memory_peak: Optional[int] = None
+        self.memory_top: List[Tuple[str, int]] = []
+        # Etapas podem vir de várias threads da mesma tarefa (downloads em paralelo)
+        self._lock = threading.Lock()
+
+    def add(self, stage_name: str, seconds: float, calls: int = 1):
+        with self._lock:
+            entry = self.stages.get(stage_name)
+            if entry is None:
+                self.stages[stage_name] = [seconds, calls]
+            else:
+                entry[0] += seconds
+                entry[1] += calls
+
+    def breakdown(self) -> List[Tuple[str, float, int, Optional[float]]]:
+        """(etapa, segundos, chamadas, % do total), da mais demorada para a mais rápida."""
+        with self._lock:
+            items = [(name, s, n) for name, (s, n) in self.stages.items()]
+        items.sort(key=lambda item: item[1], reverse=True)
+        return [(name, s, n, s / self.total * 100 if self.total else None) for name, s, n in items]
+
+    def summary(self) -> str:
+        """Uma linha: 'difal.parse 1.20s (80%), difal.excel 0.20s (13%)'."""
+        parts = []
+        for name, seconds, _, pct in self.breakdown():
+            parts.append(f"{name} {seconds:.2f}s" + (f" ({pct:.0f}%)" if pct is not None else ""))
+        return ", ".join(parts) or "sem etapas medidas"
+
+    def report(self) -> str:
+        """Texto completo: tabela de etapas e, se capturados, cProfile e memória."""
+        lines = [f"{self.name}: {self.total:.3f}s" if self.total is not None else self.name]
+        for name, seconds, calls, pct in self.breakdown():
+            pct_text = f"{pct:5.1f}%" if pct is not None else "    -"
+            lines.append(f"  {name:<32} {seconds:9.3f}s {pct_text} {calls:>9,}x")
+        extras = self.extras()
+        if extras:
+            lines.append(extras)
+        return "\n".join(lines)
+
+    def extras(self) -> str:
+        """Parte do relatório após a tabela: tempo fora das etapas, memória e cProfile."""
+        lines = []
+        if self.total is not None and self.stages:
+            # Etapas em threads paralelas podem somar mais que o total
+            measured = sum(s for _, s, _, _ in self.breakdown())
+            if measured < self.total:
+                lines.append(f"  {'(fora das etapas)':<32} {self.total - measured:9.3f}s")
+        if self.memory_peak is not None:
+            lines.append(f"Pico de memória alocada: {self.memory_peak / 1024 / 1024:.1f} MB")
+            for where, size in self.memory_top:
+                lines.append(f"  {size / 1024 / 1024:8.2f} MB  {where}")
+        if self.cprofile_text:
+            lines.append(self.cprofile_text.rstrip())
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict:
+        return {
+            'total_s': round(self.total, 4) if self.total is not None else None,
+            'etapas': {name: {'s': round(s, 4), 'chamadas': n} for name, s, n, _ in self.breakdown()},
+            'pico_memoria_mb': round(self.memory_peak / 1024 / 1024, 1) if self.memory_peak is not None else None,
+        }
+
+
+class _Stage:
+    __slots__ = ('profile', 'name', 't0')
+
+    def __init__(self, profile: JobProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str):
+    """Contexto que soma o tempo do bloco à etapa `name` da tarefa atual."""
+    profile = _current.get()
+    return _NULL_STAGE if profile is None else _Stage(profile, name)
+
+
+def timed(name: str):
+    """Decorador: soma o tempo de cada chamada da função à etapa `name`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.add(name, time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+def current() -> Optional[JobProfile]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def profile_job(name: str, enabled: bool = PROFILE_STAGES, cprofile: bool = PROFILE_CPROFILE,
+                trace_memory: bool = PROFILE_TRACEMALLOC):
+    """
+    Mede a tarefa executada no bloco; entrega o JobProfile (None se desativado).
+    Dentro de outro profile_job, reaproveita o perfil já ativo.
+
+    cprofile: só mede a thread atual; ignorado se outro profiler estiver ativo.
+    trace_memory: o tracemalloc é do processo inteiro; com tarefas simultâneas o
+    pico inclui as alocações das outras.
+    """
+    active = _current.get()
+    if active is not None or not (enabled or cprofile or trace_memory):
+        yield active
+        return
+
+    profile = JobProfile(name)
+    token = _current.set(profile)
+    profiler = _start_cprofile() if cprofile else None
+    if trace_memory:
+        _start_tracemalloc()
+    t0 = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.total = time.perf_counter() - t0
+        if profiler is not None:
+            profiler.disable()
+            profile.cprofile_text = _cprofile_text(profiler)
+        if trace_memory:
+            profile.memory_peak = tracemalloc.get_traced_memory()[1]
+            profile.memory_top = _memory_top(tracemalloc.take_snapshot())
+            _stop_tracemalloc()
+        _current.reset(token)
+
+
+def _start_tracemalloc():
+    global _tracing_jobs
+    with _tracing_lock:
+        if _tracing_jobs == 0:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        _tracing_jobs += 1
+
+
+def _stop_tracemalloc():
+    global _tracing_jobs
+    with _tracing_lock:
+        _tracing_jobs -= 1
+        if _tracing_jobs == 0:
+            tracemalloc.stop()
+
+
+def _start_cprofile() -> Optional[cProfile.Profile]:
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+: apenas um profiler por vez (ex: duas tarefas com cProfile)
+        return None
+    return profiler
+
+
+def _cprofile_text(profiler: cProfile.Profile, limit: int = PROFILE_TOP_N) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def _memory_top(snapshot, limit: int = PROFILE_TOP_N) -> List[Tuple[str, int]]:
+    stats = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, pstats.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    )).statistics('lineno')
+    return [(str(stat.traceback[0]), stat.size) for stat in stats[:limit]]
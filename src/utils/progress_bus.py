@@ -0,0 +1,137 @@
+import threading
+import weakref
+import multiprocessing
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.config import UI_REFRESH_HZ
+
+
+class ProgressChannel:
+    """
+    Estado de progresso de uma tarefa.
+
+    publish() apenas grava os valores (sem tocar na interface), então pode ser
+    chamado a cada item processado. O ProgressBus lê o estado no próximo quadro.
+    poll: função opcional chamada a cada quadro para ler contadores externos
+    (ex: SharedCounter atualizado por outros processos).
+    """
+
+    def __init__(self, bus: 'ProgressBus', render: Callable[[Dict], Iterable], poll: Optional[Callable[[], Dict]] = None):
+        self._bus = bus
+        self._render = render
+        self._poll = poll
+        self._state: Dict = {}
+        self._version = 0
+        self._rendered = 0
+        self.closed = False
+
+    def publish(self, **values):
+        self._state.update(values)
+        self._version += 1
+
+    def close(self):
+        """
+        Encerra o canal. Retorna só depois do quadro em andamento, de modo que
+        as atualizações finais feitas em seguida não são sobrescritas.
+        """
+        self._bus._remove(self)
+
+    def _collect(self) -> List:
+        if self._poll:
+            polled = self._poll()
+            if polled != {k: self._state.get(k) for k in polled}:
+                self.publish(**polled)
+        if self._version == self._rendered:
+            return []
+        self._rendered = self._version
+        return list(self._render(dict(self._state)) or [])
+
+
+class ProgressBus:
+    """
+    Junta as atualizações de progresso de todas as tarefas da página e as envia
+    ao cliente Flet num único page.update() por quadro (UI_REFRESH_HZ por segundo),
+    em vez de um update() por callback de progresso.
+    """
+
+    _buses: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+    _buses_lock = threading.Lock()
+
+    def __init__(self, page, hz: float = UI_REFRESH_HZ):
+        self.page = page
+        self.interval = 1.0 / hz
+        self._channels: List[ProgressChannel] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def for_page(cls, page) -> 'ProgressBus':
+        """Bus compartilhado pelas views da página."""
+        with cls._buses_lock:
+            bus = cls._buses.get(page)
+            if bus is None:
+                bus = cls._buses[page] = cls(page)
+            return bus
+
+    def channel(self, render: Callable[[Dict], Iterable], poll: Optional[Callable[[], Dict]] = None) -> ProgressChannel:
+        """
+        Abre um canal. render(estado) aplica os valores nos controles e devolve
+        os controles a atualizar; é sempre chamado na thread do bus.
+        """
+        channel = ProgressChannel(self, render, poll)
+        with self._lock:
+            self._channels.append(channel)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="progress-bus", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return channel
+
+    def _remove(self, channel: ProgressChannel):
+        with self._lock:
+            channel.closed = True
+            if channel in self._channels:
+                self._channels.remove(channel)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._channels:
+                    # Sem tarefas: a thread termina e é recriada no próximo canal
+                    self._thread = None
+                    return
+                controls = []
+                for channel in self._channels:
+                    try:
+                        controls.extend(channel._collect())
+                    except Exception as e:
+                        print(f"Aviso: erro ao atualizar progresso: {e}")
+                # Controles de abas/telas que não estão na página são ignorados
+                controls = [c for c in dict.fromkeys(controls) if c.page]
+                if controls:
+                    try:
+                        self.page.update(*controls)
+                    except Exception as e:
+                        print(f"Aviso: erro ao atualizar progresso: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+class SharedCounter:
+    """
+    Contador em memória compartilhada, incrementado por processos de um
+    ProcessPoolExecutor e lido pelo ProgressBus (poll) no processo principal.
+    Deve ser repassado aos processos pelo initializer do pool.
+    """
+
+    def __init__(self):
+        self._value = multiprocessing.Value('q', 0)
+
+    def add(self, n: int = 1):
+        with self._value.get_lock():
+            self._value.value += n
+
+    @property
+    def value(self) -> int:
+        return self._value.value
@@ -1,12 +1,19 @@
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from typing import TYPE_CHECKING
 
-def generate_fiscal_report(df: pd.DataFrame, output_path: str):
+from src.utils import profiling
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+def generate_fiscal_report(df: 'pd.DataFrame', output_path: str):
     """
     Generates an Excel report from the aggregated SPED data.
     """
+    # Imported on first use: openpyxl is slow to load and not needed at startup
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+
     if df is None or df.empty:
         return False
 
@@ -62,45 +69,48 @@ def generate_fiscal_report(df: pd.DataFrame, output_path: str):
         cell.border = Border(bottom=Side(style='thin'))
 
     # Data (Row 4+)
-    for r_idx, row in df.iterrows():
-        # A - B
-        ws.cell(row=r_idx+4, column=1, value=row['Bloco'])
-        ws.cell(row=r_idx+4, column=2, value=row['CFOP'])
-
-        # C - F (Values)
-        ws.cell(row=r_idx+4, column=3, value=row['Valor_Item']).number_format = '#,##0.00'
-        ws.cell(row=r_idx+4, column=4, value=row['Valor_ICMS']).number_format = '#,##0.00'
+    with profiling.stage("relatorio.linhas"):
+        for r_idx, row in df.iterrows():
+            # A - B
+            ws.cell(row=r_idx+4, column=1, value=row['Bloco'])
+            ws.cell(row=r_idx+4, column=2, value=row['CFOP'])
+
+            # C - F (Values)
+            ws.cell(row=r_idx+4, column=3, value=row['Valor_Item']).number_format = '#,##0.00'
+            ws.cell(row=r_idx+4, column=4, value=row['Valor_ICMS']).number_format = '#,##0.00'
         
-        # Coluna Nova: ICMS ST (E)
-        ws.cell(row=r_idx+4, column=5, value=row['Valor_ICMS_ST']).number_format = '#,##0.00'
+            # Coluna Nova: ICMS ST (E)
+            ws.cell(row=r_idx+4, column=5, value=row['Valor_ICMS_ST']).number_format = '#,##0.00'
         
-        ws.cell(row=r_idx+4, column=6, value=row['Valor_IPI']).number_format = '#,##0.00'
+            ws.cell(row=r_idx+4, column=6, value=row['Valor_IPI']).number_format = '#,##0.00'
 
-        # G - J (PIS)
-        ws.cell(row=r_idx+4, column=7, value=row['CST_PIS'])
-        ws.cell(row=r_idx+4, column=8, value=row['Base_PIS']).number_format = '#,##0.00'
-        ws.cell(row=r_idx+4, column=9, value=row['Aliq_PIS']).number_format = '0.00'
-        ws.cell(row=r_idx+4, column=10, value=row['Valor_PIS']).number_format = '#,##0.00'
+            # G - J (PIS)
+            ws.cell(row=r_idx+4, column=7, value=row['CST_PIS'])
+            ws.cell(row=r_idx+4, column=8, value=row['Base_PIS']).number_format = '#,##0.00'
+            ws.cell(row=r_idx+4, column=9, value=row['Aliq_PIS']).number_format = '0.00'
+            ws.cell(row=r_idx+4, column=10, value=row['Valor_PIS']).number_format = '#,##0.00'
 
-        # K - N (COFINS)
-        ws.cell(row=r_idx+4, column=11, value=row['CST_COFINS'])
-        ws.cell(row=r_idx+4, column=12, value=row['Base_COFINS']).number_format = '#,##0.00'
-        ws.cell(row=r_idx+4, column=13, value=row['Aliq_COFINS']).number_format = '0.00'
-        ws.cell(row=r_idx+4, column=14, value=row['Valor_COFINS']).number_format = '#,##0.00'
+            # K - N (COFINS)
+            ws.cell(row=r_idx+4, column=11, value=row['CST_COFINS'])
+            ws.cell(row=r_idx+4, column=12, value=row['Base_COFINS']).number_format = '#,##0.00'
+            ws.cell(row=r_idx+4, column=13, value=row['Aliq_COFINS']).number_format = '0.00'
+            ws.cell(row=r_idx+4, column=14, value=row['Valor_COFINS']).number_format = '#,##0.00'
 
     # Auto-adjust column widths
-    for i, col in enumerate(ws.columns, 1):
-        max_length = 0
-        column_letter = get_column_letter(i)
-        for cell in col:
-            try:
-                if cell.value:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    wb.save(output_path)
+    with profiling.stage("relatorio.larguras"):
+        for i, col in enumerate(ws.columns, 1):
+            max_length = 0
+            column_letter = get_column_letter(i)
+            for cell in col:
+                try:
+                    if cell.value:
+                        if len(str(cell.value)) > max_length:
+                            max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = (max_length + 2)
+            ws.column_dimensions[column_letter].width = adjusted_width
+
+    with profiling.stage("relatorio.salvar"):
+        wb.save(output_path)
     return True
\ No newline at end of file
@@ -1,9 +1,12 @@
 import os
+import time
 import requests
 import base64
 import json
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from src.utils import profiling
+from src.utils.metrics import record_sieg_request
 from src.config import SIEG_API_KEY, SIEG_EMAIL, DOWNLOAD_TIMEOUT, MAX_RETRIES
 
 class SiegManager:
@@ -55,13 +58,20 @@ class SiegManager:
         }
 
         try:
-            response = self.session.post(
-                self.url_xml, 
-                params=params, 
-                data=payload, 
-                headers=headers, 
-                timeout=DOWNLOAD_TIMEOUT
-            )
+            t0 = time.perf_counter()
+            try:
+                with profiling.stage("sieg.requisicao_xml"):
+                    response = self.session.post(
+                        self.url_xml, 
+                        params=params, 
+                        data=payload, 
+                        headers=headers, 
+                        timeout=DOWNLOAD_TIMEOUT
+                    )
+            except requests.RequestException:
+                record_sieg_request('xml', time.perf_counter() - t0, 'erro_conexao')
+                raise
+            elapsed = time.perf_counter() - t0
 
             if response.status_code == 200:
                 xml_content = response.text.strip()
@@ -69,13 +79,15 @@ class SiegManager:
                 # Se o retorno não começar com <, pode ser uma mensagem de erro em texto
                 if not xml_content.startswith("<"):
                     if "Erro" in xml_content or "não" in xml_content.lower():
+                        record_sieg_request('xml', elapsed, 'recusada')
                         return False, f"Sieg: {xml_content}"
                     # Limpa aspas extras se vier "<?xml...?>"
                     xml_content = xml_content.strip('"')
+                record_sieg_request('xml', elapsed, 'ok')
 
                 # Salva o XML
                 caminho_xml = os.path.join(output_dir, f"{chave_acesso}.xml")
-                with open(caminho_xml, "w", encoding="utf-8") as f:
+                with profiling.stage("sieg.gravacao"), open(caminho_xml, "w", encoding="utf-8") as f:
                     f.write(xml_content)
                 
                 # Tenta gerar o PDF automaticamente após baixar o XML
@@ -83,7 +95,8 @@ class SiegManager:
                 
                 return True, f"XML Baixado. {msg_pdf}"
 
-            elif response.status_code == 401:
+            record_sieg_request('xml', elapsed, f"http_{response.status_code}")
+            if response.status_code == 401:
                 # Agora o log vai mostrar a mensagem real da Sieg
                 return False, f"Erro 401 (Não Autorizado): {response.text}"
             
@@ -96,6 +109,7 @@ class SiegManager:
         except Exception as e:
             return False, f"Erro: {str(e)}"
 
+    @profiling.timed("sieg.pdf")
     def _gerar_pdf_via_xml(self, xml_string, chave, output_dir):
         try:
             # Converte para base64 conforme documentação
@@ -103,12 +117,19 @@ class SiegManager:
             url_pdf_auth = f"{self.url_pdf}?api_key={SIEG_API_KEY}"
             payload = {"ArquivoXml": xml_b64}
 
-            response = self.session.post(
-                url_pdf_auth,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=DOWNLOAD_TIMEOUT
-            )
+            t0 = time.perf_counter()
+            try:
+                response = self.session.post(
+                    url_pdf_auth,
+                    json=payload,
+                    headers={'Content-Type': 'application/json'},
+                    timeout=DOWNLOAD_TIMEOUT
+                )
+            except requests.RequestException:
+                record_sieg_request('pdf', time.perf_counter() - t0, 'erro_conexao')
+                raise
+            record_sieg_request('pdf', time.perf_counter() - t0,
+                                'ok' if response.status_code == 200 else f"http_{response.status_code}")
 
             if response.status_code == 200:
                 pdf_b64 = response.text.strip().strip('"')
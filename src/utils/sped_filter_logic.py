@@ -4,6 +4,9 @@ from typing import Callable, Optional, Tuple, Dict
 from datetime import date
 from collections import Counter
 
+from src.utils import profiling
+from src.utils.cancellation import CancelToken, OperationCancelled, CANCELLED_MSG
+
 logger = logging.getLogger(__name__)
 
 class SpedFilterLogic:
@@ -30,7 +33,7 @@ class SpedFilterLogic:
     def _format_date_sped(self, dt: date) -> str:
         return dt.strftime('%d%m%Y')
 
-    def filter_sped_by_date(self, input_path: str, output_path: str, start_date: date, end_date: date, encoding: str = 'latin-1', progress_callback: Optional[Callable[[int], None]] = None) -> Tuple[bool, str]:
+    def filter_sped_by_date(self, input_path: str, output_path: str, start_date: date, end_date: date, encoding: str = 'latin-1', progress_callback: Optional[Callable[[int], None]] = None, cancel_token: Optional[CancelToken] = None) -> Tuple[bool, str]:
         lines_read = 0
         lines_written = 0
         record_counts = Counter()
@@ -41,11 +44,12 @@ class SpedFilterLogic:
             
             if progress_callback:
                 try:
-                    with open(input_p, 'r', encoding=encoding, errors='ignore') as f:
+                    with profiling.stage("filtro.contagem"), open(input_p, 'r', encoding=encoding, errors='ignore') as f:
                         total_lines = sum(1 for _ in f)
                 except: pass
 
-            with open(input_p, 'r', encoding=encoding, errors='ignore') as infile, \
+            with profiling.stage("filtro.recorte"), \
+                 open(input_p, 'r', encoding=encoding, errors='ignore') as infile, \
                  open(output_path, 'w', encoding=encoding) as outfile:
 
                 current_block = None
@@ -54,8 +58,10 @@ class SpedFilterLogic:
 
                 for line in infile:
                     lines_read += 1
-                    if progress_callback and total_lines > 0 and lines_read % 5000 == 0:
-                        progress_callback(min(int((lines_read / total_lines) * 100), 99))
+                    if lines_read % 5000 == 0:
+                        if cancel_token: cancel_token.check()
+                        if progress_callback and total_lines > 0:
+                            progress_callback(min(int((lines_read / total_lines) * 100), 99))
 
                     line_stripped = line.strip()
                     if not line_stripped.startswith('|') or len(line_stripped) < 7: continue
@@ -131,5 +137,9 @@ class SpedFilterLogic:
             if progress_callback: progress_callback(100)
             return True, f"Sucesso! {lines_written} linhas geradas."
 
+        except OperationCancelled:
+            # Não deixa um arquivo filtrado pela metade
+            Path(output_path).unlink(missing_ok=True)
+            return False, CANCELLED_MSG
         except Exception as e:
             return False, str(e)
\ No newline at end of file
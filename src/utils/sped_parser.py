@@ -1,11 +1,13 @@
-import pandas as pd
 import os
+from src.utils import profiling
+from src.utils.cancellation import OperationCancelled
 
-def process_sped_file(filepath):
+def process_sped_file(filepath, cancel_token=None):
     """
     Lê um arquivo SPED (TXT) e agrega dados por Bloco, CFOP e CST.
     Suporta Blocos C, D e A.
     Retorna um DataFrame pronto para o relatório.
+    cancel_token: CancelToken opcional; se acionado, levanta OperationCancelled.
     """
     
     # Estrutura do mapa de dados:
@@ -14,8 +16,10 @@ def process_sped_file(filepath):
     data_map = {}
 
     try:
-        with open(filepath, 'r', encoding='latin-1') as f:
-            for line in f:
+        with profiling.stage("sped.leitura"), open(filepath, 'r', encoding='latin-1') as f:
+            for line_no, line in enumerate(f):
+                if cancel_token and line_no % 10000 == 0:
+                    cancel_token.check()
                 if not line.startswith('|'):
                     continue
 
@@ -129,6 +133,8 @@ def process_sped_file(filepath):
                                 vl_item, 0.0, 0.0, 0.0,
                                 0.0, 0.0, vl_bc_cofins, vl_cofins)
 
+    except OperationCancelled:
+        raise
     except Exception as e:
         print(f"Error processing file: {e}")
         return None
@@ -155,7 +161,10 @@ def process_sped_file(filepath):
         }
         rows.append(row)
 
-    df = pd.DataFrame(rows)
+    with profiling.stage("sped.dataframe"):
+        # Importado sob demanda: o pandas deixa a abertura do programa lenta
+        import pandas as pd
+        df = pd.DataFrame(rows)
     return df
 
 def _add_to_map(data_map, bloco, cfop, cst_pis, aliq_pis, cst_cofins, aliq_cofins,
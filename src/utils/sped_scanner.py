@@ -0,0 +1,204 @@
+import os
+import mmap
+import time
+from collections import Counter
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+# Janela de leitura do mmap (os arquivos podem ter vários GB)
+DEFAULT_WINDOW_SIZE = 16 * 1024 * 1024
+
+PIPE = ord('|')
+NEWLINE = ord('\n')
+
+
+def pack_code(code: str) -> int:
+    """Converte um código de registro ('C100') no inteiro usado pelo scanner."""
+    return int.from_bytes(code.encode('latin-1'), 'little')
+
+
+def unpack_code(value: int) -> str:
+    """Operação inversa de pack_code."""
+    return int(value).to_bytes(4, 'little').decode('latin-1')
+
+
+CODE_9999 = pack_code('9999')
+
+
+def iter_line_windows(filepath: str, window_size: int = DEFAULT_WINDOW_SIZE) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, int]]:
+    """
+    Percorre o arquivo via mmap em janelas que terminam sempre em fim de linha.
+
+    Para cada janela retorna (buffer, inícios, fins, número da primeira linha):
+    - buffer: np.uint8 com os bytes da janela
+    - inícios/fins: posição de cada linha dentro do buffer (fim exclusivo, sem o '\\n')
+    - número da primeira linha: índice (base 0) da primeira linha da janela no arquivo
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            line_no = 0
+            while pos < size:
+                end = min(pos + window_size, size)
+                if end < size:
+                    last_nl = mm.rfind(b'\n', pos, end)
+                    if last_nl == -1:
+                        # Linha maior que a janela: estende até o próximo '\n'
+                        next_nl = mm.find(b'\n', end)
+                        end = size if next_nl == -1 else next_nl + 1
+                    else:
+                        end = last_nl + 1
+
+                # O slice do mmap gera uma cópia da janela, evitando manter
+                # ponteiros exportados quando o mmap for fechado.
+                buf = np.frombuffer(mm[pos:end], dtype=np.uint8)
+                starts, ends = line_bounds(buf)
+
+                yield buf, starts, ends, line_no
+
+                line_no += len(starts)
+                pos = end
+
+
+def line_bounds(buf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Localiza o início e o fim (exclusivo) de cada linha do buffer."""
+    length = len(buf)
+    newlines = np.flatnonzero(buf == NEWLINE)
+
+    starts = np.empty(len(newlines) + 1, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = newlines + 1
+    ends = np.append(newlines, length).astype(np.int64)
+
+    # Se o buffer termina em '\n' não existe uma linha após ele
+    if starts[-1] == length:
+        starts = starts[:-1]
+        ends = ends[:-1]
+    return starts, ends
+
+
+def register_codes(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Extrai, de forma vetorizada, o código de 4 caracteres de cada linha ('|C100|...').
+    Linhas que não seguem o formato recebem o código 0.
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.uint32)
+
+    last = len(buf) - 1
+    valid = (ends - starts) >= 6
+    idx = [np.minimum(starts + k, last) for k in range(6)]
+    valid &= (buf[idx[0]] == PIPE) & (buf[idx[5]] == PIPE)
+
+    codes = (buf[idx[1]].astype(np.uint32)
+             | (buf[idx[2]].astype(np.uint32) << 8)
+             | (buf[idx[3]].astype(np.uint32) << 16)
+             | (buf[idx[4]].astype(np.uint32) << 24))
+    codes[~valid] = 0
+    return codes
+
+
+def read_header(filepath: str, encoding: str = 'latin-1') -> Dict[str, str]:
+    """
+    Lê o registro 0000 e identifica o tipo de escrituração.
+
+    EFD ICMS/IPI:       |0000|COD_VER|COD_FIN|DT_INI|DT_FIN|NOME|CNPJ|...
+    EFD Contribuições:  |0000|COD_VER|TIPO_ESCRIT|IND_SIT_ESP|NUM_REC_ANTERIOR|DT_INI|DT_FIN|NOME|CNPJ|...
+    """
+    header = {'tipo': 'Desconhecido', 'dt_ini': '', 'dt_fin': '', 'nome': '', 'cnpj': ''}
+    try:
+        with open(filepath, 'r', encoding=encoding, errors='ignore') as f:
+            line = f.readline().strip()
+    except OSError:
+        return header
+
+    parts = line.split('|')
+    if len(parts) < 8 or parts[1] != '0000':
+        return header
+
+    if _is_sped_date(parts[4]) and _is_sped_date(parts[5]):
+        header.update(tipo='EFD ICMS/IPI', dt_ini=parts[4], dt_fin=parts[5],
+                      nome=parts[6], cnpj=parts[7])
+    elif len(parts) > 9 and _is_sped_date(parts[6]) and _is_sped_date(parts[7]):
+        header.update(tipo='EFD Contribuições', dt_ini=parts[6], dt_fin=parts[7],
+                      nome=parts[8], cnpj=parts[9])
+    return header
+
+
+def _is_sped_date(value: str) -> bool:
+    return len(value) == 8 and value.isdigit()
+
+
+def format_sped_date(value: str) -> str:
+    """'31012025' -> '31/01/2025'"""
+    if not _is_sped_date(value):
+        return value or "-"
+    return f"{value[0:2]}/{value[2:4]}/{value[4:8]}"
+
+
+def get_sped_overview(filepath: str, window_size: int = DEFAULT_WINDOW_SIZE) -> Optional[Dict]:
+    """
+    Visão geral rápida de um arquivo SPED, sem fazer o parse completo.
+
+    O histograma de registros é calculado de forma vetorizada (NumPy) sobre o
+    buffer mapeado em memória: localiza o início de cada linha, lê o código de
+    4 caracteres e conta com np.unique. A leitura para no registro 9999, de modo
+    que a assinatura digital anexada ao final do arquivo é ignorada.
+    """
+    if not filepath or not os.path.exists(filepath):
+        return None
+
+    t0 = time.perf_counter()
+    histogram = Counter()
+    total_lines = 0
+    malformed = 0
+
+    for buf, starts, ends, _ in iter_line_windows(filepath, window_size):
+        codes = register_codes(buf, starts, ends)
+
+        stop = np.flatnonzero(codes == CODE_9999)
+        if len(stop):
+            codes = codes[:stop[0] + 1]
+            starts = starts[:stop[0] + 1]
+            ends = ends[:stop[0] + 1]
+
+        total_lines += len(codes)
+        invalid = codes == 0
+        if invalid.any():
+            # Linhas em branco (ex: '\r\n' final) não contam como malformadas
+            blank = (ends - starts) <= 1
+            malformed += int(np.count_nonzero(invalid & ~blank))
+
+        unique, counts = np.unique(codes[~invalid], return_counts=True)
+        for code, count in zip(unique.tolist(), counts.tolist()):
+            histogram[unpack_code(code)] += count
+
+        if len(stop):
+            break
+
+    header = read_header(filepath)
+    is_contrib = header['tipo'] == 'EFD Contribuições'
+
+    return {
+        'arquivo': os.path.basename(filepath),
+        'tamanho_bytes': os.path.getsize(filepath),
+        'tipo': header['tipo'],
+        'empresa': header['nome'],
+        'cnpj': header['cnpj'],
+        'dt_ini': header['dt_ini'],
+        'dt_fin': header['dt_fin'],
+        'total_linhas': total_lines,
+        'linhas_malformadas': malformed,
+        'documentos_c100': histogram.get('C100', 0),
+        'documentos_d100': histogram.get('D100', 0),
+        # Na EFD Contribuições os estabelecimentos constam no 0140;
+        # a EFD ICMS/IPI é sempre de um único estabelecimento.
+        'estabelecimentos': histogram.get('0140', 0) if is_contrib else (1 if histogram else 0),
+        'registros': dict(sorted(histogram.items())),
+        'tempo_s': time.perf_counter() - t0,
+    }
@@ -0,0 +1,228 @@
+import os
+import logging
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.cancellation import CancelToken, OperationCancelled, CANCELLED_MSG
+from src.utils.sped_scanner import (
+    DEFAULT_WINDOW_SIZE, CODE_9999, PIPE, iter_line_windows, pack_code, register_codes,
+    read_header, unpack_code
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SpedValidatorLogic:
+    """
+    Validação de integridade do SPED (Bloco 9) em uma única passada.
+
+    Reconta todos os registros e confere:
+    - 9900: quantidade declarada de cada registro
+    - 9999: total de linhas do arquivo
+    - X990: total de linhas de cada bloco
+    - quantidade de campos de cada linha conforme o leiaute do registro
+    """
+
+    def __init__(self):
+        # Quantidade de campos (REG incluso) dos registros com leiaute fixo.
+        # Registros fora da tabela são comparados com a quantidade mais
+        # frequente no próprio arquivo.
+        self.FIELD_COUNTS: Dict[str, int] = {
+            '9900': 3, '9990': 2, '9999': 2,
+            'C100': 29,
+        }
+        for bloco in '0ACDEFGHIKMP19':
+            self.FIELD_COUNTS[f'{bloco}001'] = 2
+            self.FIELD_COUNTS[f'{bloco}990'] = 2
+        # Registros cujo leiaute muda conforme o tipo de SPED (read_header()['tipo']).
+        # C170: o ICMS/IPI ganhou VL_ABAT_NT no leiaute de 2020.
+        self.LAYOUT_FIELD_COUNTS: Dict[str, Dict[str, int]] = {
+            'EFD ICMS/IPI': {'0000': 15, 'C170': 38},
+            'EFD Contribuições': {'0000': 14, 'C170': 37},
+        }
+        self.MAX_DETAILS = 200
+
+    def validate_sped(self, input_path: str, progress_callback: Optional[Callable[[int], None]] = None,
+                      window_size: int = DEFAULT_WINDOW_SIZE,
+                      cancel_token: Optional[CancelToken] = None) -> Tuple[bool, str, List[str]]:
+        """
+        Retorna (arquivo íntegro, mensagem resumo, lista de problemas encontrados).
+        """
+        try:
+            total_size = os.path.getsize(input_path)
+            histogram = Counter()
+            field_groups = Counter()
+            field_first_line: Dict[Tuple[int, int], int] = {}
+            declared_9900: Dict[str, int] = {}
+            declared_blocks: Dict[str, int] = {}
+            declared_total = None
+            malformed_count = 0
+            malformed_lines: List[int] = []
+            problems: List[str] = []
+            total_lines = 0
+            bytes_read = 0
+            found_9999 = False
+
+            for buf, starts, ends, line_no in iter_line_windows(input_path, window_size):
+                if cancel_token: cancel_token.check()
+                bytes_read += len(buf)
+                if len(starts) == 0:
+                    continue
+
+                codes = register_codes(buf, starts, ends)
+                # Quantidade de campos = quantidade de '|' da linha - 1
+                fields = np.add.reduceat((buf == PIPE).astype(np.int32), starts) - 1
+
+                stop = np.flatnonzero(codes == CODE_9999)
+                if len(stop):
+                    n = stop[0] + 1
+                    codes, fields, starts, ends = codes[:n], fields[:n], starts[:n], ends[:n]
+                    found_9999 = True
+
+                total_lines += len(codes)
+
+                invalid = codes == 0
+                if invalid.any():
+                    blank = (ends - starts) <= 1
+                    bad_idx = np.flatnonzero(invalid & ~blank)
+                    malformed_count += len(bad_idx)
+                    room = self.MAX_DETAILS - len(malformed_lines)
+                    if room > 0:
+                        malformed_lines.extend((bad_idx[:room] + line_no + 1).tolist())
+
+                valid = ~invalid
+                v_codes = codes[valid]
+                v_fields = fields[valid]
+                v_lines = np.flatnonzero(valid) + line_no + 1
+
+                unique, counts = np.unique(v_codes, return_counts=True)
+                for code, count in zip(unique.tolist(), counts.tolist()):
+                    histogram[unpack_code(code)] += count
+
+                # Histograma (registro, qtd. campos) guardando a primeira ocorrência
+                pairs = (v_codes.astype(np.uint64) << np.uint64(16)) | v_fields.astype(np.uint64)
+                u_pairs, first_idx, p_counts = np.unique(pairs, return_index=True, return_counts=True)
+                for pair, idx, count in zip(u_pairs.tolist(), first_idx.tolist(), p_counts.tolist()):
+                    key = (pair >> 16, pair & 0xFFFF)
+                    field_groups[key] += count
+                    field_first_line.setdefault(key, int(v_lines[idx]))
+
+                # Registros de totalização: poucos, decodificados individualmente
+                for pos in np.flatnonzero(self._is_totalizer(codes)).tolist():
+                    parts = bytes(buf[starts[pos]:ends[pos]]).decode('latin-1').strip().split('|')
+                    self._read_totalizer(parts, line_no + pos + 1, declared_9900, declared_blocks, problems)
+                    if parts[1] == '9999' and len(parts) > 2:
+                        declared_total = _to_int(parts[2])
+
+                if progress_callback and total_size:
+                    progress_callback(min(int(bytes_read / total_size * 100), 99))
+
+                if found_9999:
+                    break
+
+            problems.extend(self._check_structure(
+                input_path, histogram, field_groups, field_first_line, declared_9900,
+                declared_blocks, declared_total, total_lines, found_9999
+            ))
+
+            if malformed_count:
+                amostra = ", ".join(str(n) for n in malformed_lines[:20])
+                problems.append(f"{malformed_count} linhas fora do padrão '|REG|...|' (linhas: {amostra}{'...' if malformed_count > 20 else ''})")
+
+            if progress_callback: progress_callback(100)
+
+            if problems:
+                return False, f"Arquivo com {len(problems)} inconsistências em {total_lines} linhas.", problems
+            return True, f"Arquivo íntegro! {total_lines} linhas conferidas.", []
+
+        except OperationCancelled:
+            return False, CANCELLED_MSG, []
+        except Exception as e:
+            logger.exception("Erro na validação do SPED")
+            return False, f"Erro: {str(e)}", []
+
+    def _is_totalizer(self, codes: np.ndarray) -> np.ndarray:
+        """Linhas 9900, 9999 e X990 (fechamento de bloco)."""
+        # O 3º e 4º caracteres '90' ficam nos bytes 2 e 3 do código
+        closer = ((codes >> 8) & 0xFFFFFF) == (pack_code('x990') >> 8)
+        return closer | (codes == pack_code('9900')) | (codes == CODE_9999)
+
+    def _read_totalizer(self, parts: List[str], line: int, declared_9900: Dict[str, int],
+                        declared_blocks: Dict[str, int], problems: List[str]):
+        reg = parts[1]
+        if reg == '9900':
+            if len(parts) < 4 or _to_int(parts[3]) is None:
+                problems.append(f"Linha {line}: registro 9900 ilegível.")
+                return
+            reg_blc = parts[2]
+            if reg_blc in declared_9900:
+                problems.append(f"Linha {line}: registro {reg_blc} declarado mais de uma vez no 9900.")
+            declared_9900[reg_blc] = declared_9900.get(reg_blc, 0) + _to_int(parts[3])
+        elif reg.endswith('990') and len(parts) > 2:
+            value = _to_int(parts[2])
+            if value is None:
+                problems.append(f"Linha {line}: quantidade de linhas do {reg} ilegível.")
+            else:
+                declared_blocks[reg[0]] = value
+
+    def _check_structure(self, input_path, histogram, field_groups, field_first_line, declared_9900,
+                         declared_blocks, declared_total, total_lines, found_9999) -> List[str]:
+        problems: List[str] = []
+
+        # --- 9999: total de linhas ---
+        if not found_9999:
+            problems.append("Registro 9999 não encontrado: arquivo truncado ou incompleto.")
+        elif declared_total != total_lines:
+            problems.append(f"9999 declara {declared_total} linhas, mas o arquivo possui {total_lines}.")
+
+        # --- 9900: quantidade por registro ---
+        for reg, count in sorted(histogram.items()):
+            declared = declared_9900.get(reg)
+            if declared is None:
+                problems.append(f"Registro {reg} ({count} linhas) sem totalizador 9900.")
+            elif declared != count:
+                problems.append(f"9900 do registro {reg} declara {declared}, encontrado {count}.")
+        for reg in sorted(set(declared_9900) - set(histogram)):
+            problems.append(f"9900 declara {declared_9900[reg]} linhas do registro {reg}, que não existe no arquivo.")
+
+        # --- X990: linhas por bloco ---
+        block_counts = Counter()
+        for reg, count in histogram.items():
+            block_counts[reg[0]] += count
+        for bloco, count in sorted(block_counts.items()):
+            declared = declared_blocks.get(bloco)
+            if declared is None:
+                problems.append(f"Bloco {bloco} sem registro de encerramento {bloco}990.")
+            elif declared != count:
+                problems.append(f"{bloco}990 declara {declared} linhas, o bloco possui {count}.")
+
+        # --- Quantidade de campos por registro ---
+        expected = dict(self.FIELD_COUNTS)
+        expected.update(self.LAYOUT_FIELD_COUNTS.get(read_header(input_path)['tipo'], {}))
+
+        by_register: Dict[int, Counter] = {}
+        for (code, n_fields), count in field_groups.items():
+            by_register.setdefault(code, Counter())[n_fields] = count
+
+        for code, groups in sorted(by_register.items()):
+            reg = unpack_code(code)
+            # Sem leiaute conhecido: a quantidade mais frequente no arquivo é a referência
+            reference = expected.get(reg, groups.most_common(1)[0][0])
+            for n_fields, count in sorted(groups.items()):
+                if n_fields != reference:
+                    first = field_first_line[(code, n_fields)]
+                    problems.append(
+                        f"Registro {reg}: {count} linhas com {n_fields} campos (esperado {reference}), "
+                        f"primeira na linha {first}."
+                    )
+
+        return problems
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
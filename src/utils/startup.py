@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import datetime
+import importlib
+import threading
+
+# Módulos pesados carregados em segundo plano após o login, antes do primeiro uso
+PREWARM_MODULES = (
+    "numpy",
+    "pandas",
+    "openpyxl",
+    "src.views.sped_view",
+)
+
+# Modo de medição: variável de ambiente SIEGAUTO_STARTUP_TIMING=1 ou argumento --startup-timing
+TIMING_ENV = "SIEGAUTO_STARTUP_TIMING"
+TIMING_FLAG = "--startup-timing"
+TIMING_FILE = os.path.join("logs", "startup_times.jsonl")
+
+
+def timing_enabled():
+    return os.environ.get(TIMING_ENV) == "1" or TIMING_FLAG in sys.argv
+
+
+class StartupTimer:
+    """
+    Marcos da abertura do programa (segundos desde o início do processo de
+    importação do main.py). Só registra algo quando o modo de medição está ativo.
+    """
+
+    def __init__(self, t0=None):
+        self.enabled = timing_enabled()
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        if self.enabled:
+            with self._lock:
+                self.marks.setdefault(name, round(time.perf_counter() - self.t0, 4))
+
+    def report(self, stage):
+        """Imprime os marcos e acrescenta uma linha em logs/startup_times.jsonl."""
+        if not self.enabled:
+            return
+        with self._lock:
+            marks = dict(self.marks)
+        print(f"Tempos de abertura ({stage}, s): " + ", ".join(f"{k}={v:.3f}" for k, v in marks.items()))
+        record = {"ts": datetime.datetime.now().isoformat(timespec="seconds"), "stage": stage, **marks}
+        try:
+            os.makedirs(os.path.dirname(TIMING_FILE), exist_ok=True)
+            with open(TIMING_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Aviso: não foi possível salvar os tempos de abertura: {e}")
+
+
+def prewarm(modules=PREWARM_MODULES, timer=None):
+    """Importa os módulos pesados em uma thread de fundo (não bloqueia a interface)."""
+
+    def run():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"Aviso: pré-carregamento de {name} falhou: {e}")
+        if timer:
+            timer.mark("prewarm_done")
+            timer.report("prewarm")
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
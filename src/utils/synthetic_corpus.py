@@ -0,0 +1,301 @@
+"""
+Arquivos sintéticos para testes de desempenho (python -m src.benchmark).
+
+Tudo é determinístico: a mesma semente e os mesmos parâmetros geram
+exatamente os mesmos bytes, de modo que os checksums das saídas das
+ferramentas podem ser comparados entre execuções.
+"""
+import os
+import random
+import calendar
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+# Proporção de documentos por registro no SPED Contribuições gerado
+DEFAULT_REGISTER_MIX = {'C100': 0.75, 'A100': 0.15, 'D100': 0.10}
+
+# Peso de cada UF de destino nas NF-e geradas (o emitente é sempre SP)
+DEFAULT_UF_WEIGHTS = {
+    'SP': 30, 'MG': 12, 'RJ': 10, 'PR': 8, 'RS': 7, 'SC': 6, 'BA': 5, 'GO': 4,
+    'PE': 4, 'CE': 3, 'DF': 3, 'ES': 2, 'MT': 2, 'MS': 2, 'PA': 2,
+}
+
+UF_CODES = {
+    'RO': 11, 'AC': 12, 'AM': 13, 'RR': 14, 'PA': 15, 'AP': 16, 'TO': 17, 'MA': 21, 'PI': 22,
+    'CE': 23, 'RN': 24, 'PB': 25, 'PE': 26, 'AL': 27, 'SE': 28, 'BA': 29, 'MG': 31, 'ES': 32,
+    'RJ': 33, 'SP': 35, 'PR': 41, 'SC': 42, 'RS': 43, 'MS': 50, 'MT': 51, 'GO': 52, 'DF': 53,
+}
+# Alíquota interna aproximada e FCP de cada UF (o suficiente para valores plausíveis)
+UF_INTERNAL_RATE = {uf: 18.0 for uf in UF_CODES}
+UF_INTERNAL_RATE.update({'RJ': 20.0, 'MG': 18.0, 'PR': 19.5, 'BA': 20.5, 'PE': 20.5, 'CE': 20.0,
+                         'GO': 19.0, 'DF': 20.0, 'MS': 17.0, 'MT': 17.0, 'PA': 19.0, 'SC': 17.0, 'RS': 17.0})
+UF_FCP_RATE = {uf: 0.0 for uf in UF_CODES}
+UF_FCP_RATE.update({'RJ': 2.0, 'MG': 2.0, 'BA': 2.0, 'PE': 2.0, 'CE': 2.0, 'GO': 2.0, 'MS': 2.0, 'MT': 2.0})
+
+ORIGIN_UF = 'SP'
+NFE_NS = "http://www.portalfiscal.inf.br/nfe"
+CTE_NS = "http://www.portalfiscal.inf.br/cte"
+
+
+def access_key(uf: str, year: int, month: int, cnpj: str, model: int, serie: int, number: int, code: int) -> str:
+    """Chave de acesso de 44 dígitos com dígito verificador (módulo 11)."""
+    base = f"{UF_CODES[uf]:02d}{year % 100:02d}{month:02d}{cnpj}{model:02d}{serie:03d}{number:09d}1{code:08d}"
+    total = sum(int(d) * (2 + i % 8) for i, d in enumerate(reversed(base)))
+    remainder = total % 11
+    return base + str(0 if remainder < 2 else 11 - remainder)
+
+
+def _cnpj(rng: random.Random) -> str:
+    return f"{rng.randrange(10**7, 10**8)}0001{rng.randrange(10, 100)}"
+
+
+def _money(value: float) -> str:
+    return f"{value:.2f}".replace('.', ',')
+
+
+def _sped_date(d: date) -> str:
+    return d.strftime('%d%m%Y')
+
+
+class _SpedWriter:
+    """Escreve as linhas e conta os registros para o Bloco 9."""
+
+    def __init__(self, f):
+        self.f = f
+        self.counts = Counter()
+        self.lines = 0
+        self.block_lines = 0
+
+    def write(self, *fields):
+        self.f.write('|' + '|'.join(fields) + '|\n')
+        self.counts[fields[0]] += 1
+        self.lines += 1
+        self.block_lines += 1
+
+    def open_block(self, reg: str, has_data: bool):
+        self.block_lines = 0
+        self.write(reg, '0' if has_data else '1')
+
+    def close_block(self, reg: str):
+        self.write(reg, str(self.block_lines + 1))
+
+
+def generate_sped_contrib(path: str, seed: int = 0, period: date = date(2025, 1, 1), documents: int = 1000,
+                          establishments: int = 1, items_per_document: Tuple[int, int] = (1, 5),
+                          register_mix: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    SPED EFD Contribuições de um mês (period) com Bloco 9 consistente.
+
+    register_mix: proporção de documentos C100 (NF-e + C170), A100 (serviços + A170)
+    e D100 (CT-e + D101/D105). Retorna {'linhas', 'bytes', 'documentos', 'registros'}.
+    """
+    rng = random.Random(seed)
+    mix = register_mix or DEFAULT_REGISTER_MIX
+    kinds, weights = zip(*mix.items())
+    year, month = period.year, period.month
+    last_day = calendar.monthrange(year, month)[1]
+    cnpj = _cnpj(rng)
+    estabs = [cnpj[:8] + f"{i + 1:04d}" + cnpj[12:] for i in range(establishments)]
+    per_estab = [documents // establishments + (1 if i < documents % establishments else 0)
+                 for i in range(establishments)]
+    docs = [(estab, [rng.choices(kinds, weights)[0] for _ in range(n)]) for estab, n in zip(estabs, per_estab)]
+
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        w = _SpedWriter(f)
+        w.write('0000', '006', '0', '', '', _sped_date(period), _sped_date(date(year, month, last_day)),
+                f'EMPRESA SINTETICA {seed}', cnpj, ORIGIN_UF, '3550308', '', '00', '0')
+        w.block_lines = 1
+        w.write('0001', '0')
+        w.write('0110', '1', '1', '1', '')
+        for i, estab in enumerate(estabs):
+            w.write('0140', f'{i + 1:03d}', f'ESTABELECIMENTO {i + 1}', estab, ORIGIN_UF, '', '3550308', '', '')
+        w.close_block('0990')
+
+        w.open_block('A001', any('A100' in kinds_ for _, kinds_ in docs))
+        for estab, kinds_ in docs:
+            if 'A100' not in kinds_:
+                continue
+            w.write('A010', estab)
+            for n, kind in enumerate(kinds_):
+                if kind == 'A100':
+                    _write_a100(w, rng, n, year, month, last_day, items_per_document)
+        w.close_block('A990')
+
+        w.open_block('C001', any('C100' in kinds_ for _, kinds_ in docs))
+        for estab, kinds_ in docs:
+            if 'C100' not in kinds_:
+                continue
+            w.write('C010', estab, '2')
+            for n, kind in enumerate(kinds_):
+                if kind == 'C100':
+                    _write_c100(w, rng, n, year, month, last_day, items_per_document)
+        w.close_block('C990')
+
+        w.open_block('D001', any('D100' in kinds_ for _, kinds_ in docs))
+        for estab, kinds_ in docs:
+            if 'D100' not in kinds_:
+                continue
+            w.write('D010', estab)
+            for n, kind in enumerate(kinds_):
+                if kind == 'D100':
+                    _write_d100(w, rng, n, year, month, last_day)
+        w.close_block('D990')
+
+        for opener, closer in (('M001', 'M990'), ('1001', '1990')):
+            w.open_block(opener, False)
+            w.close_block(closer)
+
+        w.open_block('9001', True)
+        registers = sorted(set(w.counts) | {'9900', '9990', '9999'})
+        for reg in registers:
+            count = len(registers) if reg == '9900' else (1 if reg in ('9990', '9999') else w.counts[reg])
+            w.write('9900', reg, str(count))
+        w.write('9990', str(w.block_lines + 2))  # inclui o próprio 9990 e o 9999
+        w.write('9999', str(w.lines + 1))
+
+    return {'linhas': w.lines, 'bytes': os.path.getsize(path), 'documentos': documents,
+            'registros': dict(sorted(w.counts.items()))}
+
+
+def _write_c100(w: _SpedWriter, rng: random.Random, n: int, year: int, month: int, last_day: int,
+                items_per_document: Tuple[int, int]):
+    day = rng.randint(1, last_day)
+    entrada = rng.random() < 0.6
+    key = access_key(rng.choice(list(UF_CODES)), year, month, _cnpj(rng), 55, 1, n + 1, rng.randrange(10**8))
+    items = []
+    for i in range(rng.randint(*items_per_document)):
+        vl_item = round(rng.uniform(10, 5000), 2)
+        cfop = rng.choice(('1102', '2102', '1556')) if entrada else rng.choice(('5102', '6102', '6108', '5405'))
+        cst = rng.choice(('01', '50', '70', '73')) if entrada else rng.choice(('01', '04', '06'))
+        aliq_pis, aliq_cofins = (1.65, 7.6) if cst in ('01', '50') else (0.0, 0.0)
+        vl_icms = round(vl_item * 0.18, 2)
+        vl_ipi = round(vl_item * 0.05, 2) if rng.random() < 0.2 else 0.0
+        vl_st = round(vl_item * 0.1, 2) if cfop == '5405' else 0.0
+        items.append((i + 1, vl_item, cfop, cst, aliq_pis, aliq_cofins, vl_icms, vl_st, vl_ipi))
+    vl_doc = sum(it[1] for it in items)
+    d = _sped_date(date(year, month, day))
+    w.write('C100', '0' if entrada else '1', '1' if entrada else '0', f'P{n % 500:04d}', '55', '00', '1',
+            str(n + 1), key, d, d, _money(vl_doc), '1', '0,00', '0,00', _money(vl_doc), '9', '0,00', '0,00',
+            '0,00', _money(vl_doc), _money(sum(it[6] for it in items)), '0,00', '0,00',
+            _money(sum(it[8] for it in items)), '0,00', '0,00', '0,00', '0,00')
+    for num, vl_item, cfop, cst, aliq_pis, aliq_cofins, vl_icms, vl_st, vl_ipi in items:
+        vl_pis = round(vl_item * aliq_pis / 100, 2)
+        vl_cofins = round(vl_item * aliq_cofins / 100, 2)
+        w.write('C170', str(num), f'ITEM{num:05d}', '', '1', 'UN', _money(vl_item), '0,00', '0', '000', cfop, '',
+                _money(vl_item), '18,00', _money(vl_icms), '0,00', '0,00', _money(vl_st), '0', '', '', '0,00',
+                '0,00', _money(vl_ipi), cst, _money(vl_item), _money(aliq_pis), '', '', _money(vl_pis), cst,
+                _money(vl_item), _money(aliq_cofins), '', '', _money(vl_cofins), '')
+
+
+def _write_a100(w: _SpedWriter, rng: random.Random, n: int, year: int, month: int, last_day: int,
+                items_per_document: Tuple[int, int]):
+    d = _sped_date(date(year, month, rng.randint(1, last_day)))
+    items = [round(rng.uniform(100, 20000), 2) for _ in range(rng.randint(*items_per_document))]
+    total = sum(items)
+    w.write('A100', '1', '0', f'P{n % 500:04d}', '00', '1', '', str(n + 1), '', d, d, _money(total), '1',
+            '0,00', _money(total), _money(total * 0.0165), _money(total), _money(total * 0.076), '0,00', '0,00', '0,00')
+    for i, vl_item in enumerate(items):
+        # Posições lidas pelo sped_parser: 5 VL_ITEM, 7-10 PIS, 11-14 COFINS
+        w.write('A170', str(i + 1), f'SERV{i + 1:04d}', '', _money(vl_item), '0,00', '01', _money(vl_item), '1,65',
+                _money(vl_item * 0.0165), '01', _money(vl_item), '7,60', _money(vl_item * 0.076), '')
+
+
+def _write_d100(w: _SpedWriter, rng: random.Random, n: int, year: int, month: int, last_day: int):
+    d = _sped_date(date(year, month, rng.randint(1, last_day)))
+    key = access_key(rng.choice(list(UF_CODES)), year, month, _cnpj(rng), 57, 1, n + 1, rng.randrange(10**8))
+    valor = round(rng.uniform(50, 3000), 2)
+    w.write('D100', '0', '1', f'T{n % 100:04d}', '57', '00', '1', '', str(n + 1), key, d, d, '0', '',
+            _money(valor), '0,00', '1', _money(valor), _money(valor), _money(valor * 0.12), '0,00', '', '')
+    # Posições lidas pelo sped_parser: 3 VL_ITEM, 4 CST, 5 BC, 6 ALIQ, 7 VALOR
+    w.write('D101', '0', _money(valor), '50', _money(valor), '1,65', _money(valor * 0.0165), '')
+    w.write('D105', '0', _money(valor), '50', _money(valor), '7,60', _money(valor * 0.076), '')
+
+
+def generate_xml_folder(folder: str, seed: int = 0, files: int = 100, period: date = date(2025, 1, 1),
+                        items_per_note: Tuple[int, int] = (1, 5), uf_weights: Optional[Dict[str, int]] = None,
+                        cte_ratio: float = 0.05) -> Dict:
+    """
+    Pasta de XMLs de NF-e (nfeProc, emitente em SP) e CT-e, nomeados '{chave}.xml'.
+    Notas para outras UFs levam o grupo ICMSUFDest (DIFAL/FCP) em cada item.
+    Retorna {'arquivos', 'bytes', 'nfe', 'cte', 'itens'}.
+    """
+    rng = random.Random(seed)
+    weights = uf_weights or DEFAULT_UF_WEIGHTS
+    ufs, uf_w = zip(*weights.items())
+    os.makedirs(folder, exist_ok=True)
+    emit_cnpj = _cnpj(rng)
+    stats = {'arquivos': files, 'bytes': 0, 'nfe': 0, 'cte': 0, 'itens': 0}
+
+    for n in range(files):
+        if rng.random() < cte_ratio:
+            key = access_key(ORIGIN_UF, period.year, period.month, emit_cnpj, 57, 1, n + 1, rng.randrange(10**8))
+            content = _cte_xml(key, n, rng)
+            stats['cte'] += 1
+        else:
+            key = access_key(ORIGIN_UF, period.year, period.month, emit_cnpj, 55, 1, n + 1, rng.randrange(10**8))
+            uf_dest = rng.choices(ufs, uf_w)[0]
+            n_items = rng.randint(*items_per_note)
+            content = _nfe_xml(key, n, period, emit_cnpj, uf_dest, n_items, rng)
+            stats['nfe'] += 1
+            stats['itens'] += n_items
+        data = content.encode('utf-8')
+        with open(os.path.join(folder, f"{key}.xml"), 'wb') as f:
+            f.write(data)
+        stats['bytes'] += len(data)
+    return stats
+
+
+def _nfe_xml(key: str, n: int, period: date, emit_cnpj: str, uf_dest: str, n_items: int, rng: random.Random) -> str:
+    interstate = uf_dest != ORIGIN_UF
+    dets: List[str] = []
+    total = 0.0
+    for i in range(n_items):
+        v_prod = round(rng.uniform(10, 3000), 2)
+        total += v_prod
+        icms = f"<ICMS><ICMS00><orig>0</orig><CST>00</CST><modBC>3</modBC><vBC>{v_prod:.2f}</vBC>" \
+               f"<pICMS>{12 if interstate else 18:.2f}</pICMS><vICMS>{v_prod * (0.12 if interstate else 0.18):.2f}</vICMS>" \
+               f"</ICMS00></ICMS>"
+        uf_dest_group = ""
+        if interstate:
+            p_dest, p_fcp = UF_INTERNAL_RATE[uf_dest], UF_FCP_RATE[uf_dest]
+            uf_dest_group = (
+                f"<ICMSUFDest><vBCUFDest>{v_prod:.2f}</vBCUFDest><vBCFCPUFDest>{v_prod:.2f}</vBCFCPUFDest>"
+                f"<pFCPUFDest>{p_fcp:.2f}</pFCPUFDest><pICMSUFDest>{p_dest:.2f}</pICMSUFDest>"
+                f"<pICMSInter>12.00</pICMSInter><pICMSInterPart>100.00</pICMSInterPart>"
+                f"<vFCPUFDest>{v_prod * p_fcp / 100:.2f}</vFCPUFDest>"
+                f"<vICMSUFDest>{v_prod * (p_dest - 12) / 100:.2f}</vICMSUFDest>"
+                f"<vICMSUFRemet>0.00</vICMSUFRemet></ICMSUFDest>"
+            )
+        dets.append(
+            f'<det nItem="{i + 1}"><prod><cProd>{rng.randrange(1, 99999):05d}</cProd><xProd>PRODUTO {i + 1}</xProd>'
+            f'<NCM>84713012</NCM><CFOP>{"6108" if interstate else "5102"}</CFOP><uCom>UN</uCom><qCom>1.0000</qCom>'
+            f'<vUnCom>{v_prod:.2f}</vUnCom><vProd>{v_prod:.2f}</vProd></prod>'
+            f'<imposto>{icms}{uf_dest_group}</imposto></det>'
+        )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<nfeProc xmlns="{NFE_NS}" versao="4.00"><NFe xmlns="{NFE_NS}">'
+        f'<infNFe Id="NFe{key}" versao="4.00"><ide><cUF>{UF_CODES[ORIGIN_UF]}</cUF><natOp>VENDA</natOp>'
+        f'<mod>55</mod><serie>1</serie><nNF>{n + 1}</nNF>'
+        f'<dhEmi>{period.isoformat()}T10:00:00-03:00</dhEmi><tpNF>1</tpNF>'
+        f'<idDest>{2 if interstate else 1}</idDest></ide>'
+        f'<emit><CNPJ>{emit_cnpj}</CNPJ><xNome>EMITENTE SINTETICO</xNome>'
+        f'<enderEmit><UF>{ORIGIN_UF}</UF></enderEmit></emit>'
+        f'<dest><CPF>{rng.randrange(10**10, 10**11)}</CPF><xNome>CONSUMIDOR {n}</xNome>'
+        f'<enderDest><UF>{uf_dest}</UF></enderDest><indIEDest>9</indIEDest></dest>'
+        f'{"".join(dets)}'
+        f'<total><ICMSTot><vProd>{total:.2f}</vProd><vNF>{total:.2f}</vNF></ICMSTot></total>'
+        f'</infNFe></NFe><protNFe versao="4.00"><infProt><chNFe>{key}</chNFe><cStat>100</cStat></infProt></protNFe>'
+        f'</nfeProc>'
+    )
+
+
+def _cte_xml(key: str, n: int, rng: random.Random) -> str:
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<cteProc xmlns="{CTE_NS}" versao="4.00"><CTe xmlns="{CTE_NS}">'
+        f'<infCte Id="CTe{key}" versao="4.00"><ide><mod>57</mod><nCT>{n + 1}</nCT></ide>'
+        f'<vPrest><vTPrest>{rng.uniform(50, 3000):.2f}</vTPrest></vPrest></infCte></CTe>'
+        f'<protCTe versao="4.00"><infProt><chCTe>{key}</chCTe><cStat>100</cStat></infProt></protCTe></cteProc>'
+    )
@@ -0,0 +1,54 @@
+import csv
+import re
+
+# Cabeçalhos aceitos (inglês ou português)
+COLUMN_ALIASES = {
+    'username': ('username', 'usuario', 'usuário', 'login'),
+    'password': ('password', 'senha'),
+    'is_admin': ('is_admin', 'admin', 'administrador'),
+    'permissions': ('permissions', 'permissoes', 'permissões'),
+}
+TRUE_VALUES = {'1', 'true', 'sim', 's', 'yes', 'y', 'x'}
+
+
+def read_users_csv(path):
+    """
+    Lê o CSV de usuários (separador ',' ou ';').
+    Colunas: username, password, is_admin, permissions
+    As permissões podem vir separadas por ',', ';' ou '|' (ex: "dashboard|sped").
+    Retorna lista de (linha, username, password, is_admin, permissions).
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(f, dialect=dialect)
+
+        columns = {}
+        for field in reader.fieldnames or []:
+            key = field.strip().lower()
+            for target, aliases in COLUMN_ALIASES.items():
+                if key in aliases:
+                    columns[target] = field
+
+        if 'username' not in columns or 'password' not in columns:
+            raise ValueError("O CSV precisa das colunas 'username' e 'password'.")
+
+        rows = []
+        for line, record in enumerate(reader, start=2):
+            def value(name):
+                field = columns.get(name)
+                return (record.get(field) or '').strip() if field else ''
+
+            permissions = ",".join(p.strip() for p in re.split(r'[;,|]', value('permissions')) if p.strip())
+            rows.append((
+                line,
+                value('username'),
+                value('password'),
+                value('is_admin').lower() in TRUE_VALUES,
+                permissions,
+            ))
+        return rows
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import logging
+import datetime
+import functools
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from src.config import (
+    WATCH_DEBOUNCE_SECONDS, WATCH_MAX_WORKERS, WATCH_PIPELINES, WATCH_POLL_INTERVAL, WATCH_SETTLE_SECONDS
+)
+from src.utils import batch_tasks
+from src.utils.sped_scanner import read_header
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = ".watch_state.json"
+# Arquivos temporários de cópia/upload e do Office
+IGNORED_PREFIXES = ('.', '~$')
+IGNORED_SUFFIXES = ('.tmp', '.part', '.crdownload')
+
+# Situações gravadas no estado
+PROCESSED = "processado"
+FAILED = "erro"
+IGNORED = "ignorado"
+
+
+class WatchFolderService:
+    """
+    Monitora uma pasta compartilhada e processa automaticamente o que chega:
+    - SPED EFD Contribuições (.txt): planilha de apuração ('contrib')
+    - SPED EFD ICMS/IPI (.txt): TXT com as chaves de entrada ('keys')
+    - pasta com XMLs (soltos ou em ZIPs): relatório DIFAL/FCP ('difal')
+
+    Um item só é processado depois que o tamanho/data de modificação ficam
+    estáveis por settle_seconds (cópia concluída). As saídas vão para
+    results_dir, espelhando as subpastas de watch_dir.
+
+    O estado (results_dir/.watch_state.json) guarda a assinatura de cada item
+    processado; ao reiniciar, itens com a mesma assinatura não são refeitos e
+    um arquivo substituído (assinatura diferente) é processado de novo.
+
+    A detecção é por varredura periódica. Com o pacote opcional watchdog
+    instalado, os eventos do sistema de arquivos (inotify etc.) antecipam a
+    varredura, agrupados por WATCH_DEBOUNCE_SECONDS.
+    """
+
+    def __init__(self, watch_dir: str, results_dir: str, pipelines=WATCH_PIPELINES,
+                 workers: int = WATCH_MAX_WORKERS, poll_interval: float = WATCH_POLL_INTERVAL,
+                 settle_seconds: float = WATCH_SETTLE_SECONDS):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.results_dir = os.path.abspath(results_dir)
+        self.pipelines = set(pipelines)
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.state_path = os.path.join(self.results_dir, STATE_FILE)
+        self.state: Dict[str, Dict] = {}
+        # Itens vistos mas ainda não estáveis: caminho relativo -> (assinatura, desde)
+        self._pending: Dict[str, Tuple[Tuple, float]] = {}
+        self._inflight: Dict[Future, Tuple[str, Tuple]] = {}
+        self._wakeup = threading.Event()
+        self._executor = None
+        # Itens com erro nesta execução (código de saída do --once)
+        self.failures = 0
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+    def run(self, stop_event: Optional[threading.Event] = None, once: bool = False):
+        """
+        Laço principal. once=True: processa o que estiver na pasta (esperando
+        estabilizar) e retorna quando não houver mais nada pendente.
+        """
+        stop_event = stop_event or threading.Event()
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.state = self._load_state()
+        observer = None if once else self._start_observer()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        logger.info("Monitorando %s (resultados em %s, %s)", self.watch_dir, self.results_dir,
+                    "eventos + varredura" if observer else "varredura")
+        try:
+            while not stop_event.is_set():
+                self.poll()
+                if once and not self._pending and not self._inflight:
+                    break
+                timeout = self.poll_interval
+                if self._pending or self._inflight:
+                    timeout = min(timeout, max(0.2, self.settle_seconds / 2))
+                if self._wakeup.wait(timeout):
+                    # Rajada de eventos (cópia de uma pasta): espera assentar
+                    stop_event.wait(WATCH_DEBOUNCE_SECONDS)
+                    self._wakeup.clear()
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._collect()
+            self._executor = None
+
+    def poll(self, now: Optional[float] = None):
+        """Uma rodada: recolhe os resultados prontos, varre a pasta e agenda os itens estáveis."""
+        now = time.monotonic() if now is None else now
+        self._collect()
+        busy = {rel for rel, _ in self._inflight.values()}
+        found = self.scan()
+
+        for rel in list(self._pending):
+            if rel not in found:
+                del self._pending[rel]
+
+        for rel, (kind, path, signature) in found.items():
+            if rel in busy or self._is_done(rel, signature):
+                continue
+            previous = self._pending.get(rel)
+            if previous is None or previous[0] != signature:
+                self._pending[rel] = (signature, now)
+                continue
+            if now - previous[1] < self.settle_seconds:
+                continue
+            # Fila limitada: o restante espera a próxima rodada
+            if len(self._inflight) >= self.workers * 2:
+                break
+            del self._pending[rel]
+            self._submit(rel, kind, path, signature)
+
+    def scan(self) -> Dict[str, Tuple[str, str, Tuple]]:
+        """Itens da pasta: caminho relativo -> (tipo, caminho, assinatura)."""
+        found = {}
+        for root, dirs, files in os.walk(self.watch_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(IGNORED_PREFIXES)
+                       and os.path.join(root, d) != self.results_dir]
+            xml_count, xml_size, xml_mtime = 0, 0, 0
+            for name in files:
+                if name.startswith(IGNORED_PREFIXES) or name.lower().endswith(IGNORED_SUFFIXES):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removido durante a varredura
+                lower = name.lower()
+                if lower.endswith(('.xml', '.zip')):
+                    xml_count += 1
+                    xml_size += st.st_size
+                    xml_mtime = max(xml_mtime, st.st_mtime_ns)
+                elif lower.endswith('.txt'):
+                    found[self._relative(path)] = ('sped', path, (st.st_size, st.st_mtime_ns))
+            if xml_count:
+                found[self._relative(root)] = ('xml', root, (xml_count, xml_size, xml_mtime))
+        return found
+
+    # ------------------------------------------------------------------
+    # Processamento
+    # ------------------------------------------------------------------
+    def _submit(self, rel: str, kind: str, path: str, signature: Tuple):
+        output_dir = os.path.join(self.results_dir, rel) if kind == 'xml' else \
+            os.path.join(self.results_dir, os.path.dirname(rel))
+
+        if kind == 'xml':
+            step = 'difal'
+            # Cada subpasta é um item próprio da varredura: não desce nas subpastas
+            args = (functools.partial(batch_tasks.difal_report, recursive=False), path, output_dir)
+        else:
+            tipo = read_header(path)['tipo']
+            if tipo == 'EFD Contribuições':
+                step = 'contrib'
+                args = (batch_tasks.contrib_report, path, output_dir)
+            elif tipo == 'EFD ICMS/IPI':
+                step = 'keys'
+                stem = os.path.splitext(os.path.basename(path))[0]
+                args = (batch_tasks.extract_keys, [path], os.path.join(output_dir, f"CHAVES_{stem}.txt"))
+            else:
+                self._record(rel, signature, IGNORED, "Não é um arquivo SPED reconhecido.")
+                return
+
+        if step not in self.pipelines:
+            self._record(rel, signature, IGNORED, f"Etapa '{step}' desativada.")
+            return
+
+        os.makedirs(output_dir, exist_ok=True)
+        logger.info("Processando %s (%s)", rel, step)
+        future = self._executor.submit(*args)
+        self._inflight[future] = (rel, signature)
+
+    def _collect(self):
+        for future in [f for f in self._inflight if f.done()]:
+            rel, signature = self._inflight.pop(future)
+            if future.cancelled():
+                continue  # volta a ser encontrado na próxima execução
+            try:
+                result = future.result()
+                status = PROCESSED if result['sucesso'] else FAILED
+                self._record(rel, signature, status, result['mensagem'], result.get('saida'),
+                             result.get('duracao_s'))
+            except Exception as e:
+                self._record(rel, signature, FAILED, f"Erro: {e}")
+
+    def _record(self, rel: str, signature: Tuple, status: str, message: str,
+                output: Optional[str] = None, duration: Optional[float] = None):
+        self.state[rel] = {
+            'assinatura': list(signature),
+            'situacao': status,
+            'mensagem': message,
+            'saida': output,
+            'duracao_s': duration,
+            'em': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        if status == FAILED:
+            self.failures += 1
+        log = logger.info if status != FAILED else logger.warning
+        log("%s: %s - %s", rel, status, " | ".join(l for l in str(message).splitlines() if l))
+        self._save_state()
+
+    def _is_done(self, rel: str, signature: Tuple) -> bool:
+        entry = self.state.get(rel)
+        return entry is not None and entry['assinatura'] == list(signature)
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.watch_dir).replace(os.sep, '/')
+
+    # ------------------------------------------------------------------
+    # Estado
+    # ------------------------------------------------------------------
+    def _load_state(self) -> Dict[str, Dict]:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Estado ilegível (%s), recomeçando do zero: %s", self.state_path, e)
+            return {}
+
+    def _save_state(self):
+        # Grava num temporário e troca: uma queda no meio não corrompe o estado
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def _start_observer(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return None
+
+        service = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.src_path.startswith(service.results_dir):
+                    service._wakeup.set()
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.watch_dir, recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
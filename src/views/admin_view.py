@@ -1,5 +1,8 @@
 import flet as ft
-from src.utils.database import create_user, get_connection
+import threading
+from src.utils.database import create_user, list_users, bulk_create_users
+from src.utils.user_import import read_users_csv
+from src.utils.progress_bus import ProgressBus, SharedCounter
 import traceback
 
 class AdminView(ft.Column):
@@ -29,18 +32,35 @@ class AdminView(ft.Column):
         self.perm_sped = ft.Checkbox(label="Automação SPED")
         self.perm_settings = ft.Checkbox(label="Configurações")
 
+        # Importação em lote (CSV)
+        self.csv_picker = ft.FilePicker(on_result=self.on_csv_picked)
+        self.main_page.overlay.append(self.csv_picker)
+        self.import_spinner = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
+        self.import_status = ft.Text("", size=12, color=ft.Colors.GREY_700)
+        self.import_button = ft.OutlinedButton(
+            "Importar CSV",
+            icon=ft.Icons.UPLOAD_FILE,
+            tooltip="Colunas: username, password, is_admin, permissions",
+            on_click=lambda _: self.csv_picker.pick_files(allow_multiple=False, allowed_extensions=["csv"])
+        )
+
         self.controls = [
             ft.Row([
                 ft.Text("Gerenciamento de Usuários", size=24, weight="bold"),
                 ft.IconButton(ft.Icons.REFRESH, on_click=self.refresh_users)
             ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
             ft.Divider(),
-            ft.ElevatedButton(
-                "Criar Novo Usuário", 
-                icon=ft.Icons.ADD, 
-                on_click=self.open_create_dialog, 
-                style=ft.ButtonStyle(bgcolor=ft.Colors.PRIMARY, color=ft.Colors.WHITE)
-            ),
+            ft.Row([
+                ft.ElevatedButton(
+                    "Criar Novo Usuário", 
+                    icon=ft.Icons.ADD, 
+                    on_click=self.open_create_dialog, 
+                    style=ft.ButtonStyle(bgcolor=ft.Colors.PRIMARY, color=ft.Colors.WHITE)
+                ),
+                self.import_button,
+                self.import_spinner,
+                self.import_status
+            ]),
             ft.Container(height=20),
             self.users_table
         ]
@@ -48,13 +68,17 @@ class AdminView(ft.Column):
     def did_mount(self):
         self.refresh_users(None)
 
+    def on_show(self):
+        self.refresh_users(None)
+
+    def dispose(self):
+        """Remove o seletor de arquivos da página (chamado no logout)."""
+        if self.csv_picker in self.main_page.overlay:
+            self.main_page.overlay.remove(self.csv_picker)
+
     def refresh_users(self, e):
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, username, is_admin, permissions FROM users")
-            rows = cursor.fetchall()
-            conn.close()
+            rows = list_users()
 
             self.users_table.rows = [
                 ft.DataRow(cells=[
@@ -77,6 +101,9 @@ class AdminView(ft.Column):
         self.perm_sped.value = False
         self.perm_settings.value = False
         
+        self.save_spinner = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
+        self.save_button = ft.ElevatedButton("Salvar", on_click=self.save_user)
+
         # 2. Cria o diálogo (Modal)
         # Importante: Criamos uma nova instância aqui para garantir que não haja conflito
         self.dialog_obj = ft.AlertDialog(
@@ -92,8 +119,9 @@ class AdminView(ft.Column):
                 self.perm_settings
             ], tight=True, width=400),
             actions=[
+                self.save_spinner,
                 ft.TextButton("Cancelar", on_click=self.close_dialog),
-                ft.ElevatedButton("Salvar", on_click=self.save_user)
+                self.save_button
             ]
         )
 
@@ -118,13 +146,17 @@ class AdminView(ft.Column):
         if self.perm_settings.value: perms.append("settings")
         perms_str = ",".join(perms)
 
+        # O hash da senha (bcrypt) roda fora do evento da UI
+        self.save_spinner.visible = True
+        self.save_button.disabled = True
+        self.dialog_obj.update()
+
+        args = (self.new_username.value, self.new_password.value, self.is_admin_check.value, perms_str)
+        threading.Thread(target=self.save_user_task, args=args, daemon=True).start()
+
+    def save_user_task(self, username, password, is_admin, perms_str):
         try:
-            success = create_user(
-                self.new_username.value,
-                self.new_password.value,
-                self.is_admin_check.value,
-                perms_str
-            )
+            success = create_user(username, password, is_admin, perms_str)
 
             if success:
                 self.close_dialog(None)
@@ -138,5 +170,57 @@ class AdminView(ft.Column):
             traceback.print_exc()
             self.main_page.snack_bar = ft.SnackBar(ft.Text(f"Erro interno: {ex}"), bgcolor="red")
 
+        self.save_spinner.visible = False
+        self.save_button.disabled = False
+        if self.dialog_obj.open:
+            self.dialog_obj.update()
         self.main_page.snack_bar.open = True
-        self.main_page.update()
\ No newline at end of file
+        self.main_page.update()
+
+    def on_csv_picked(self, e: ft.FilePickerResultEvent):
+        if not e.files: return
+        self.import_spinner.visible = True
+        self.import_button.disabled = True
+        self.update()
+        threading.Thread(target=self.import_csv_task, args=(e.files[0].path,), daemon=True).start()
+
+    def import_csv_task(self, csv_path):
+        # As senhas são geradas em outros processos: o contador compartilhado
+        # é lido pelo ProgressBus a cada quadro
+        counter = SharedCounter()
+        progress = None
+        try:
+            rows = read_users_csv(csv_path)
+            total = len(rows)
+
+            def render(state):
+                self.import_status.value = f"Senhas geradas: {state['done']}/{total}"
+                return [self.import_status]
+
+            progress = ProgressBus.for_page(self.main_page).channel(render, poll=lambda: {'done': counter.value})
+            created, conflicts = bulk_create_users(rows, progress_counter=counter)
+            title = f"{len(created)} usuários criados"
+            lines = [ft.Text(f"Linha {line}: {user or '(vazio)'} - {reason}", size=12, color="orange")
+                     for line, user, reason in conflicts]
+            if not lines:
+                lines = [ft.Text("Nenhum conflito.", color="green")]
+        except Exception as ex:
+            traceback.print_exc()
+            title = "Erro na importação"
+            lines = [ft.Text(str(ex), color="red")]
+        finally:
+            if progress:
+                progress.close()
+
+        self.import_status.value = ""
+        self.import_spinner.visible = False
+        self.import_button.disabled = False
+        # Atualiza a tabela uma única vez, ao final
+        self.refresh_users(None)
+
+        self.import_dialog = ft.AlertDialog(
+            title=ft.Text(title),
+            content=ft.Container(content=ft.ListView(lines, spacing=5), width=450, height=250),
+            actions=[ft.TextButton("Fechar", on_click=lambda _: self.main_page.close(self.import_dialog))]
+        )
+        self.main_page.open(self.import_dialog)
@@ -1,8 +1,12 @@
-import flet as ft
-from src.utils.database import get_total_users
-import os
 import datetime
-import glob
+import flet as ft
+from src.utils.database import get_total_users, list_users
+from src.utils import activity_store, metrics
+from src.utils.job_manager import job_stats_since
+
+# Quantidade de ações exibidas em "Atividades Recentes"
+RECENT_ACTIONS = 10
+ALL_USERS = "Todos os usuários"
 
 class DashboardView(ft.Column):
     def __init__(self):
@@ -15,6 +19,10 @@ class DashboardView(ft.Column):
         
         # Container para Atividades Recentes (Lista)
         self.activity_column = ft.Column(spacing=10)
+        self.user_filter = ft.Dropdown(
+            label="Usuário", width=250, dense=True, value=ALL_USERS,
+            on_change=self.on_user_filter_change
+        )
 
         self.controls = [
             ft.Row([
@@ -27,7 +35,10 @@ class DashboardView(ft.Column):
             ft.Container(content=self.stats_row, padding=ft.padding.only(bottom=20)),
             
             # Área de Logs Recentes
-            ft.Text("Atividades Recentes", size=20, weight="bold"),
+            ft.Row([
+                ft.Text("Atividades Recentes", size=20, weight="bold"),
+                self.user_filter
+            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
             ft.Container(
                 content=self.activity_column,
                 border=ft.border.all(1, ft.Colors.GREY_300),
@@ -40,6 +51,10 @@ class DashboardView(ft.Column):
     def did_mount(self):
         self.refresh_data(None)
 
+    def on_show(self):
+        # View reaproveitada pelo ViewRegistry: atualiza ao voltar para a tela
+        self.refresh_data(None)
+
     def refresh_data(self, e):
         """Atualiza todos os dados da tela"""
         # 1. Carregar Estatísticas
@@ -52,83 +67,100 @@ class DashboardView(ft.Column):
             self.build_stat_card("Sessões Hoje", str(sessions_today), ft.Icons.ACCESS_TIME, "orange"),
             # Simulação de status do banco de dados
             self.build_stat_card("Banco de Dados", "Conectado", ft.Icons.STORAGE, "green"),
-        ]
+        ] + self.build_performance_cards()
         
-        # 2. Carregar Logs Recentes
+        # 2. Carregar Atividades Recentes
+        self.load_user_options()
         self.load_recent_activity()
         
         self.update()
 
-    def count_sessions_today(self):
-        """Conta quantos arquivos de log foram criados/modificados hoje"""
-        log_dir = "logs"
-        if not os.path.exists(log_dir): return 0
+    def build_performance_cards(self):
+        """Cards de desempenho: fila de tarefas, arquivos/hora, vazão SPED e saúde da API da Sieg"""
+        queued = int(metrics.JOBS_QUEUED.value())
+        running = int(metrics.JOBS_RUNNING.value())
+        cards = [self.build_stat_card("Tarefas na Fila", str(queued), ft.Icons.PENDING_ACTIONS, "purple",
+                                      subtitle=f"{running} em execução")]
+
+        now = datetime.datetime.now()
+        try:
+            files_hour, _, _ = job_stats_since(now - datetime.timedelta(hours=1))
+            _, sped_bytes, sped_seconds = job_stats_since(now - datetime.timedelta(days=1))
+        except Exception as e:
+            print(f"Erro ao ler histórico de tarefas: {e}")
+            files_hour, sped_bytes, sped_seconds = 0, 0, 0
+        cards.append(self.build_stat_card("Arquivos/Hora", f"{files_hour:,}", ft.Icons.SPEED, "teal",
+                                          subtitle="concluídos na última hora"))
+        throughput = f"{sped_bytes / sped_seconds / 1024 / 1024:,.1f} MB/s" if sped_seconds else "-"
+        cards.append(self.build_stat_card("Vazão SPED", throughput, ft.Icons.TRENDING_UP, "indigo",
+                                          subtitle="últimas 24 horas"))
 
-        today_str = datetime.datetime.now().strftime("%Y%m%d")
-        count = 0
+        latency, failure_rate, requests = metrics.sieg_health()
+        if requests:
+            value = f"{latency * 1000:,.0f} ms" if latency is not None else "-"
+            subtitle = f"{failure_rate:.0%} de falhas em {requests:,} requisições"
+            color = "green" if failure_rate < 0.05 else "orange" if failure_rate < 0.25 else "red"
+        else:
+            value, subtitle, color = "-", "nenhuma requisição desde a abertura", "grey"
+        cards.append(self.build_stat_card("API Sieg", value, ft.Icons.CLOUD_DOWNLOAD, color, subtitle=subtitle))
+        return cards
+
+    def count_sessions_today(self):
+        """Sessões iniciadas hoje (consulta indexada por dia)"""
         try:
-            # Lista todos os arquivos .txt na pasta logs
-            files = glob.glob(os.path.join(log_dir, "session_*.txt"))
-            for f in files:
-                # Verifica se o nome do arquivo contém a data de hoje
-                if today_str in f:
-                    count += 1
+            return activity_store.count_sessions_on()
         except Exception as e:
             print(f"Erro ao contar sessões: {e}")
-        return count
+            return 0
+
+    def on_user_filter_change(self, e):
+        self.load_recent_activity()
+        self.activity_column.update()
+
+    def load_user_options(self):
+        """Preenche o filtro de usuários (mantém a seleção atual)"""
+        current = self.user_filter.value
+        options = [ft.dropdown.Option(ALL_USERS)]
+        try:
+            options += [ft.dropdown.Option(row[1]) for row in list_users()]
+        except Exception as e:
+            print(f"Erro ao listar usuários: {e}")
+        self.user_filter.options = options
+        self.user_filter.value = current or ALL_USERS
 
     def load_recent_activity(self):
-        """Lê as últimas linhas dos 5 arquivos de log mais recentes"""
+        """Últimas ações registradas (todas ou do usuário selecionado)"""
         self.activity_column.controls.clear()
-        log_dir = "logs"
-        
-        if not os.path.exists(log_dir):
-            self.activity_column.controls.append(ft.Text("Nenhum log encontrado."))
-            return
+        user = self.user_filter.value
 
         try:
-            # Pega todos os logs e ordena pelo tempo de modificação (mais recente primeiro)
-            list_of_files = glob.glob(os.path.join(log_dir, "*.txt"))
-            list_of_files.sort(key=os.path.getmtime, reverse=True)
-            
-            # Pega os top 5 arquivos mais recentes
-            recent_files = list_of_files[:5]
-            
-            for file_path in recent_files:
-                filename = os.path.basename(file_path)
-                # Tenta extrair usuário do nome do arquivo (session_USUARIO_data.txt)
-                try:
-                    parts = filename.split('_')
-                    user = parts[1] if len(parts) > 1 else "Desconhecido"
-                except:
-                    user = "Sistema"
-
-                # Lê a última linha não vazia do arquivo
-                last_action = "Iniciou sessão"
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    if lines:
-                        # Pega a última linha que não seja apenas quebra de linha
-                        for line in reversed(lines):
-                            if line.strip() and not line.startswith("Session started") and not line.startswith("-"):
-                                last_action = line.strip()
-                                break
-                
-                # Adiciona à lista visual
-                self.activity_column.controls.append(
-                    ft.ListTile(
-                        leading=ft.Icon(ft.Icons.HISTORY, color=ft.Colors.GREY),
-                        title=ft.Text(f"Usuário: {user}"),
-                        subtitle=ft.Text(last_action, size=12, color=ft.Colors.GREY_700),
-                        dense=True
-                    )
-                )
-                self.activity_column.controls.append(ft.Divider(height=1, thickness=0.5))
-
+            if user and user != ALL_USERS:
+                rows = [(ts, user, message) for ts, _, message, _ in
+                        activity_store.user_activity(user, RECENT_ACTIONS)]
+            else:
+                rows = activity_store.recent_actions(RECENT_ACTIONS)
         except Exception as e:
-            self.activity_column.controls.append(ft.Text(f"Erro ao ler logs: {e}", color="red"))
+            self.activity_column.controls.append(ft.Text(f"Erro ao ler atividades: {e}", color="red"))
+            return
+
+        if not rows:
+            self.activity_column.controls.append(ft.Text("Nenhuma atividade registrada."))
+            return
+
+        for ts, username, message in rows:
+            # ts no formato ISO: AAAA-MM-DDTHH:MM:SS.mmm
+            when = f"{ts[8:10]}/{ts[5:7]} {ts[11:19]}"
+            self.activity_column.controls.append(
+                ft.ListTile(
+                    leading=ft.Icon(ft.Icons.HISTORY, color=ft.Colors.GREY),
+                    title=ft.Text(f"Usuário: {username or 'Sistema'}"),
+                    subtitle=ft.Text(f"[{when}] {message}", size=12, color=ft.Colors.GREY_700),
+                    dense=True
+                )
+            )
+            self.activity_column.controls.append(ft.Divider(height=1, thickness=0.5))
 
-    def build_stat_card(self, title, value, icon, color="blue"):
+    def build_stat_card(self, title, value, icon, color="blue", subtitle=None):
         return ft.Card(
             elevation=4,
             content=ft.Container(
@@ -142,6 +174,6 @@ class DashboardView(ft.Column):
                     ], alignment=ft.MainAxisAlignment.START),
                     ft.Container(height=10),
                     ft.Text(value, size=28, weight="bold", color=ft.Colors.BLACK87),
-                ])
+                ] + ([ft.Text(subtitle, size=12, color=ft.Colors.GREY_700)] if subtitle else []))
             )
         )
\ No newline at end of file
@@ -1,5 +1,6 @@
 import flet as ft
-from src.utils.database import get_user_by_username, verify_password
+import threading
+from src.utils.database import authenticate
 from src.utils.logger import start_session_log, log_action
 
 class LoginView(ft.Container):
@@ -19,6 +20,13 @@ class LoginView(ft.Container):
             on_submit=self.handle_login
         )
         self.error_text = ft.Text(color="red")
+        self.spinner = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
+        self.login_button = ft.ElevatedButton(
+            "Entrar",
+            width=300,
+            style=ft.ButtonStyle(padding=20),
+            on_click=self.handle_login
+        )
 
         self.content = ft.Column(
             alignment=ft.MainAxisAlignment.CENTER,
@@ -36,12 +44,8 @@ class LoginView(ft.Container):
                                 self.username_input,
                                 self.password_input,
                                 self.error_text,
-                                ft.ElevatedButton(
-                                    "Entrar",
-                                    width=300,
-                                    style=ft.ButtonStyle(padding=20),
-                                    on_click=self.handle_login
-                                )
+                                self.spinner,
+                                self.login_button
                             ]
                         )
                     )
@@ -59,11 +63,20 @@ class LoginView(ft.Container):
             self.update() # Usa update() normal
             return
 
-        # Busca o usuário no banco (síncrono)
-        user = get_user_by_username(username)
+        # O bcrypt é lento de propósito: a verificação roda fora do evento da UI
+        self.set_busy(True)
+        threading.Thread(target=self.authenticate_task, args=(username, password), daemon=True).start()
+
+    def authenticate_task(self, username, password):
+        try:
+            # Busca o usuário e valida a senha (refaz o hash se o custo mudou)
+            user = authenticate(username, password)
+        except Exception as ex:
+            self.error_text.value = f"Erro ao acessar o banco: {ex}"
+            self.set_busy(False)
+            return
 
-        # Valida senha
-        if user and verify_password(user[2], password):
+        if user:
             user_data = {
                 "id": user[0],
                 "username": user[1],
@@ -73,9 +86,23 @@ class LoginView(ft.Container):
 
             start_session_log(username)
             log_action("Login realizado com sucesso.")
+            # Com JOB_SERVER_URL configurado, as ferramentas SPED rodam no servidor de tarefas
+            # (importado aqui: requests não precisa atrasar a abertura da tela de login)
+            from src.utils import job_client
+            if job_client.connect(username, password):
+                log_action("Conectado ao servidor de tarefas.")
 
             # Chama a função de sucesso SEM await
             self.on_login_success(user_data)
         else:
             self.error_text.value = "Usuário ou senha inválidos."
-            self.update() # Usa update() normal
\ No newline at end of file
+            self.set_busy(False)
+
+    def set_busy(self, busy):
+        self.spinner.visible = busy
+        self.login_button.disabled = busy
+        self.username_input.disabled = busy
+        self.password_input.disabled = busy
+        if busy:
+            self.error_text.value = ""
+        self.update()
@@ -10,8 +10,18 @@ from src.utils.sped_parser import process_sped_file
 from src.utils.report_generator import generate_fiscal_report
 from src.utils.sped_filter_logic import SpedFilterLogic
 from src.utils.keys_extractor_logic import KeysExtractorLogic
+from src.utils.key_set import CompactKeySet
+from src.utils.key_download_pipeline import KeyDownloadPipeline
 from src.utils.sieg_manager import SiegManager
 from src.utils.difal_logic import DifalLogic 
+from src.utils.difal_dataset import AGRUPAMENTOS
+from src.utils.sped_validator import SpedValidatorLogic
+from src.utils.sped_scanner import get_sped_overview, format_sped_date
+from src.utils.job_manager import get_job_manager, load_job_history
+from src.utils.progress_bus import ProgressBus
+from src.utils.job_client import JobServerError, get_job_client
+from src.views.virtual_grid import ColumnarSource, VirtualGrid
+from src.utils.cancellation import OperationCancelled, CANCELLED_MSG
 
 class SpedView(ft.Column):
     def __init__(self, page: ft.Page):
@@ -22,8 +32,11 @@ class SpedView(ft.Column):
         # --- Instância das Classes de Lógica ---
         self.filter_logic = SpedFilterLogic()
         self.keys_logic = KeysExtractorLogic()
-        self.sieg_manager = SiegManager()
         self.difal_logic = DifalLogic()
+        self.validator_logic = SpedValidatorLogic()
+        self.job_manager = get_job_manager()
+        self.job_manager.add_listener(self.on_job_changed)
+        self.progress_bus = ProgressBus.for_page(page)
 
         # --- Configuração dos File Pickers (Diálogos de Arquivo) ---
         self.open_file_picker = ft.FilePicker(on_result=self.on_open_file_result)
@@ -31,12 +44,8 @@ class SpedView(ft.Column):
         self.folder_picker = ft.FilePicker(on_result=self.on_folder_result)
 
         # Adiciona os diálogos à página (obrigatório no Flet)
-        if self.open_file_picker not in self.page_instance.overlay:
-            self.page_instance.overlay.extend([
-                self.open_file_picker, 
-                self.save_file_picker, 
-                self.folder_picker
-            ])
+        self.pickers = [self.open_file_picker, self.save_file_picker, self.folder_picker]
+        self.page_instance.overlay.extend(self.pickers)
         
         self.page_instance.update()
 
@@ -44,12 +53,14 @@ class SpedView(ft.Column):
         self.current_action = None 
         self.pending_input_path = None 
         self.pending_filter_dates = None
+        self.pending_dataset_options = {}
         self.keys_found_list = []
         
         # Caches para o relatório DIFAL
         self.difal_data_summary = []  
         self.difal_data_details = [] 
         self.difal_errors_list = [] # Lista de erros de leitura XML
+        self.contrib_data = None # DataFrame da última planilha gerada
         
         # Controle de Abas
         self.active_tab_label = "Menu"
@@ -58,7 +69,10 @@ class SpedView(ft.Column):
 
         # --- Layout Principal ---
         self.tabs_row = ft.Row(scroll=ft.ScrollMode.AUTO)
-        self.content_area = ft.Container(expand=True, padding=20)
+        # Abas já abertas ficam montadas (só a ativa visível): assim os
+        # processamentos em andamento continuam atualizando a tela delas
+        self.tabs_stack = ft.Column(expand=True, spacing=0)
+        self.content_area = ft.Container(content=self.tabs_stack, expand=True, padding=20)
 
         self.controls = [
             ft.Container(
@@ -109,10 +123,22 @@ class SpedView(ft.Column):
 
     def set_content(self, label, initial=False):
         if label in self.tab_contents:
-            self.content_area.content = self.tab_contents[label]
+            content = self.tab_contents[label]
+            if content not in self.tabs_stack.controls:
+                content.expand = True
+                self.tabs_stack.controls.append(content)
+            for tab in self.tabs_stack.controls:
+                tab.visible = tab is content
             if not initial:
                 self.content_area.update()
 
+    def dispose(self):
+        """Remove os seletores de arquivo da página (chamado no logout)."""
+        self.job_manager.remove_listener(self.on_job_changed)
+        for picker in self.pickers:
+            if picker in self.page_instance.overlay:
+                self.page_instance.overlay.remove(picker)
+
     def init_menu(self):
         self.tab_contents["Menu"] = ft.Column(
             scroll=ft.ScrollMode.AUTO,
@@ -121,10 +147,12 @@ class SpedView(ft.Column):
                 ft.Text("Selecione uma ferramenta:", color=ft.Colors.GREY_600),
                 ft.Divider(height=20, color=ft.Colors.TRANSPARENT),
                 ft.Row(wrap=True, spacing=20, run_spacing=20, controls=[
+                    self.create_card("Validador SPED", ft.Icons.FACT_CHECK, "Conferir Bloco 9 e leiaute.", self.open_validator_tab),
                     self.create_card("SPED Contribuições", ft.Icons.TABLE_CHART, "Gerar planilha fiscal.", self.open_contrib_tab),
                     self.create_card("Filtro por Data", ft.Icons.DATE_RANGE, "Filtrar período do SPED.", self.open_filter_tab),
                     self.create_card("Extrator de Chaves", ft.Icons.VPN_KEY, "Extrair e Baixar XMLs.", self.open_keys_tab),
                     self.create_card("Relatório DIFAL", ft.Icons.MONETIZATION_ON, "Extrair totais de DIFAL/FCP.", self.open_difal_tab),
+                    self.create_card("Tarefas", ft.Icons.PENDING_ACTIONS, "Acompanhar e cancelar processamentos.", self.open_jobs_tab),
                 ])
             ]
         )
@@ -145,9 +173,9 @@ class SpedView(ft.Column):
     # =========================================================================
     # HANDLERS DE ARQUIVOS (ABRIR, SALVAR, PASTA)
     # =========================================================================
-    def request_open_file(self, action_type):
+    def request_open_file(self, action_type, extensions=None):
         self.current_action = action_type
-        self.open_file_picker.pick_files(allow_multiple=False, allowed_extensions=["txt"])
+        self.open_file_picker.pick_files(allow_multiple=False, allowed_extensions=extensions or ["txt"])
 
     def on_open_file_result(self, e: ft.FilePickerResultEvent):
         if not e.files: return
@@ -156,12 +184,21 @@ class SpedView(ft.Column):
         if self.current_action == 'contrib':
             self.contrib_path_input.value = file_path
             self.contrib_path_input.update()
+            self.show_overview(self.contrib_overview, file_path)
         elif self.current_action == 'filter':
             self.filter_path_input.value = file_path
             self.filter_path_input.update()
+            self.show_overview(self.filter_overview, file_path)
         elif self.current_action == 'keys':
             self.keys_path_input.value = file_path
             self.keys_path_input.update()
+            self.show_overview(self.keys_overview, file_path)
+        elif self.current_action == 'keys_load_dataset':
+            self.load_keys_dataset(file_path)
+        elif self.current_action == 'validate':
+            self.validator_path_input.value = file_path
+            self.validator_path_input.update()
+            self.show_overview(self.validator_overview, file_path)
 
     def on_folder_result(self, e: ft.FilePickerResultEvent):
         if not e.path: return
@@ -169,6 +206,9 @@ class SpedView(ft.Column):
 
         if self.current_action == 'download_xml':
             self.run_download_thread(path)
+
+        elif self.current_action == 'pipeline_download':
+            self.run_pipeline_thread(path)
         
         elif self.current_action == 'difal_folder':
             self.difal_folder_input.value = path
@@ -183,25 +223,312 @@ class SpedView(ft.Column):
             
         elif self.current_action == 'keys':
             self.run_keys_logic_thread(output_path)
+
+        elif self.current_action == 'keys_dataset':
+            self.run_keys_dataset_thread(output_path)
             
         elif self.current_action == 'save_difal':
-            # Verifica o checkbox de detalhes
-            incluir_detalhes = self.chk_detailed_report.value
-            
-            sucesso, msg = self.difal_logic.gerar_excel(
-                self.difal_data_summary, 
-                self.difal_data_details, 
-                output_path, 
-                incluir_detalhado=incluir_detalhes
+            self.run_save_difal_thread(output_path)
+
+    def start_job(self, action, label, task, status_control, input_path=None, output_path=None, key=None):
+        """
+        Envia task(job) ao JobManager (pool limitado, cancelável pelo painel de Tarefas).
+        Se a mesma tarefa já estiver ativa, apenas avisa em status_control.
+        """
+        job, running = self.job_manager.submit(
+            action, task, label=label, key=key, input_path=input_path, output_path=output_path
+        )
+        if job is None:
+            status_control.value = f"Esta tarefa já está em andamento ({running.status.lower()}). Acompanhe em Tarefas."
+            status_control.color = "orange"
+            status_control.update()
+        return job
+
+    def progress_channel(self, progress_bar=None, status_text=None):
+        """
+        Canal do ProgressBus para a tarefa: publish(pct=..., text=...) só guarda os
+        valores; a barra e o texto são atualizados no próximo quadro da interface.
+        Fechar (close) antes das atualizações finais da tarefa.
+        """
+        def render(state):
+            changed = []
+            if progress_bar is not None and 'pct' in state:
+                progress_bar.value = state['pct'] / 100
+                changed.append(progress_bar)
+            if status_text is not None and 'text' in state:
+                status_text.value = state['text']
+                changed.append(status_text)
+            return changed
+        return self.progress_bus.channel(render)
+
+    def run_remote(self, job, tool, progress=None, **params):
+        """
+        Executa a ferramenta no servidor de tarefas (JOB_SERVER_URL) e devolve o
+        dicionário de resultado de batch_tasks ('sucesso', 'mensagem', ...).
+        A tarefa local do JobManager apenas acompanha o progresso e o cancelamento.
+        """
+        try:
+            return get_job_client().run(
+                tool, progress_callback=(lambda pct: progress.publish(pct=pct)) if progress else None,
+                cancel_token=job.token, **params
             )
-            
-            if sucesso:
-                self.difal_status.value = f"Arquivo salvo: {msg}"
-                self.difal_status.color = "green"
-            else:
-                self.difal_status.value = f"Erro ao salvar: {msg}"
-                self.difal_status.color = "red"
-            self.difal_status.update()
+        except OperationCancelled:
+            return {'sucesso': False, 'mensagem': CANCELLED_MSG}
+        except JobServerError as e:
+            return {'sucesso': False, 'mensagem': str(e)}
+
+    # =========================================================================
+    # PAINEL DE TAREFAS (JobManager)
+    # =========================================================================
+    def open_jobs_tab(self, e):
+        label = "Tarefas"
+        if label not in self.open_tabs:
+            self.open_tabs.append(label)
+            self.jobs_table = ft.DataTable(columns=[
+                ft.DataColumn(ft.Text("Tarefa")),
+                ft.DataColumn(ft.Text("Situação")),
+                ft.DataColumn(ft.Text("Duração")),
+                ft.DataColumn(ft.Text("Vazão")),
+                ft.DataColumn(ft.Text("Mensagem")),
+                ft.DataColumn(ft.Text("")),
+                ft.DataColumn(ft.Text("")),
+            ], rows=[])
+            self.jobs_history_table = ft.DataTable(columns=[
+                ft.DataColumn(ft.Text("Início")),
+                ft.DataColumn(ft.Text("Tarefa")),
+                ft.DataColumn(ft.Text("Usuário")),
+                ft.DataColumn(ft.Text("Situação")),
+                ft.DataColumn(ft.Text("Duração")),
+            ], rows=[])
+
+            self.tab_contents[label] = ft.Column(scroll=ft.ScrollMode.AUTO, controls=[
+                ft.Row([
+                    ft.Text(label, size=24, weight="bold"),
+                    ft.IconButton(ft.Icons.REFRESH, tooltip="Atualizar", on_click=lambda _: self.refresh_jobs())
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                ft.Divider(),
+                ft.Text("Nesta sessão", size=16, weight="bold"),
+                self.jobs_table,
+                ft.Divider(),
+                ft.Text("Histórico", size=16, weight="bold"),
+                self.jobs_history_table,
+            ])
+            self.build_jobs_rows()
+        self.switch_tab(label)
+        self.refresh_jobs()
+
+    def build_jobs_rows(self):
+        colors = {"Executando": "blue", "Concluída": "green", "Erro": "red", "Cancelada": "orange"}
+        self.jobs_table.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(job.label)),
+                ft.DataCell(ft.Text(job.status, color=colors.get(job.status))),
+                ft.DataCell(ft.Text(_format_duration(job.duration))),
+                ft.DataCell(ft.Text(job.throughput)),
+                ft.DataCell(ft.Text(job.message.split("\n")[0][:80], size=12)),
+                ft.DataCell(ft.IconButton(
+                    ft.Icons.TIMER_OUTLINED, tooltip="Tempos por etapa",
+                    visible=not job.active and job.profile is not None and bool(job.profile.stages),
+                    on_click=lambda _, job=job: self.show_profile_dialog(job)
+                )),
+                ft.DataCell(ft.IconButton(
+                    ft.Icons.CANCEL, icon_color="red", tooltip="Cancelar",
+                    visible=job.active and not job.token.cancelled,
+                    on_click=lambda _, job_id=job.id: self.job_manager.cancel(job_id)
+                )),
+            ])
+            for job in self.job_manager.jobs()
+        ]
+        try:
+            history = load_job_history(20)
+        except Exception as ex:
+            history = []
+            print(f"Erro ao ler histórico de tarefas: {ex}")
+        self.jobs_history_table.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(created_at.replace("T", " "))),
+                ft.DataCell(ft.Text(label)),
+                ft.DataCell(ft.Text(username or "-")),
+                ft.DataCell(ft.Text(status, color=colors.get(status))),
+                ft.DataCell(ft.Text(_format_duration(duration))),
+            ])
+            for created_at, label, username, status, duration, _, _, _ in history
+        ]
+
+    def refresh_jobs(self):
+        if not hasattr(self, "jobs_table"):
+            return
+        self.build_jobs_rows()
+        if self.jobs_table.page:
+            self.jobs_table.update()
+            self.jobs_history_table.update()
+
+    def show_profile_dialog(self, job):
+        """Divisão do tempo da tarefa por etapa (e cProfile/memória, se capturados)."""
+        profile = job.profile
+        rows = profile.breakdown()
+        source = ColumnarSource({
+            "Etapa": [name for name, _, _, _ in rows],
+            "Tempo (s)": [round(seconds, 3) for _, seconds, _, _ in rows],
+            "% do total": [round(pct, 1) if pct is not None else None for _, _, _, pct in rows],
+            "Chamadas": [calls for _, _, calls, _ in rows],
+        })
+        content = [ft.Text(f"Total: {_format_duration(profile.total)}", weight="bold"),
+                   VirtualGrid(source, height=250)]
+        extras = profile.extras()
+        if extras:
+            content.append(ft.Text(extras, font_family="monospace", size=11, selectable=True))
+        dlg = ft.AlertDialog(
+            title=ft.Text(f"Tempos por etapa - {job.label}"),
+            content=ft.Container(content=ft.Column(content, scroll=ft.ScrollMode.AUTO), width=900, height=480),
+        )
+        dlg.actions = [ft.TextButton("Fechar", on_click=lambda e: self.page_instance.close(dlg))]
+        self.page_instance.open(dlg)
+
+    def on_job_changed(self, job):
+        # Chamado pelo JobManager (thread da tarefa) a cada mudança de situação
+        self.refresh_jobs()
+
+    # =========================================================================
+    # VISÃO GERAL DO ARQUIVO (exibida ao selecionar um SPED)
+    # =========================================================================
+    def create_overview_panel(self):
+        return ft.Container(
+            visible=False, padding=15, bgcolor=ft.Colors.BLUE_50, border_radius=10,
+            content=ft.Column(spacing=6)
+        )
+
+    def show_overview(self, panel, file_path):
+        panel.content.controls = [
+            ft.Row([ft.ProgressRing(width=16, height=16, stroke_width=2), ft.Text("Analisando arquivo...")])
+        ]
+        panel.visible = True
+        panel.update()
+
+        def task():
+            try:
+                overview = get_sped_overview(file_path)
+                if overview:
+                    panel.content.controls = self.build_overview_controls(overview)
+                else:
+                    panel.content.controls = [ft.Text("Não foi possível ler o arquivo.", color="red")]
+            except Exception as ex:
+                panel.content.controls = [ft.Text(f"Erro ao analisar arquivo: {ex}", color="red")]
+            panel.update()
+
+        threading.Thread(target=task).start()
+
+    def build_overview_controls(self, ov):
+        def metric(title, value):
+            return ft.Column([
+                ft.Text(title, size=11, color=ft.Colors.GREY_700),
+                ft.Text(value, size=16, weight="bold")
+            ], spacing=0)
+
+        # Registros mais frequentes primeiro
+        top_regs = sorted(ov['registros'].items(), key=lambda kv: kv[1], reverse=True)[:16]
+        chips = [
+            ft.Container(
+                content=ft.Text(f"{reg}: {count:,}".replace(",", "."), size=11),
+                padding=ft.padding.symmetric(horizontal=8, vertical=3),
+                bgcolor=ft.Colors.WHITE, border_radius=8
+            ) for reg, count in top_regs
+        ]
+
+        controls = [
+            ft.Text(f"{ov['tipo']} • {ov['empresa'] or '-'} ({ov['cnpj'] or '-'})", weight="bold"),
+            ft.Text(f"Período: {format_sped_date(ov['dt_ini'])} a {format_sped_date(ov['dt_fin'])}", size=12),
+            ft.Row(wrap=True, spacing=30, controls=[
+                metric("Linhas", f"{ov['total_linhas']:,}".replace(",", ".")),
+                metric("Documentos C100", f"{ov['documentos_c100']:,}".replace(",", ".")),
+                metric("Documentos D100", f"{ov['documentos_d100']:,}".replace(",", ".")),
+                metric("Estabelecimentos", str(ov['estabelecimentos'])),
+                metric("Tamanho", f"{ov['tamanho_bytes'] / (1024 * 1024):.1f} MB"),
+            ]),
+            ft.Row(wrap=True, spacing=5, run_spacing=5, controls=chips),
+            ft.Text(f"Analisado em {ov['tempo_s']:.2f}s", size=10, color=ft.Colors.GREY_600),
+        ]
+        if ov['linhas_malformadas']:
+            controls.insert(2, ft.Text(f"Atenção: {ov['linhas_malformadas']} linhas fora do padrão SPED.", color="orange", size=12))
+        return controls
+
+    # =========================================================================
+    # ABA 0: VALIDADOR DE INTEGRIDADE (Bloco 9)
+    # =========================================================================
+    def open_validator_tab(self, e):
+        label = "Validador SPED"
+        if label not in self.open_tabs:
+            self.open_tabs.append(label)
+
+            self.validator_path_input = ft.TextField(label="Arquivo SPED", width=400)
+            self.validator_status = ft.Text("Aguardando...", color=ft.Colors.GREY)
+            self.validator_progress = ft.ProgressBar(width=400, value=0)
+            self.validator_overview = self.create_overview_panel()
+            self.validator_problems = ft.ListView(spacing=5, padding=10, auto_scroll=False)
+
+            self.tab_contents[label] = ft.Column([
+                ft.Text(label, size=24, weight="bold"),
+                ft.Divider(),
+                ft.Row([
+                    self.validator_path_input,
+                    ft.IconButton(ft.Icons.FOLDER_OPEN, on_click=lambda _: self.request_open_file('validate')),
+                    ft.ElevatedButton("Validar", icon=ft.Icons.FACT_CHECK, on_click=self.process_validation)
+                ]),
+                self.validator_overview,
+                ft.Divider(),
+                self.validator_status,
+                self.validator_progress,
+                ft.Container(
+                    content=self.validator_problems, height=300,
+                    border=ft.border.all(1, ft.Colors.GREY_300), border_radius=10
+                )
+            ], scroll=ft.ScrollMode.AUTO)
+        self.switch_tab(label)
+
+    def process_validation(self, e):
+        filepath = self.validator_path_input.value
+        if not filepath or not os.path.exists(filepath):
+            self.validator_status.value = "Selecione um arquivo válido."
+            self.validator_status.color = "red"
+            self.validator_status.update()
+            return
+
+        self.validator_status.value = "Conferindo registros..."
+        self.validator_status.color = "blue"
+        self.validator_progress.value = 0
+        self.validator_problems.controls.clear()
+        self.validator_status.update()
+        self.validator_progress.update()
+        self.validator_problems.update()
+
+        def task(job):
+            progress = self.progress_channel(self.validator_progress)
+            try:
+                if get_job_client():
+                    # max_problems=None: a mesma lista da validação local
+                    result = self.run_remote(job, 'validate', progress, input_path=filepath, max_problems=None)
+                    success, msg, problems = result['sucesso'], result['mensagem'], result.get('problemas', [])
+                    total = result.get('total_problemas', len(problems))
+                    if total > len(problems):
+                        msg += f" (mostrando {len(problems)} de {total})"
+                else:
+                    success, msg, problems = self.validator_logic.validate_sped(
+                        filepath, progress_callback=lambda pct: progress.publish(pct=pct), cancel_token=job.token
+                    )
+            finally:
+                progress.close()
+            self.validator_status.value = msg
+            self.validator_status.color = "green" if success else "red"
+            self.validator_progress.value = 1 if success else 0
+            self.validator_problems.controls = [
+                ft.Text(f"• {p}", color="red", size=12) for p in problems
+            ]
+            self.validator_status.update()
+            self.validator_progress.update()
+            self.validator_problems.update()
+            return success, msg
+
+        self.start_job('validate', f"Validar {os.path.basename(filepath)}", task, self.validator_status, input_path=filepath)
 
     # =========================================================================
     # ABA 1: SPED CONTRIBUIÇÕES (Planilha)
@@ -211,7 +538,11 @@ class SpedView(ft.Column):
         if label not in self.open_tabs:
             self.open_tabs.append(label)
             self.contrib_status = ft.Text("Aguardando...", color=ft.Colors.GREY)
+            self.btn_show_contrib = ft.OutlinedButton(
+                "Visualizar Dados", icon=ft.Icons.TABLE_VIEW, disabled=True, on_click=self.show_contrib_data
+            )
             self.contrib_path_input = ft.TextField(label="Arquivo SPED", width=400)
+            self.contrib_overview = self.create_overview_panel()
             
             self.tab_contents[label] = ft.Column([
                 ft.Text(label, size=24, weight="bold"),
@@ -219,8 +550,10 @@ class SpedView(ft.Column):
                 ft.Row([
                     self.contrib_path_input,
                     ft.IconButton(ft.Icons.FOLDER_OPEN, on_click=lambda _: self.request_open_file('contrib')),
-                    ft.ElevatedButton("Gerar Excel", icon=ft.Icons.PLAY_ARROW, on_click=self.process_contrib)
+                    ft.ElevatedButton("Gerar Excel", icon=ft.Icons.PLAY_ARROW, on_click=self.process_contrib),
+                    self.btn_show_contrib
                 ]),
+                self.contrib_overview,
                 ft.Container(content=self.contrib_status, padding=10, bgcolor=ft.Colors.GREY_100)
             ])
         self.switch_tab(label)
@@ -237,27 +570,47 @@ class SpedView(ft.Column):
         self.contrib_status.color = "blue"
         self.contrib_status.update()
 
-        def task():
+        out_path = os.path.join(os.path.dirname(filepath), f"RELATORIO_{os.path.basename(filepath)}.xlsx")
+
+        def task(job):
+            success = False
+            if get_job_client():
+                # No servidor: a planilha é gerada lá; os dados não voltam para "Visualizar Dados"
+                result = self.run_remote(job, 'contrib', input_path=filepath)
+                success = result['sucesso']
+                self.contrib_status.value = result['mensagem']
+                self.contrib_status.color = "green" if success else "red"
+                self.contrib_status.update()
+                return success, result['mensagem']
             try:
-                df = process_sped_file(filepath)
+                df = process_sped_file(filepath, cancel_token=job.token)
                 if df is None or df.empty:
                     self.contrib_status.value = "Nenhum dado encontrado."
                     self.contrib_status.color = "red"
                 else:
-                    out_path = os.path.join(os.path.dirname(filepath), f"RELATORIO_{os.path.basename(filepath)}.xlsx")
+                    job.token.check()
+                    self.contrib_data = df
+                    self.btn_show_contrib.disabled = False
+                    self.btn_show_contrib.update()
                     if generate_fiscal_report(df, out_path):
+                        success = True
                         self.contrib_status.value = f"Sucesso: {out_path}"
                         self.contrib_status.color = "green"
                     else:
                         self.contrib_status.value = "Erro ao salvar Excel."
                         self.contrib_status.color = "red"
+            except OperationCancelled:
+                self.contrib_status.value = CANCELLED_MSG
+                self.contrib_status.color = "red"
             except Exception as ex:
                 self.contrib_status.value = f"Erro: {ex}"
                 self.contrib_status.color = "red"
             
             self.contrib_status.update()
+            return success, self.contrib_status.value
 
-        threading.Thread(target=task).start()
+        self.start_job('contrib', f"Planilha {os.path.basename(filepath)}", task, self.contrib_status,
+                       input_path=filepath, output_path=out_path)
 
     # =========================================================================
     # ABA 2: FILTRO POR DATA
@@ -272,6 +625,7 @@ class SpedView(ft.Column):
             self.end_date_input = ft.TextField(label="Data Fim (DDMMAAAA)", width=150, hint_text="31012025")
             self.filter_status = ft.Text("Aguardando início...", color=ft.Colors.GREY)
             self.filter_progress = ft.ProgressBar(width=400, value=0)
+            self.filter_overview = self.create_overview_panel()
 
             self.tab_contents[label] = ft.Column([
                 ft.Text(label, size=24, weight="bold"),
@@ -280,6 +634,7 @@ class SpedView(ft.Column):
                     self.filter_path_input,
                     ft.IconButton(ft.Icons.FOLDER_OPEN, on_click=lambda _: self.request_open_file('filter'))
                 ]),
+                self.filter_overview,
                 ft.Row([self.start_date_input, self.end_date_input]),
                 ft.ElevatedButton("Filtrar e Salvar", icon=ft.Icons.SAVE, on_click=self.pre_process_filter),
                 ft.Divider(),
@@ -323,21 +678,29 @@ class SpedView(ft.Column):
         start_date, end_date = self.pending_filter_dates
         input_path = self.pending_input_path
 
-        def progress_update(pct):
-            self.filter_progress.value = pct / 100
-            self.filter_progress.update()
-
-        def task():
-            success, msg = self.filter_logic.filter_sped_by_date(
-                input_path, output_path, start_date, end_date, progress_callback=progress_update
-            )
+        def task(job):
+            progress = self.progress_channel(self.filter_progress)
+            try:
+                if get_job_client():
+                    result = self.run_remote(job, 'filter', progress, input_path=input_path, output_path=output_path,
+                                             start_date=start_date, end_date=end_date)
+                    success, msg = result['sucesso'], result['mensagem']
+                else:
+                    success, msg = self.filter_logic.filter_sped_by_date(
+                        input_path, output_path, start_date, end_date,
+                        progress_callback=lambda pct: progress.publish(pct=pct), cancel_token=job.token
+                    )
+            finally:
+                progress.close()
             self.filter_status.value = msg
             self.filter_status.color = "green" if success else "red"
             self.filter_progress.value = 1 if success else 0
             self.filter_status.update()
             self.filter_progress.update()
+            return success, msg
 
-        threading.Thread(target=task).start()
+        self.start_job('filter', f"Filtrar {os.path.basename(input_path)}", task, self.filter_status,
+                       input_path=input_path, output_path=output_path)
 
     # =========================================================================
     # ABA 3: EXTRATOR DE CHAVES + DOWNLOAD
@@ -350,6 +713,7 @@ class SpedView(ft.Column):
             self.keys_path_input = ft.TextField(label="Arquivo SPED", width=400)
             self.keys_status = ft.Text("Aguardando...", color=ft.Colors.GREY)
             self.keys_progress = ft.ProgressBar(width=400, value=0)
+            self.keys_overview = self.create_overview_panel()
             
             self.btn_download_sieg = ft.ElevatedButton(
                 "Baixar XMLs na Sieg", 
@@ -358,6 +722,13 @@ class SpedView(ft.Column):
                 disabled=True
             )
 
+            # Filtros do dataset com metadados (entradas/saídas, modelo e período)
+            self.keys_chk_entradas = ft.Checkbox(label="Entradas", value=True)
+            self.keys_chk_saidas = ft.Checkbox(label="Saídas", value=False)
+            self.keys_models_input = ft.TextField(label="Modelos (ex: 55,57)", width=170, hint_text="Todos")
+            self.keys_start_input = ft.TextField(label="Data Início (DDMMAAAA)", width=170)
+            self.keys_end_input = ft.TextField(label="Data Fim (DDMMAAAA)", width=170)
+
             self.tab_contents[label] = ft.Column([
                 ft.Text(label, size=24, weight="bold"),
                 ft.Divider(),
@@ -365,14 +736,30 @@ class SpedView(ft.Column):
                     self.keys_path_input,
                     ft.IconButton(ft.Icons.FOLDER_OPEN, on_click=lambda _: self.request_open_file('keys'))
                 ]),
+                self.keys_overview,
                 ft.Row([
                     ft.ElevatedButton("Extrair Chaves", icon=ft.Icons.VPN_KEY, on_click=self.pre_process_keys),
-                    self.btn_download_sieg 
+                    self.btn_download_sieg,
+                    ft.ElevatedButton("Extrair e Baixar", icon=ft.Icons.BOLT, on_click=self.request_pipeline_folder,
+                                      tooltip="Baixa os XMLs enquanto o SPED ainda está sendo lido")
                 ]),
+                ft.ExpansionTile(
+                    title=ft.Text("Dataset de documentos (CSV/Parquet)"),
+                    subtitle=ft.Text("Chave, direção, modelo, data, valor e participante", size=12),
+                    controls=[
+                        ft.Row([self.keys_chk_entradas, self.keys_chk_saidas, self.keys_models_input]),
+                        ft.Row([self.keys_start_input, self.keys_end_input]),
+                        ft.Row([
+                            ft.ElevatedButton("Exportar Dataset", icon=ft.Icons.DATASET, on_click=self.pre_process_keys_dataset),
+                            ft.OutlinedButton("Carregar Dataset", icon=ft.Icons.UPLOAD_FILE,
+                                              on_click=lambda _: self.request_open_file('keys_load_dataset', ["csv", "parquet"])),
+                        ]),
+                    ]
+                ),
                 ft.Divider(),
                 self.keys_status,
                 self.keys_progress
-            ])
+            ], scroll=ft.ScrollMode.AUTO)
         self.switch_tab(label)
 
     def pre_process_keys(self, e):
@@ -398,9 +785,10 @@ class SpedView(ft.Column):
 
         input_path = self.pending_input_path
 
-        def task():
+        def task(job):
+            success = False
             try:
-                resultado = self.keys_logic.extract_keys(input_path, output_path)
+                resultado = self.keys_logic.extract_keys(input_path, output_path, cancel_token=job.token)
                 
                 if len(resultado) == 3:
                     success, msg, extracted_keys = resultado
@@ -418,14 +806,143 @@ class SpedView(ft.Column):
                     self.keys_status.value = msg
                     self.keys_status.color = "red"
             except Exception as ex:
+                success = False
                 self.keys_status.value = f"Erro fatal: {ex}"
                 self.keys_status.color = "red"
 
             self.keys_progress.value = 0
             self.keys_status.update()
             self.keys_progress.update()
+            return success, self.keys_status.value
 
-        threading.Thread(target=task).start()
+        self.start_job('keys', f"Chaves {os.path.basename(input_path)}", task, self.keys_status,
+                       input_path=input_path, output_path=output_path)
+
+    def pre_process_keys_dataset(self, e):
+        if not self.keys_path_input.value or not os.path.exists(self.keys_path_input.value):
+            self.keys_status.value = "Selecione um arquivo válido."
+            self.keys_status.update()
+            return
+
+        try:
+            start = self.keys_start_input.value.strip()
+            end = self.keys_end_input.value.strip()
+            d_ini = datetime.strptime(start, "%d%m%Y").date() if start else None
+            d_fim = datetime.strptime(end, "%d%m%Y").date() if end else None
+        except ValueError:
+            self.keys_status.value = "Datas inválidas. Use formato DDMMAAAA (ex: 01012025)."
+            self.keys_status.color = "red"
+            self.keys_status.update()
+            return
+
+        directions = []
+        if self.keys_chk_entradas.value: directions.append('0')
+        if self.keys_chk_saidas.value: directions.append('1')
+        models = [m.strip() for m in (self.keys_models_input.value or "").split(",") if m.strip()]
+
+        self.pending_input_path = self.keys_path_input.value
+        self.pending_dataset_options = {
+            'directions': directions, 'models': models or None,
+            'start_date': d_ini, 'end_date': d_fim,
+        }
+        self.current_action = 'keys_dataset'
+
+        self.save_file_picker.save_file(
+            dialog_title="Salvar Dataset de Documentos",
+            file_name="DOCUMENTOS_EXTRAIDOS.csv",
+            allowed_extensions=["csv", "parquet"]
+        )
+
+    def run_keys_dataset_thread(self, output_path):
+        self.keys_status.value = "Extraindo documentos..."
+        self.keys_status.color = "blue"
+        self.keys_progress.value = 0
+        self.keys_status.update()
+        self.keys_progress.update()
+
+        input_path = self.pending_input_path
+        options = self.pending_dataset_options
+
+        def task(job):
+            progress = self.progress_channel(self.keys_progress)
+            try:
+                success, msg, keys = self.keys_logic.extract_documents(
+                    input_path, output_path, progress_callback=lambda pct: progress.publish(pct=pct),
+                    cancel_token=job.token, **options
+                )
+            finally:
+                progress.close()
+            self.finish_keys_loading(success, msg, keys)
+            return success, msg
+
+        self.start_job('keys_dataset', f"Documentos {os.path.basename(input_path)}", task, self.keys_status,
+                       input_path=input_path, output_path=output_path)
+
+    def load_keys_dataset(self, dataset_path):
+        success, msg, keys = self.keys_logic.load_keys_dataset(dataset_path)
+        self.finish_keys_loading(success, msg, keys)
+
+    def finish_keys_loading(self, success, msg, keys):
+        if success:
+            self.keys_found_list = keys
+            self.keys_status.value = f"{msg}\nPronto para baixar {len(keys)} XMLs."
+            self.keys_status.color = "green"
+            self.btn_download_sieg.disabled = not keys
+            self.btn_download_sieg.update()
+        else:
+            self.keys_status.value = msg
+            self.keys_status.color = "red"
+        self.keys_progress.value = 0
+        self.keys_status.update()
+        self.keys_progress.update()
+
+    def request_pipeline_folder(self, e):
+        if not self.keys_path_input.value or not os.path.exists(self.keys_path_input.value):
+            self.keys_status.value = "Selecione um arquivo válido."
+            self.keys_status.update()
+            return
+        self.pending_input_path = self.keys_path_input.value
+        self.current_action = 'pipeline_download'
+        self.folder_picker.get_directory_path()
+
+    def run_pipeline_thread(self, download_dir):
+        self.keys_status.value = "Extraindo chaves e baixando XMLs..."
+        self.keys_status.color = "blue"
+        self.keys_progress.value = None
+        self.keys_status.update()
+        self.keys_progress.update()
+
+        input_path = self.pending_input_path
+        pipeline = KeyDownloadPipeline(SiegManager)
+
+        def progress_update(progress, job, stats):
+            job.items = stats['baixadas']
+            fase = "Extraindo e baixando" if stats['extracao_s'] is None else "Baixando"
+            progress.publish(text=f"{fase}... Chaves: {stats['extraidas']} | Baixados: {stats['baixadas']} | "
+                                  f"Erros: {stats['erros']} | Na fila: {stats['na_fila']}")
+
+        def task(job):
+            job.items_unit = "XMLs"
+            progress = self.progress_channel(status_text=self.keys_status)
+            try:
+                success, msg, stats = pipeline.run(
+                    self.keys_logic.iter_entry_keys(input_path, cancel_token=job.token), download_dir,
+                    progress_callback=lambda stats: progress_update(progress, job, stats),
+                    skip_keys=CompactKeySet.from_directory(download_dir),
+                    cancel_token=job.token
+                )
+            finally:
+                progress.close()
+            job.items = stats['baixadas']
+            self.keys_status.value = msg
+            self.keys_status.color = "green" if success else "red"
+            self.keys_progress.value = 1 if success else 0
+            self.keys_status.update()
+            self.keys_progress.update()
+            return success, msg
+
+        self.start_job('keys_pipeline', f"Extrair e baixar {os.path.basename(input_path)}", task, self.keys_status,
+                       input_path=input_path, key=(input_path, download_dir))
 
     def request_download_folder(self, e):
         self.current_action = 'download_xml'
@@ -443,38 +960,51 @@ class SpedView(ft.Column):
         self.keys_status.update()
         self.keys_progress.update()
 
-        def task():
-            total = len(self.keys_found_list)
+        def task(job):
+            job.items_unit = "XMLs"
+            # Sessão HTTP própria: outras tarefas de download podem rodar ao mesmo tempo
+            sieg_manager = SiegManager()
+            # Pula as chaves cujo XML já está na pasta de destino
+            pendentes = CompactKeySet.from_keys(self.keys_found_list) - CompactKeySet.from_directory(download_dir)
+            ja_baixadas = len(self.keys_found_list) - len(pendentes)
+            total = len(pendentes)
             success_count = 0
             errors = 0
-            
-            for i, chave in enumerate(self.keys_found_list):
-                if i > 0 and i % 10 == 0:
-                    time.sleep(1)
-
-                ok, msg = self.sieg_manager.download_xml(chave, download_dir)
-                
-                if ok:
-                    success_count += 1
-                    print(f"[OK] Baixado: {chave}") 
-                else:
-                    errors += 1
-                    print(f"[ERRO] Falha em {chave}: {msg}") 
-                
-                if i % 5 == 0:
-                    pct = (i + 1) / total
-                    self.keys_progress.value = pct
-                    self.keys_status.value = f"Baixando... {i+1}/{total} (Sucesso: {success_count}, Erros: {errors})"
-                    self.keys_status.update()
-                    self.keys_progress.update()
-
-            self.keys_status.value = f"Finalizado! Baixados: {success_count}, Falhas: {errors}."
+            progress = self.progress_channel(self.keys_progress, self.keys_status)
+            try:
+                for i, chave in enumerate(pendentes):
+                    if job.token.cancelled:
+                        break
+                    if i > 0 and i % 10 == 0:
+                        time.sleep(1)
+
+                    ok, msg = sieg_manager.download_xml(chave, download_dir)
+
+                    if ok:
+                        success_count += 1
+                        job.items = success_count
+                        print(f"[OK] Baixado: {chave}") 
+                    else:
+                        errors += 1
+                        print(f"[ERRO] Falha em {chave}: {msg}") 
+
+                    progress.publish(pct=(i + 1) / total * 100,
+                                     text=f"Baixando... {i+1}/{total} (Sucesso: {success_count}, Erros: {errors})")
+            finally:
+                progress.close()
+
+            fim = "Cancelado" if job.token.cancelled else "Finalizado"
+            self.keys_status.value = f"{fim}! Baixados: {success_count}, Falhas: {errors}."
+            if ja_baixadas:
+                self.keys_status.value += f" Já existentes na pasta: {ja_baixadas}."
             self.keys_status.color = "green" if errors == 0 else "orange"
             self.keys_progress.value = 1
             self.keys_status.update()
             self.keys_progress.update()
+            return errors == 0, self.keys_status.value
 
-        threading.Thread(target=task).start()
+        self.start_job('download_xml', f"Baixar {len(self.keys_found_list)} XMLs", task, self.keys_status,
+                       key=(download_dir,))
 
     # =========================================================================
     # ABA 4: RELATÓRIO DIFAL / FCP (COMPLETA)
@@ -484,13 +1014,15 @@ class SpedView(ft.Column):
         if label not in self.open_tabs:
             self.open_tabs.append(label)
             
-            self.difal_folder_input = ft.TextField(label="Pasta dos XMLs", width=400)
+            self.difal_folder_input = ft.TextField(label="Pasta dos XMLs (aceita subpastas e ZIPs)", width=400)
             self.difal_status = ft.Text("Selecione a pasta para somar.", color=ft.Colors.GREY)
             
             # Checkbox Detalhado
             self.chk_detailed_report = ft.Checkbox(
                 label="Incluir aba com relatório detalhado (Nota a Nota) no Excel", value=False 
             )
+            # Cópia de todas as notas fora do Excel (abre em qualquer ferramenta, sem limite de linhas)
+            self.chk_difal_csv = ft.Checkbox(label="Salvar também CSV com todas as notas", value=False)
 
             # Botão Salvar
             self.btn_save_difal = ft.ElevatedButton(
@@ -504,6 +1036,18 @@ class SpedView(ft.Column):
                 color=ft.Colors.RED_900, visible=False, on_click=self.show_error_dialog
             )
 
+            self.btn_show_difal_details = ft.OutlinedButton(
+                "Ver Notas", icon=ft.Icons.TABLE_VIEW, disabled=True, on_click=self.show_difal_details
+            )
+
+            # Agrupamentos e conferência sobre a base por item (sem reler os XMLs)
+            self.btn_difal_pivot = ft.OutlinedButton(
+                "Análise por Item", icon=ft.Icons.PIVOT_TABLE_CHART, disabled=True, on_click=self.show_difal_pivot
+            )
+            self.btn_difal_check = ft.OutlinedButton(
+                "Conferir Cálculo", icon=ft.Icons.FACT_CHECK, disabled=True, on_click=self.show_difal_check
+            )
+
             # Tabela
             self.difal_table = ft.DataTable(
                 columns=[
@@ -522,8 +1066,9 @@ class SpedView(ft.Column):
                     ft.IconButton(ft.Icons.FOLDER, on_click=lambda _: self.request_folder_difal()),
                     ft.ElevatedButton("Calcular Totais", icon=ft.Icons.CALCULATE, on_click=self.process_difal)
                 ]),
-                self.chk_detailed_report,
-                ft.Row([self.btn_save_difal, self.btn_show_errors]),
+                ft.Row([self.chk_detailed_report, self.chk_difal_csv]),
+                ft.Row([self.btn_save_difal, self.btn_show_difal_details, self.btn_difal_pivot,
+                        self.btn_difal_check, self.btn_show_errors]),
                 ft.Divider(),
                 self.difal_status,
                 
@@ -555,20 +1100,105 @@ class SpedView(ft.Column):
             allowed_extensions=["xlsx"]
         )
 
+    def run_save_difal_thread(self, output_path):
+        # Dados do cálculo atual (um novo cálculo troca as listas, não as altera)
+        resumo, detalhes = self.difal_data_summary, self.difal_data_details
+        incluir_detalhes = self.chk_detailed_report.value
+        complemento = 'csv' if self.chk_difal_csv.value else None
+
+        self.difal_status.value = "Salvando Excel..."
+        self.difal_status.color = "blue"
+        self.difal_status.update()
+
+        def task(job):
+            progress = self.progress_channel(status_text=self.difal_status)
+            try:
+                sucesso, msg = self.difal_logic.gerar_excel(
+                    resumo, detalhes, output_path, incluir_detalhado=incluir_detalhes, complemento=complemento,
+                    progress_callback=lambda pct: progress.publish(text=f"Salvando Excel... {pct}%"),
+                    cancel_token=job.token
+                )
+            finally:
+                progress.close()
+            if sucesso:
+                self.difal_status.value = f"Arquivo salvo: {msg}"
+                self.difal_status.color = "green"
+            else:
+                self.difal_status.value = f"Erro ao salvar: {msg}"
+                self.difal_status.color = "red"
+            self.difal_status.update()
+            return sucesso, msg
+
+        self.start_job('save_difal', f"Salvar DIFAL {os.path.basename(output_path)}", task, self.difal_status,
+                       output_path=output_path)
+
     def show_error_dialog(self, e):
-        """Abre Popup com lista de erros"""
-        lista_erro_visual = ft.ListView(expand=True, spacing=10, padding=20, auto_scroll=False)
+        """Abre Popup com lista de erros (paginada: pode haver dezenas de milhares)"""
+        arquivos, mensagens = [], []
         for erro in self.difal_errors_list:
-            lista_erro_visual.controls.append(ft.Text(f"• {erro}", color="red", size=12))
+            arquivo, _, mensagem = erro.partition(": ")
+            arquivos.append(arquivo)
+            mensagens.append(mensagem)
+        source = ColumnarSource({"Arquivo": arquivos, "Erro": mensagens})
+        self.show_grid_dialog("Arquivos Não Processados", source)
+
+    def show_difal_details(self, e):
+        source = ColumnarSource.from_records(self.difal_data_details)
+        self.show_grid_dialog("DIFAL - Nota a Nota", source)
+
+    def show_difal_pivot(self, e):
+        base = self.difal_logic.base_itens
+        if base is None:
+            return
+        grid_box = ft.Container(width=900, height=400)
+        group_by = ft.Dropdown(
+            label="Agrupar por", width=220, dense=True, value=next(iter(AGRUPAMENTOS)),
+            options=[ft.dropdown.Option(nome) for nome in AGRUPAMENTOS]
+        )
+        only_difal = ft.Checkbox(label="Somente itens com DIFAL/FCP", value=True)
+
+        def refresh(update=True):
+            colunas = base.agrupar(AGRUPAMENTOS[group_by.value], somente_difal=only_difal.value)
+            grid_box.content = VirtualGrid(ColumnarSource(colunas), height=320)
+            if update:
+                grid_box.update()
+
+        group_by.on_change = lambda _: refresh()
+        only_difal.on_change = lambda _: refresh()
+        refresh(update=False)
 
         dlg = ft.AlertDialog(
-            title=ft.Text("Arquivos Não Processados"),
-            content=ft.Container(content=lista_erro_visual, width=500, height=300),
-            actions=[ft.TextButton("Fechar", on_click=lambda e: self.page_instance.close_dialog())],
+            title=ft.Text(f"DIFAL por Item - {len(base):,} itens de {base.notas:,} notas".replace(",", ".")),
+            content=ft.Column([ft.Row([group_by, only_difal]), grid_box], width=900, height=480, tight=True),
         )
-        self.page_instance.dialog = dlg
-        dlg.open = True
-        self.page_instance.update()
+        dlg.actions = [ft.TextButton("Fechar", on_click=lambda e: self.page_instance.close(dlg))]
+        self.page_instance.open(dlg)
+
+    def show_difal_check(self, e):
+        base = self.difal_logic.base_itens
+        if base is None:
+            return
+        divergencias = base.conferir_calculo()
+        if not divergencias['Arquivo']:
+            self.difal_status.value = "Conferência: DIFAL e FCP de todos os itens conferem com as alíquotas informadas."
+            self.difal_status.color = "green"
+            self.difal_status.update()
+            return
+        self.show_grid_dialog(f"Itens com Cálculo Divergente ({len(divergencias['Arquivo'])})",
+                              ColumnarSource(divergencias))
+
+    def show_contrib_data(self, e):
+        if self.contrib_data is not None:
+            self.show_grid_dialog("SPED Contribuições - Consolidação", ColumnarSource.from_dataframe(self.contrib_data))
+
+    def show_grid_dialog(self, title, source):
+        grid = VirtualGrid(source, height=380)
+        dlg = ft.AlertDialog(
+            title=ft.Text(title),
+            content=ft.Container(content=grid, width=900, height=480),
+        )
+        dlg.actions = [ft.TextButton("Fechar", on_click=lambda e: self.page_instance.close(dlg))]
+        self.page_instance.open(dlg)
 
     def process_difal(self, e):
         pasta = self.difal_folder_input.value
@@ -581,14 +1211,25 @@ class SpedView(ft.Column):
         self.difal_status.value = "Lendo XMLs e calculando..."
         self.difal_status.color = "blue"
         self.btn_save_difal.disabled = True
+        self.btn_show_difal_details.disabled = True
+        self.btn_difal_pivot.disabled = self.btn_difal_check.disabled = True
         self.btn_show_errors.visible = False
         self.btn_save_difal.update()
+        self.btn_show_difal_details.update()
+        self.btn_difal_pivot.update()
+        self.btn_difal_check.update()
         self.btn_show_errors.update()
         self.difal_status.update()
 
-        def task():
+        def task(job):
             # Retorna 5 valores: Sucesso, Msg, Resumo, Detalhes, Erros
-            sucesso, msg, resumo, detalhes, erros = self.difal_logic.calcular_difal_por_pasta(pasta)
+            # (os itens de cada nota ficam em difal_logic.base_itens)
+            sucesso, msg, resumo, detalhes, erros = self.difal_logic.calcular_difal_por_pasta(
+                pasta, cancel_token=job.token, coletar_itens=True
+            )
+            # Arquivos/Hora do Dashboard conta os XMLs lidos, não a pasta
+            job.items = self.difal_logic.total_arquivos
+            job.items_unit = "XMLs"
             
             if sucesso:
                 self.difal_data_summary = resumo
@@ -626,6 +1267,8 @@ class SpedView(ft.Column):
                     self.difal_status.color = "green"
                 
                 self.btn_save_difal.disabled = False
+                self.btn_show_difal_details.disabled = not detalhes
+                self.btn_difal_pivot.disabled = self.btn_difal_check.disabled = not len(self.difal_logic.base_itens)
                 
             else:
                 self.difal_status.value = f"Erro: {msg}"
@@ -634,6 +1277,18 @@ class SpedView(ft.Column):
             self.difal_status.update()
             self.difal_table.update()
             self.btn_save_difal.update()
+            self.btn_show_difal_details.update()
+            self.btn_difal_pivot.update()
+            self.btn_difal_check.update()
             self.btn_show_errors.update()
+            return sucesso, msg
+
+        self.start_job('difal', f"DIFAL {os.path.basename(pasta)}", task, self.difal_status,
+                       input_path=pasta, key=(pasta,))
+
 
-        threading.Thread(target=task).start()
\ No newline at end of file
+def _format_duration(seconds):
+    if seconds is None:
+        return "-"
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}min {secs:02d}s" if minutes else f"{seconds:.1f}s"
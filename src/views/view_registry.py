@@ -0,0 +1,49 @@
+import flet as ft
+
+
+class ViewRegistry:
+    """
+    Telas da sessão do usuário: cada view é criada na primeira visita e
+    reaproveitada nas seguintes.
+
+    As views visitadas ficam todas montadas no container e apenas a ativa
+    fica visível. Assim a troca de tela é imediata, o estado (resultados,
+    campos preenchidos) é mantido e as threads de processamento continuam
+    podendo atualizar seus controles mesmo com outra tela aberta.
+    """
+
+    def __init__(self, factories):
+        # factories: {rótulo do menu: função sem argumentos que cria a view}
+        self.factories = factories
+        self.views = {}
+        self.current = None
+        self.container = ft.Column(expand=True, spacing=0)
+
+    def show(self, label):
+        """Exibe a view do rótulo, criando-a se necessário. Retorna a view."""
+        view = self.views.get(label)
+        revisit = view is not None
+        if view is None:
+            view = self.factories[label]()
+            self.views[label] = view
+            self.container.controls.append(view)
+
+        for other in self.views.values():
+            other.visible = other is view
+        self.current = label
+
+        if self.container.page:
+            self.container.update()
+            # Views já montadas não recebem did_mount novamente
+            if revisit and hasattr(view, "on_show"):
+                view.on_show()
+        return view
+
+    def invalidate(self):
+        """Descarta as views da sessão (logout)."""
+        for view in self.views.values():
+            if hasattr(view, "dispose"):
+                view.dispose()
+        self.views.clear()
+        self.container.controls.clear()
+        self.current = None
@@ -0,0 +1,176 @@
+import flet as ft
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class ColumnarSource:
+    """
+    Dados da grade em colunas (arrays NumPy) com filtro e ordenação feitos
+    no Python: a interface só recebe as linhas da página visível.
+
+    self.view guarda os índices das linhas após filtro/ordenação, sem copiar os dados.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence]):
+        self.columns = list(columns)
+        self.data: Dict[str, np.ndarray] = {}
+        for name, values in columns.items():
+            array = np.asarray(values)
+            if array.dtype.kind not in 'iufb':
+                array = np.asarray(values, dtype=object)
+            self.data[name] = array
+        lengths = {len(a) for a in self.data.values()}
+        if len(lengths) > 1:
+            raise ValueError("As colunas devem ter o mesmo tamanho.")
+        self.total = lengths.pop() if lengths else 0
+        self.view = np.arange(self.total)
+        self._lower_text: Dict[str, np.ndarray] = {}
+        self._query = ""
+        self._sort = None
+
+    @classmethod
+    def from_records(cls, records: List[Dict], columns: Optional[List[str]] = None) -> 'ColumnarSource':
+        """Lista de dicionários (ex: difal_data_details)."""
+        columns = columns or (list(records[0]) if records else [])
+        return cls({c: [r.get(c) for r in records] for c in columns})
+
+    @classmethod
+    def from_dataframe(cls, df) -> 'ColumnarSource':
+        return cls({str(c): df[c].to_numpy() for c in df.columns})
+
+    def is_numeric(self, column: str) -> bool:
+        return self.data[column].dtype.kind in 'iuf'
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def set_filter(self, query: str):
+        """Mantém as linhas em que algum campo contém o texto (sem diferenciar maiúsculas)."""
+        self._query = (query or "").strip().lower()
+        self._apply()
+
+    def set_sort(self, column: Optional[str], ascending: bool = True):
+        self._sort = (column, ascending) if column else None
+        self._apply()
+
+    def rows(self, start: int, stop: int) -> List[List]:
+        """Linhas [start, stop) da visão atual."""
+        idx = self.view[start:stop]
+        return [[self.data[c][i] for c in self.columns] for i in idx.tolist()]
+
+    def _apply(self):
+        view = np.arange(self.total)
+        if self._query:
+            mask = np.zeros(self.total, dtype=bool)
+            for column in self.columns:
+                mask |= np.char.find(self._text(column), self._query) >= 0
+            view = view[mask]
+        if self._sort:
+            column, ascending = self._sort
+            values = self.data[column][view]
+            if not self.is_numeric(column):
+                values = self._text(column)[view]
+            order = np.argsort(values, kind='stable')
+            if not ascending:
+                order = order[::-1]
+            view = view[order]
+        self.view = view
+
+    def _text(self, column: str) -> np.ndarray:
+        # Texto minúsculo de cada coluna, calculado uma vez e reaproveitado
+        text = self._lower_text.get(column)
+        if text is None:
+            text = np.array(["" if v is None else str(v).lower() for v in self.data[column].tolist()], dtype=str)
+            self._lower_text[column] = text
+        return text
+
+
+class VirtualGrid(ft.Column):
+    """
+    Grade paginada: só as linhas da página atual viram controles Flet.
+    Ordenação (clique no cabeçalho) e filtro são aplicados no ColumnarSource.
+    """
+
+    def __init__(self, source: ColumnarSource, page_size: int = 50,
+                 formatters: Optional[Dict[str, Callable]] = None, height: Optional[int] = None):
+        super().__init__(spacing=5)
+        self.source = source
+        self.page_size = page_size
+        self.formatters = formatters or {}
+        self.current_page = 0
+
+        self.filter_input = ft.TextField(
+            label="Filtrar", hint_text="Texto + Enter", prefix_icon=ft.Icons.SEARCH,
+            dense=True, width=300, on_submit=self.on_filter
+        )
+        self.count_text = ft.Text(size=12, color=ft.Colors.GREY_700)
+        self.table = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text(c), numeric=source.is_numeric(c), on_sort=self.on_sort)
+                for c in source.columns
+            ],
+            rows=[],
+            heading_row_height=40,
+            data_row_max_height=40,
+        )
+        self.page_text = ft.Text()
+        self.btn_first = ft.IconButton(ft.Icons.FIRST_PAGE, on_click=lambda _: self.go_to(0))
+        self.btn_prev = ft.IconButton(ft.Icons.CHEVRON_LEFT, on_click=lambda _: self.go_to(self.current_page - 1))
+        self.btn_next = ft.IconButton(ft.Icons.CHEVRON_RIGHT, on_click=lambda _: self.go_to(self.current_page + 1))
+        self.btn_last = ft.IconButton(ft.Icons.LAST_PAGE, on_click=lambda _: self.go_to(self.page_count - 1))
+
+        self.controls = [
+            ft.Row([self.filter_input, self.count_text], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+            ft.Container(
+                content=ft.Column([ft.Row([self.table], scroll=ft.ScrollMode.AUTO)], scroll=ft.ScrollMode.AUTO),
+                height=height, expand=height is None
+            ),
+            ft.Row([self.btn_first, self.btn_prev, self.page_text, self.btn_next, self.btn_last],
+                   alignment=ft.MainAxisAlignment.CENTER),
+        ]
+        self.render(update=False)
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.source) // self.page_size))
+
+    def go_to(self, page: int):
+        self.current_page = min(max(page, 0), self.page_count - 1)
+        self.render()
+
+    def on_sort(self, e: ft.DataColumnSortEvent):
+        self.table.sort_column_index = e.column_index
+        self.table.sort_ascending = e.ascending
+        self.source.set_sort(self.source.columns[e.column_index], e.ascending)
+        self.go_to(0)
+
+    def on_filter(self, e):
+        self.source.set_filter(self.filter_input.value)
+        self.go_to(0)
+
+    def render(self, update: bool = True):
+        start = self.current_page * self.page_size
+        self.table.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(self._format(column, value), size=12, selectable=True))
+                for column, value in zip(self.source.columns, row)
+            ])
+            for row in self.source.rows(start, start + self.page_size)
+        ]
+        shown = len(self.source)
+        self.count_text.value = f"{shown:,} de {self.source.total:,} linhas".replace(",", ".")
+        self.page_text.value = f"Página {self.current_page + 1} de {self.page_count}"
+        self.btn_first.disabled = self.btn_prev.disabled = self.current_page == 0
+        self.btn_next.disabled = self.btn_last.disabled = self.current_page >= self.page_count - 1
+        if update and self.page:
+            self.update()
+
+    def _format(self, column: str, value) -> str:
+        formatter = self.formatters.get(column)
+        if formatter:
+            return formatter(value)
+        if value is None:
+            return ""
+        if isinstance(value, (float, np.floating)):
+            return "" if np.isnan(value) else f"{value:,.2f}"
+        return str(value)